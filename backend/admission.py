@@ -0,0 +1,144 @@
+"""
+Admission control for scoring endpoints
+Each request class gets its own concurrency budget and bounded wait queue,
+so bulk work cannot take every worker thread from interactive requests
+"""
+
+import functools
+import threading
+import time
+
+from flask import jsonify
+
+from config import Config
+
+
+class _RequestClass:
+    """Concurrency budget, bounded queue and counters for one request class"""
+
+    def __init__(self, name, concurrency, queue, timeout, retry_after):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_limit = queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._condition = threading.Condition()
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.wait_seconds = 0.0
+
+    def acquire(self):
+        """
+        Take a slot, waiting up to `timeout` seconds in the queue
+
+        Returns:
+            None once admitted, or the HTTP status to shed with:
+            429 when the queue is full, 503 when the wait timed out
+        """
+        start = time.monotonic()
+        with self._condition:
+            if self.in_flight >= self.concurrency or self.queued:
+                if self.queued >= self.queue_limit:
+                    self.shed_queue_full += 1
+                    return 429
+                self.queued += 1
+                self.max_queued = max(self.max_queued, self.queued)
+                deadline = start + self.timeout
+                try:
+                    while self.in_flight >= self.concurrency:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.shed_timeout += 1
+                            return 503
+                        self._condition.wait(remaining)
+                finally:
+                    self.queued -= 1
+            self.in_flight += 1
+            self.admitted += 1
+            self.wait_seconds += time.monotonic() - start
+            return None
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'concurrency': self.concurrency,
+                'queue_limit': self.queue_limit,
+                'queue_timeout_seconds': self.timeout,
+                'in_flight': self.in_flight,
+                'queue_depth': self.queued,
+                'max_queue_depth': self.max_queued,
+                'admitted': self.admitted,
+                'shed_queue_full': self.shed_queue_full,
+                'shed_timeout': self.shed_timeout,
+                'avg_wait_ms': round(self.wait_seconds / self.admitted * 1e3, 3) if self.admitted else 0.0
+            }
+
+
+class AdmissionController:
+    """
+    Per-class admission for view functions
+
+    A request waits in its class's queue while the class is at its
+    concurrency budget. It is shed with 429 when the queue is already full
+    and with 503 when it waited longer than the class timeout; both carry
+    Retry-After. Budgets are per process: with several worker processes the
+    effective limit is budget x workers.
+    """
+
+    def __init__(self, limits):
+        self.classes = {
+            name: _RequestClass(name, settings['concurrency'], settings['queue'],
+                                settings['timeout'], settings.get('retry_after', 1))
+            for name, settings in limits.items()
+        }
+
+    def limit(self, request_class):
+        """
+        Decorator admitting a view under `request_class`
+
+        Streamed responses keep their slot until the stream is closed.
+        """
+        limiter = self.classes[request_class]
+
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                status = limiter.acquire()
+                if status is not None:
+                    message = ('Server busy, too many queued requests' if status == 429
+                               else 'Server busy, timed out waiting for capacity')
+                    response = jsonify({'error': message, 'request_class': request_class})
+                    response.status_code = status
+                    response.headers['Retry-After'] = str(limiter.retry_after)
+                    return response
+
+                try:
+                    result = view(*args, **kwargs)
+                except BaseException:
+                    limiter.release()
+                    raise
+
+                response = result[0] if isinstance(result, tuple) else result
+                if getattr(response, 'is_streamed', False):
+                    response.call_on_close(limiter.release)
+                else:
+                    limiter.release()
+                return result
+            return wrapper
+        return decorator
+
+    def stats(self):
+        """Queue depth, in-flight count and shed counters per request class"""
+        return {name: limiter.stats() for name, limiter in self.classes.items()}
+
+
+admission = AdmissionController(Config.ADMISSION_LIMITS)
@@ -10,8 +10,10 @@ import os
 # Add ml_models to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'ml_models'))
 
-from config import config
-from routes import predict, analytics, bulk
+from config import Config, config
+from admission import admission
+from extensions import online_updater
+from routes import predict, analytics, bulk, feedback
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -31,10 +33,26 @@ def health_check():
     })
 
 
+# Admission control metrics
+@app.route('/api/admission', methods=['GET'])
+def admission_stats():
+    """Queue depth, in-flight requests and shed counts per request class"""
+    return jsonify(admission.stats())
+
+
 # Register blueprints
 app.register_blueprint(predict.bp, url_prefix='/api')
 app.register_blueprint(analytics.bp, url_prefix='/api')
 app.register_blueprint(bulk.bp, url_prefix='/api')
+app.register_blueprint(feedback.bp, url_prefix='/api')
+
+
+# Online updates start with the first request served, so the debug
+# reloader's file-watching process never runs an updater of its own
+if Config.ONLINE_UPDATES_ENABLED:
+    @app.before_request
+    def start_online_updater():
+        online_updater.start()
 
 
 # Error handlers
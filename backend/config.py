@@ -16,15 +16,89 @@ class Config:
     ML_MODELS_DIR = os.path.abspath(os.path.join(os.path.dirname(BASE_DIR), 'ml_models', 'saved_models'))
     DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(BASE_DIR), 'data'))
     
+    # SQLite copy of the dataset used by the analytics routes; rebuilt from
+    # the CSV whenever the CSV changes (bulk load: python ml_models/review_store.py)
+    REVIEW_STORE_PATH = os.environ.get('REVIEW_STORE_PATH') or os.path.join(DATA_DIR, 'reviews.sqlite3')
+    
+    # 'pickle' loads the joblib files; 'artifact' loads ML_MODELS_DIR/artifact
+    # (compact, no unpickling; served forests cannot take online updates)
+    MODEL_FORMAT = os.environ.get('MODEL_FORMAT', 'pickle')
+    
     # CORS settings
     CORS_ORIGINS = ['http://localhost:5173', 'http://localhost:5174', 'http://localhost:3000', 'http://127.0.0.1:5173', 'http://127.0.0.1:5174']
     
     # Upload settings
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'csv', 'xlsx'}
+    BULK_CHUNK_SIZE = 5000  # rows scored per chunk in bulk uploads
+    
+    # NDJSON streaming predictions (/api/predict/stream)
+    STREAM_BATCH_SIZE = 256           # reviews scored per micro-batch
+    STREAM_MAX_LINE_BYTES = 1024 * 1024
+    STREAM_MAX_CONTENT_LENGTH = None  # bytes per stream; None = unlimited
+    
+    # Admission control per request class (per worker process):
+    # concurrency = requests served at once, queue = requests allowed to wait,
+    # timeout = longest wait in seconds; beyond these, 429/503 with Retry-After
+    ADMISSION_LIMITS = {
+        'interactive': {'concurrency': 8, 'queue': 32, 'timeout': 0.5, 'retry_after': 1},   # /predict
+        'batch': {'concurrency': 2, 'queue': 4, 'timeout': 2.0, 'retry_after': 2},          # /predict/batch, /predict/stream
+        'bulk': {'concurrency': 1, 'queue': 2, 'timeout': 5.0, 'retry_after': 10}           # /bulk/upload
+    }
     
     # Pagination
     REVIEWS_PER_PAGE = 50
+    
+    # Response compression for large JSON payloads
+    RESPONSE_GZIP_MIN_BYTES = 1024   # smaller bodies are sent uncompressed
+    RESPONSE_GZIP_LEVEL = 1          # level 1 is ~2x faster than 5 for ~25% larger bodies
+    
+    # Prediction cache
+    PREDICTION_CACHE_SIZE = 50000     # max cached payloads
+    PREDICTION_CACHE_TTL = 6 * 3600   # seconds
+    
+    # Metadata-first cascade (train with ml_models/cascade.py)
+    CASCADE_ENABLED = os.environ.get('CASCADE_ENABLED', 'false').lower() == 'true'
+    CASCADE_LOW = None                # override the saved band, e.g. 0.05
+    CASCADE_HIGH = None               # override the saved band, e.g. 0.95
+    
+    # Extra models scored on the same feature matrix as the served model.
+    # Entries: {'path': 'logistic_regression_model.pkl' (relative to ML_MODELS_DIR),
+    #           'name': ..., 'mode': 'ensemble' or 'shadow', 'weight': 1.0}
+    # Train one with: python ml_models/multi_model.py --model-type logistic_regression
+    SCORING_MODELS = []
+    PRIMARY_MODEL_WEIGHT = 1.0        # weight of the served model in the ensemble
+    SHADOW_MAX_PENDING = 64           # queued shadow jobs before new ones are dropped
+    
+    # Feature drift monitoring (/api/predict/drift); the reference profile is
+    # rebuilt from the dataset whenever the served scaler changes
+    DRIFT_MONITOR_ENABLED = os.environ.get('DRIFT_MONITOR_ENABLED', 'true').lower() == 'true'
+    DRIFT_REFERENCE_PATH = os.path.join(ML_MODELS_DIR, 'drift_reference.npz')
+    DRIFT_BINS = 10                   # histogram bins per feature (reference deciles)
+    DRIFT_REFERENCE_ROWS = 5000       # dataset rows sampled for the reference profile
+    DRIFT_PSI_THRESHOLD = 0.2         # PSI at or above this reports a feature as drifted
+    DRIFT_MIN_ROWS = 100              # scored reviews needed before drift is reported
+    
+    # Per-prediction attributions on /api/predict
+    ATTRIBUTION_METHOD = 'saabas'     # 'saabas', 'shap' (exact, slower) or 'none'
+    ATTRIBUTION_TOP_K = 5
+    
+    # Near-duplicate index (MinHash/LSH)
+    DUPLICATE_NUM_PERM = 128
+    DUPLICATE_BANDS = 16
+    DUPLICATE_THRESHOLD = 0.7         # estimated Jaccard similarity
+    DUPLICATE_MAX_TRACKED = 100000    # scored reviews indexed at runtime; later ones are only looked up
+    
+    # Online updates from moderator feedback
+    FEEDBACK_DIR = os.path.join(ML_MODELS_DIR, 'feedback')
+    FEEDBACK_MIN_BATCH = 50           # records needed before an update
+    FEEDBACK_UPDATE_INTERVAL = 30     # seconds between update checks
+    FEEDBACK_EXTRA_TREES = 5          # trees grown per random forest update
+    FEEDBACK_MAX_TREES = 200          # past this size, the oldest feedback-grown trees are replaced
+    FEEDBACK_PERSIST_MODEL = True     # save updated models to FEEDBACK_DIR (never over the trained pickle)
+    # Opt-in: the first process to serve a request with ONLINE_UPDATES=true takes
+    # the updater lock in FEEDBACK_DIR; every other process stays on standby
+    ONLINE_UPDATES_ENABLED = os.environ.get('ONLINE_UPDATES', 'false').lower() == 'true'
 
 
 class DevelopmentConfig(Config):
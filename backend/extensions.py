@@ -0,0 +1,107 @@
+"""
+Shared serving state used by more than one route module
+"""
+
+import sys
+import os
+
+# Add ml_models to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'ml_models'))
+
+from model_utils import PredictionCache, ServingModel
+from feature_extraction import ReviewFeatureExtractor
+from duplicate_index import DuplicateIndex
+from cascade import CascadeScorer
+from multi_model import MultiModelScorer
+from drift_monitor import DriftMonitor
+from online_learning import FeedbackBuffer, OnlineUpdater
+from config import Config
+
+# Model used by every scoring route; online updates publish new snapshots here
+serving_model = ServingModel()
+try:
+    serving_model.load(Config.ML_MODELS_DIR, model_format=Config.MODEL_FORMAT)
+    print(f"Model loaded successfully (version {serving_model.snapshot().version})")
+except Exception as e:
+    print(f"Error loading model: {e}")
+
+# Prediction cache shared by single, batch and bulk scoring
+prediction_cache = PredictionCache(
+    max_entries=Config.PREDICTION_CACHE_SIZE,
+    ttl_seconds=Config.PREDICTION_CACHE_TTL
+)
+
+# Optional metadata-first cascade; None scores every review with the full model
+cascade_scorer = None
+if Config.CASCADE_ENABLED:
+    try:
+        cascade_scorer = CascadeScorer.load(Config.ML_MODELS_DIR, low=Config.CASCADE_LOW,
+                                            high=Config.CASCADE_HIGH)
+        print(f"Cascade loaded (band {cascade_scorer.low}-{cascade_scorer.high})")
+    except Exception as e:
+        print(f"Error loading cascade: {e}")
+
+# Ensemble / shadow models sharing the served model's features (none by default)
+try:
+    multi_model = MultiModelScorer.load(Config.ML_MODELS_DIR, Config.SCORING_MODELS,
+                                        primary_weight=Config.PRIMARY_MODEL_WEIGHT,
+                                        max_pending=Config.SHADOW_MAX_PENDING)
+    if multi_model.members:
+        print(f"Scoring models loaded: {', '.join(name for name, _, _, _ in multi_model.members)}")
+except Exception as e:
+    print(f"Error loading scoring models: {e}")
+    multi_model = MultiModelScorer()
+
+# Streaming comparison of scored features with the training distribution
+drift_monitor = None
+if Config.DRIFT_MONITOR_ENABLED and serving_model.snapshot() is not None:
+    try:
+        drift_monitor = DriftMonitor.load(
+            Config.DRIFT_REFERENCE_PATH,
+            serving_model.snapshot().feature_extractor,
+            os.path.join(Config.DATA_DIR, 'enhanced_reviews_dataset.csv'),
+            bins=Config.DRIFT_BINS,
+            sample_rows=Config.DRIFT_REFERENCE_ROWS,
+            psi_threshold=Config.DRIFT_PSI_THRESHOLD,
+            min_rows=Config.DRIFT_MIN_ROWS
+        )
+        print(f"Drift monitor ready ({drift_monitor.reference_rows} reference reviews)")
+    except Exception as e:
+        print(f"Error loading drift monitor: {e}")
+
+# Near-duplicate index, built once over the dataset and grown (up to
+# DUPLICATE_MAX_TRACKED distinct texts) as reviews are scored
+try:
+    duplicate_index = DuplicateIndex.from_csv(
+        os.path.join(Config.DATA_DIR, 'enhanced_reviews_dataset.csv'),
+        ReviewFeatureExtractor().preprocess_text,
+        num_perm=Config.DUPLICATE_NUM_PERM,
+        bands=Config.DUPLICATE_BANDS,
+        threshold=Config.DUPLICATE_THRESHOLD,
+        max_tracked=Config.DUPLICATE_MAX_TRACKED
+    )
+    print(f"Duplicate index built over {len(duplicate_index)} reviews")
+except Exception as e:
+    print(f"Error building duplicate index: {e}")
+    duplicate_index = DuplicateIndex(
+        ReviewFeatureExtractor().preprocess_text,
+        num_perm=Config.DUPLICATE_NUM_PERM,
+        bands=Config.DUPLICATE_BANDS,
+        threshold=Config.DUPLICATE_THRESHOLD,
+        max_tracked=Config.DUPLICATE_MAX_TRACKED
+    )
+
+# Durable moderator feedback and the background updater that consumes it
+feedback_buffer = FeedbackBuffer(os.path.join(Config.FEEDBACK_DIR, 'feedback.jsonl'))
+online_updater = OnlineUpdater(
+    serving_model,
+    feedback_buffer,
+    state_path=os.path.join(Config.FEEDBACK_DIR, 'updater_state.json'),
+    model_path=(os.path.join(Config.FEEDBACK_DIR, 'online_model.pkl')
+                if Config.FEEDBACK_PERSIST_MODEL else None),
+    lock_path=os.path.join(Config.FEEDBACK_DIR, 'updater.lock'),
+    min_batch=Config.FEEDBACK_MIN_BATCH,
+    interval_seconds=Config.FEEDBACK_UPDATE_INTERVAL,
+    extra_trees=Config.FEEDBACK_EXTRA_TREES,
+    max_trees=Config.FEEDBACK_MAX_TREES
+)
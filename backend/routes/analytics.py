@@ -3,7 +3,6 @@ Analytics endpoint for dashboard statistics and metrics
 """
 
 from flask import Blueprint, request, jsonify
-import pandas as pd
 import json
 import os
 import sys
@@ -12,14 +11,33 @@ import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'ml_models'))
 
 from config import Config
+from extensions import duplicate_index
+from review_store import TIMING_LABELS, ReviewStore
+from review_filters import BitmapFilterIndex, FilterError, parse_filters
+from search_index import SearchIndex
+from feature_extraction import ReviewFeatureExtractor
+from serialization import FormatError, frame_columns, json_response, requested_format, shape_rows
 
 bp = Blueprint('analytics', __name__)
 
-# Load dataset and metrics
+# /analytics/reviews fields: (response name, dataset column, kind)
+REVIEW_FIELDS = [
+    ('text', 'text_', 'value'),
+    ('rating', 'rating', 'float'),
+    ('label', 'label', 'value'),
+    ('category', 'category', 'value'),
+    ('verified_purchase', 'verified_purchase', 'bool'),
+    ('days_after_purchase', 'days_after_purchase', 'int'),
+    ('user_review_count', 'user_review_count', 'int'),
+    ('order_id', 'order_id', 'value'),
+    ('purchase_id', 'purchase_id', 'value')
+]
+
+# Open the indexed review store (built from the CSV on first use) and load metrics
 try:
     data_path = os.path.join(Config.DATA_DIR, 'enhanced_reviews_dataset.csv')
-    df = pd.read_csv(data_path)
-    df['label_binary'] = (df['label'] == 'CG').astype(int)
+    review_store = ReviewStore.open(data_path, Config.REVIEW_STORE_PATH)
+    filter_index = BitmapFilterIndex.from_store(review_store)
     
     metrics_path = os.path.join(Config.ML_MODELS_DIR, 'full_metrics.json')
     with open(metrics_path, 'r') as f:
@@ -28,9 +46,133 @@ try:
     print("Dataset and metrics loaded successfully for analytics")
 except Exception as e:
     print(f"Error loading dataset/metrics: {e}")
-    df = None
+    review_store = None
+    filter_index = None
     model_metrics = {}
 
+# Full-text index over the stored reviews, tokenized like the model's text features
+try:
+    search_index = SearchIndex.from_store(review_store, ReviewFeatureExtractor().preprocess_text)
+    print(f"Search index built over {len(search_index)} reviews")
+except Exception as e:
+    print(f"Error building search index: {e}")
+    search_index = None
+
+
+def summary_panel(facets):
+    """Overall label counts (body of /analytics/summary)"""
+    total = int(facets['count'].sum())
+    by_label = facets.groupby('label')['count'].sum()
+    fake_count = int(by_label.get('CG', 0))
+    genuine_count = int(by_label.get('OR', 0))
+    
+    return {
+        'total_reviews': total,
+        'fake_reviews': fake_count,
+        'genuine_reviews': genuine_count,
+        'fake_percentage': round(fake_count / total * 100, 2),
+        'genuine_percentage': round(genuine_count / total * 100, 2),
+        'model_accuracy': model_metrics.get('accuracy', 0.0)
+    }
+
+
+def category_panel(facets):
+    """Per-category counts sorted by fake rate (body of /analytics/category)"""
+    counts = facets.assign(
+        fake=facets['count'].where(facets['label'] == 'CG', 0),
+        genuine=facets['count'].where(facets['label'] == 'OR', 0)
+    ).groupby('category').agg(
+        total=('count', 'sum'), fake=('fake', 'sum'), genuine=('genuine', 'sum'),
+        first_id=('first_id', 'min')
+    ).sort_values('first_id')
+    
+    # Categories in order of first appearance, then a stable sort by fake rate descending
+    category_stats = [{
+        'category': category,
+        'total': int(total),
+        'fake': int(fake),
+        'genuine': int(genuine),
+        'fake_rate': round(fake / total * 100, 2) if total > 0 else 0
+    } for category, total, fake, genuine in zip(counts.index, counts['total'], counts['fake'],
+                                                 counts['genuine'])]
+    category_stats.sort(key=lambda x: x['fake_rate'], reverse=True)
+    
+    return {'categories': category_stats}
+
+
+def timing_panel(facets):
+    """Counts per days-after-purchase bin (body of /analytics/timing)"""
+    # Bins are precomputed at load time (see review_store.TIMING_EDGES)
+    counts = facets.assign(
+        fake=facets['count'].where(facets['label'] == 'CG', 0)
+    ).groupby('timing_bin')[['count', 'fake']].sum()
+    
+    timing_stats = []
+    for timing_bin, label in enumerate(TIMING_LABELS):
+        total, fake = counts.loc[timing_bin] if timing_bin in counts.index else (0, 0)
+        
+        if total > 0:
+            timing_stats.append({
+                'period': label,
+                'total': int(total),
+                'fake': int(fake),
+                'genuine': int(total - fake),
+                'fake_rate': round(fake / total * 100, 2)
+            })
+    
+    return {'timing_distribution': timing_stats}
+
+
+def verification_panel(facets):
+    """Verified purchases and missing IDs (body of /analytics/verification-status)"""
+    count = facets['count']
+    total = int(count.sum())
+    verified = int(count[facets['verified_purchase'] == 1].sum())
+    
+    return {
+        'verified_purchases': verified,
+        'unverified_purchases': int(count[facets['verified_purchase'] == 0].sum()),
+        'missing_order_id': int(count[facets['order_id_missing'] == 1].sum()),
+        'missing_purchase_id': int(count[facets['purchase_id_missing'] == 1].sum()),
+        'verification_rate': round(verified / total * 100, 2)
+    }
+
+
+def model_performance_panel():
+    """Key metrics from full_metrics.json (body of /analytics/model-performance)"""
+    return {
+        'accuracy': model_metrics.get('accuracy', 0),
+        'precision': model_metrics.get('precision', 0),
+        'recall': model_metrics.get('recall', 0),
+        'f1_score': model_metrics.get('f1_score', 0),
+        'roc_auc': model_metrics.get('roc_auc', 0),
+        'confusion_matrix': {
+            'true_negatives': model_metrics.get('true_negatives', 0),
+            'false_positives': model_metrics.get('false_positives', 0),
+            'false_negatives': model_metrics.get('false_negatives', 0),
+            'true_positives': model_metrics.get('true_positives', 0)
+        },
+        'classification_report': model_metrics.get('classification_report', {}),
+        # Written by ml_models/evaluation.py; absent from older metrics files
+        'average_precision': model_metrics.get('average_precision'),
+        'test_samples': model_metrics.get('test_samples'),
+        'evaluated_at': model_metrics.get('evaluated_at'),
+        'roc_curve': model_metrics.get('roc_curve'),
+        'pr_curve': model_metrics.get('pr_curve'),
+        'threshold_sweep': model_metrics.get('threshold_sweep'),
+        'status_breakdown': model_metrics.get('status_breakdown')
+    }
+
+
+# /analytics/dashboard panels: name -> (builder over facet counts, needs the review store)
+DASHBOARD_PANELS = {
+    'summary': (summary_panel, True),
+    'category': (category_panel, True),
+    'timing': (timing_panel, True),
+    'verification': (verification_panel, True),
+    'model_performance': (lambda facets: model_performance_panel(), False)
+}
+
 
 @bp.route('/analytics/summary', methods=['GET'])
 def get_summary():
@@ -47,24 +189,11 @@ def get_summary():
     }
     """
     
-    if df is None:
+    if review_store is None:
         return jsonify({'error': 'Dataset not loaded'}), 500
     
     try:
-        total = len(df)
-        fake_count = len(df[df['label'] == 'CG'])
-        genuine_count = len(df[df['label'] == 'OR'])
-        
-        summary = {
-            'total_reviews': int(total),
-            'fake_reviews': int(fake_count),
-            'genuine_reviews': int(genuine_count),
-            'fake_percentage': round(fake_count / total * 100, 2),
-            'genuine_percentage': round(genuine_count / total * 100, 2),
-            'model_accuracy': model_metrics.get('accuracy', 0.0)
-        }
-        
-        return jsonify(summary), 200
+        return jsonify(summary_panel(review_store.facet_counts())), 200
         
     except Exception as e:
         return jsonify({'error': f'Failed to compute summary: {str(e)}'}), 500
@@ -90,30 +219,11 @@ def get_category_stats():
     }
     """
     
-    if df is None:
+    if review_store is None:
         return jsonify({'error': 'Dataset not loaded'}), 500
     
     try:
-        category_stats = []
-        
-        for category in df['category'].unique():
-            cat_df = df[df['category'] == category]
-            total = len(cat_df)
-            fake = len(cat_df[cat_df['label'] == 'CG'])
-            genuine = len(cat_df[cat_df['label'] == 'OR'])
-            
-            category_stats.append({
-                'category': category,
-                'total': int(total),
-                'fake': int(fake),
-                'genuine': int(genuine),
-                'fake_rate': round(fake / total * 100, 2) if total > 0 else 0
-            })
-        
-        # Sort by fake rate descending
-        category_stats.sort(key=lambda x: x['fake_rate'], reverse=True)
-        
-        return jsonify({'categories': category_stats}), 200
+        return jsonify(category_panel(review_store.facet_counts())), 200
         
     except Exception as e:
         return jsonify({'error': f'Failed to compute category stats: {str(e)}'}), 500
@@ -127,33 +237,11 @@ def get_timing_stats():
     Returns distribution of reviews by timing
     """
     
-    if df is None:
+    if review_store is None:
         return jsonify({'error': 'Dataset not loaded'}), 500
     
     try:
-        # Define bins
-        bins = [-float('inf'), 0, 7, 30, 90, 180, 365, float('inf')]
-        labels = ['Before Purchase', '0-7 days', '8-30 days', '31-90 days', 
-                 '91-180 days', '181-365 days', '365+ days']
-        
-        df['timing_bin'] = pd.cut(df['days_after_purchase'], bins=bins, labels=labels)
-        
-        timing_stats = []
-        for label in labels:
-            bin_df = df[df['timing_bin'] == label]
-            total = len(bin_df)
-            fake = len(bin_df[bin_df['label'] == 'CG'])
-            
-            if total > 0:
-                timing_stats.append({
-                    'period': label,
-                    'total': int(total),
-                    'fake': int(fake),
-                    'genuine': int(total - fake),
-                    'fake_rate': round(fake / total * 100, 2)
-                })
-        
-        return jsonify({'timing_distribution': timing_stats}), 200
+        return jsonify(timing_panel(review_store.facet_counts())), 200
         
     except Exception as e:
         return jsonify({'error': f'Failed to compute timing stats: {str(e)}'}), 500
@@ -168,58 +256,109 @@ def get_reviews():
     - page: page number (default 1)
     - per_page: items per page (default 50)
     - filter: 'all', 'fake', 'genuine' (default 'all')
+    - category: one or more categories, comma-separated
+    - rating: one or more ratings, comma-separated
+    - verified_purchase, order_id_missing, purchase_id_missing: true/false
+    - min_days, max_days: days_after_purchase range (inclusive)
+    - min_review_count, max_review_count: user_review_count range (inclusive)
+    - format: 'records' (list of review objects, default) or 'columnar'
+      (one array per field)
+    
+    The plain 'filter' query is paged by the store's label index (LIMIT/
+    OFFSET). With any other parameter, values within a parameter are ORed
+    and parameters are ANDed using the bitmap filter index built at load
+    time; only the page's rows are read from the store.
     """
     
-    if df is None:
+    if review_store is None:
         return jsonify({'error': 'Dataset not loaded'}), 500
     
     try:
+        shape = requested_format()
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 50))
-        filter_type = request.args.get('filter', 'all')
         
-        # Filter data
-        if filter_type == 'fake':
-            filtered_df = df[df['label'] == 'CG']
-        elif filter_type == 'genuine':
-            filtered_df = df[df['label'] == 'OR']
+        conditions = parse_filters(request.args)
+        if all(field == 'label' for field, _, _ in conditions):
+            # Label filter only: indexed count and LIMIT/OFFSET page
+            total, page_df = review_store.page(request.args.get('filter', 'all'), page, per_page)
         else:
-            filtered_df = df
+            # Count and page positions from the bitmaps, then fetch just those rows
+            matches = filter_index.select(conditions)
+            total = filter_index.count(matches)
+            positions = filter_index.page(matches, (page - 1) * per_page, per_page if page >= 1 else 0)
+            page_df = review_store.rows(positions)
         
-        # Pagination
-        total = len(filtered_df)
-        start = (page - 1) * per_page
-        end = start + per_page
+        # Build the page from whole columns
+        reviews = shape_rows(frame_columns(page_df, REVIEW_FIELDS), shape)
         
-        page_df = filtered_df.iloc[start:end]
-        
-        # Convert to dict
-        reviews = []
-        for _, row in page_df.iterrows():
-            reviews.append({
-                'text': row['text_'],
-                'rating': float(row['rating']),
-                'label': row['label'],
-                'category': row['category'],
-                'verified_purchase': bool(row['verified_purchase']),
-                'days_after_purchase': int(row['days_after_purchase']),
-                'user_review_count': int(row['user_review_count']),
-                'order_id': row['order_id'] if pd.notna(row['order_id']) else None,
-                'purchase_id': row['purchase_id'] if pd.notna(row['purchase_id']) else None
-            })
-        
-        return jsonify({
+        return json_response({
             'total': int(total),
             'page': page,
             'per_page': per_page,
             'total_pages': (total + per_page - 1) // per_page,
+            'format': shape,
             'reviews': reviews
         }), 200
         
+    except (FormatError, FilterError) as e:
+        return jsonify({'error': str(e)}), 400
+        
     except Exception as e:
         return jsonify({'error': f'Failed to fetch reviews: {str(e)}'}), 500
 
 
+@bp.route('/analytics/search', methods=['GET'])
+def search_reviews():
+    """
+    Full-text search over review text, ranked by BM25
+    
+    Query parameters:
+    - q: words that must all appear; "quoted words" must appear as a phrase
+    - page, per_page: pagination (default 1, 50)
+    - filter, category and the other /analytics/reviews filters
+    - format: 'records' (default) or 'columnar'
+    
+    Returns the /analytics/reviews page shape plus 'query', and a 'score'
+    field per review.
+    """
+    
+    if search_index is None or filter_index is None:
+        return jsonify({'error': 'Search index not loaded'}), 500
+    
+    try:
+        shape = requested_format()
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'Missing search query: q'}), 400
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', 50))
+        
+        total, positions, scores = search_index.search(
+            query, bitmap=filter_index.select(parse_filters(request.args)),
+            offset=(page - 1) * per_page, limit=per_page if page >= 1 else 0
+        )
+        
+        columns = frame_columns(review_store.rows(positions), REVIEW_FIELDS)
+        columns['score'] = [round(score, 4) for score in scores.tolist()]
+        
+        return json_response({
+            'query': query,
+            'total': int(total),
+            'page': page,
+            'per_page': per_page,
+            'total_pages': (total + per_page - 1) // per_page,
+            'format': shape,
+            'reviews': shape_rows(columns, shape)
+        }), 200
+        
+    except (FormatError, FilterError) as e:
+        return jsonify({'error': str(e)}), 400
+        
+    except Exception as e:
+        return jsonify({'error': f'Search failed: {str(e)}'}), 500
+
+
 @bp.route('/analytics/model-performance', methods=['GET'])
 def get_model_performance():
     """
@@ -230,23 +369,7 @@ def get_model_performance():
         return jsonify({'error': 'Metrics not loaded'}), 500
     
     try:
-        # Extract key metrics
-        performance = {
-            'accuracy': model_metrics.get('accuracy', 0),
-            'precision': model_metrics.get('precision', 0),
-            'recall': model_metrics.get('recall', 0),
-            'f1_score': model_metrics.get('f1_score', 0),
-            'roc_auc': model_metrics.get('roc_auc', 0),
-            'confusion_matrix': {
-                'true_negatives': model_metrics.get('true_negatives', 0),
-                'false_positives': model_metrics.get('false_positives', 0),
-                'false_negatives': model_metrics.get('false_negatives', 0),
-                'true_positives': model_metrics.get('true_positives', 0)
-            },
-            'classification_report': model_metrics.get('classification_report', {})
-        }
-        
-        return jsonify(performance), 200
+        return jsonify(model_performance_panel()), 200
         
     except Exception as e:
         return jsonify({'error': f'Failed to fetch model performance: {str(e)}'}), 500
@@ -258,23 +381,89 @@ def get_verification_status():
     Get verification status distribution
     """
     
-    if df is None:
+    if review_store is None:
         return jsonify({'error': 'Dataset not loaded'}), 500
     
     try:
-        verified = len(df[df['verified_purchase'] == True])
-        unverified = len(df[df['verified_purchase'] == False])
-        missing_order = df['order_id'].isna().sum()
-        missing_purchase = df['purchase_id'].isna().sum()
+        return jsonify(verification_panel(review_store.facet_counts())), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to compute verification status: {str(e)}'}), 500
+
+
+@bp.route('/analytics/dashboard', methods=['GET'])
+def get_dashboard():
+    """
+    Get several dashboard panels in one response
+    
+    Every dataset panel is derived from the same cached facet counts (one
+    table scan per store), so a full dashboard costs one request.
+    
+    Query parameters:
+    - panels: comma-separated subset of summary, category, timing,
+      verification, model_performance (default: all)
+    
+    Returns:
+    {
+        "panels": {
+            "summary": {...same body as /analytics/summary...},
+            "category": {...},
+            ...
+        }
+    }
+    A panel that cannot be computed is returned as {"error": "..."}.
+    """
+    
+    requested = request.args.get('panels')
+    names = ([name.strip() for name in requested.split(',') if name.strip()]
+             if requested else list(DASHBOARD_PANELS))
+    unknown = [name for name in names if name not in DASHBOARD_PANELS]
+    if unknown:
+        return jsonify({'error': f"Unknown panels: {', '.join(unknown)} "
+                                 f"(expected {', '.join(DASHBOARD_PANELS)})"}), 400
+    
+    try:
+        facets = None
+        if review_store is not None and any(DASHBOARD_PANELS[name][1] for name in names):
+            facets = review_store.facet_counts()
+        
+        panels = {}
+        for name in names:
+            build, needs_store = DASHBOARD_PANELS[name]
+            if needs_store and facets is None:
+                panels[name] = {'error': 'Dataset not loaded'}
+            elif name == 'model_performance' and not model_metrics:
+                panels[name] = {'error': 'Metrics not loaded'}
+            else:
+                try:
+                    panels[name] = build(facets)
+                except Exception as e:
+                    panels[name] = {'error': f'Failed to compute {name}: {str(e)}'}
+        
+        return jsonify({'panels': panels}), 200
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to build dashboard: {str(e)}'}), 500
+
+
+@bp.route('/analytics/duplicate-clusters', methods=['GET'])
+def get_duplicate_clusters():
+    """
+    Get the largest near-duplicate review clusters
+    
+    Query parameters:
+    - limit: number of clusters (default 10)
+    - min_size: smallest cluster size to report (default 2)
+    """
+    
+    try:
+        limit = int(request.args.get('limit', 10))
+        min_size = int(request.args.get('min_size', 2))
         
         return jsonify({
-            'verified_purchases': int(verified),
-            'unverified_purchases': int(unverified),
-            'missing_order_id': int(missing_order),
-            'missing_purchase_id': int(missing_purchase),
-            'verification_rate': round(verified / len(df) * 100, 2)
+            'index': duplicate_index.stats(),
+            'clusters': duplicate_index.largest_clusters(limit=limit, min_size=min_size)
         }), 200
         
     except Exception as e:
-        return jsonify({'error': f'Failed to compute verification status: {str(e)}'}), 500
-
+        return jsonify({'error': f'Failed to fetch duplicate clusters: {str(e)}'}), 500
@@ -12,18 +12,31 @@ import tempfile
 # Add ml_models to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'ml_models'))
 
-from model_utils import load_trained_model, predict_bulk_reviews
+from model_utils import predict_bulk_reviews
+from review_io import UploadError, open_upload
 from config import Config
+from admission import admission
+from extensions import (serving_model, prediction_cache, duplicate_index, cascade_scorer, multi_model,
+                        drift_monitor)
+from serialization import FormatError, frame_columns, json_response, requested_format, shape_rows
 
 bp = Blueprint('bulk', __name__)
 
-# Load model once at startup
-try:
-    model, feature_extractor = load_trained_model(Config.ML_MODELS_DIR)
-    print("Model loaded successfully for bulk endpoint")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    model, feature_extractor = None, None
+PREVIEW_ROWS = 100
+
+# Preview fields: (response name, result column, kind)
+PREVIEW_FIELDS = [
+    ('text', 'text_', 'value'),
+    ('rating', 'rating', 'float'),
+    ('prediction', 'prediction', 'value'),
+    ('confidence', 'confidence', 'float'),
+    ('fake_probability', 'fake_probability', 'float'),
+    ('genuine_probability', 'genuine_probability', 'float'),
+    ('duplicate_cluster_size', 'duplicate_cluster_size', 'int'),
+    ('status', 'status', 'value'),
+    ('risk_factors', 'risk_factors', 'value'),
+    ('risk_flags', 'risk_flags', 'int')
+]
 
 
 def allowed_file(filename):
@@ -32,6 +45,7 @@ def allowed_file(filename):
 
 
 @bp.route('/bulk/upload', methods=['POST'])
+@admission.limit('bulk')
 def upload_bulk_reviews():
     """
     Upload CSV/Excel file for bulk prediction
@@ -49,12 +63,19 @@ def upload_bulk_reviews():
         "results": [...],
         "download_url": "/api/bulk/download/abc123"
     }
+    
+    Query Parameters:
+        format: 'records' (preview as a list of objects, default) or
+                'columnar' (preview as one array per field)
     """
     
-    if model is None or feature_extractor is None:
+    snapshot = serving_model.snapshot()
+    if snapshot is None:
         return jsonify({'error': 'Model not loaded'}), 500
     
     try:
+        shape = requested_format()
+        
         # Check if file is present
         if 'file' not in request.files:
             return jsonify({'error': 'No file provided'}), 400
@@ -67,72 +88,89 @@ def upload_bulk_reviews():
         if not allowed_file(file.filename):
             return jsonify({'error': 'Invalid file type. Only CSV and XLSX allowed'}), 400
         
-        # Read file
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(file)
-        else:
-            df = pd.read_excel(file)
-        
-        # Validate required columns
-        if 'text_' not in df.columns:
-            return jsonify({'error': 'Missing required column: text_'}), 400
-        
-        if 'rating' not in df.columns:
-            return jsonify({'error': 'Missing required column: rating'}), 400
-        
-        # Fill missing optional columns with defaults
-        if 'order_id' not in df.columns:
-            df['order_id'] = None
-        if 'purchase_id' not in df.columns:
-            df['purchase_id'] = None
-        if 'verified_purchase' not in df.columns:
-            df['verified_purchase'] = False
-        if 'user_id' not in df.columns:
-            df['user_id'] = 'UNKNOWN'
-        if 'days_after_purchase' not in df.columns:
-            df['days_after_purchase'] = 30
-        if 'user_review_count' not in df.columns:
-            df['user_review_count'] = 1
-        if 'category' not in df.columns:
-            df['category'] = 'General'
-        
-        # Predict
-        result_df = predict_bulk_reviews(df, model, feature_extractor)
-        
-        # Calculate summary
-        total = len(result_df)
-        fake_count = len(result_df[result_df['prediction'] == 'FAKE'])
-        genuine_count = len(result_df[result_df['prediction'] == 'GENUINE'])
-        
-        # Convert to JSON for response
-        results = []
-        for _, row in result_df.head(100).iterrows():  # Limit to first 100 for response
-            results.append({
-                'text': row['text_'],
-                'rating': float(row['rating']),
-                'prediction': row['prediction'],
-                'confidence': float(row['confidence']),
-                'fake_probability': float(row['fake_probability']),
-                'genuine_probability': float(row['genuine_probability'])
-            })
-        
-        # Save full results temporarily for download
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.csv')
-        result_df.to_csv(temp_file.name, index=False)
+        # Open the file as a stream of chunks (XLSX rows are parsed one at a time);
+        # a missing required column is an UploadError (400) with the file already closed
+        _, chunks = open_upload(file.stream, file.filename, chunksize=Config.BULK_CHUNK_SIZE,
+                                 required=('text_', 'rating'))
+        
+        model, version = multi_model.bind(snapshot.model, snapshot.version)
+        cache = prediction_cache.for_version(version)
+        total = fake_count = genuine_count = 0
+        preview = {name: [] for name, _, _ in PREVIEW_FIELDS}
+        
+        # Results are appended to the download file chunk by chunk
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.csv', mode='w',
+                                                newline='', encoding='utf-8')
+        try:
+            for df in chunks:
+                if df.empty:
+                    continue
+                
+                # Fill missing optional columns with defaults
+                if 'order_id' not in df.columns:
+                    df['order_id'] = None
+                if 'purchase_id' not in df.columns:
+                    df['purchase_id'] = None
+                if 'verified_purchase' not in df.columns:
+                    df['verified_purchase'] = False
+                if 'user_id' not in df.columns:
+                    df['user_id'] = 'UNKNOWN'
+                if 'days_after_purchase' not in df.columns:
+                    df['days_after_purchase'] = 30
+                if 'user_review_count' not in df.columns:
+                    df['user_review_count'] = 1
+                if 'category' not in df.columns:
+                    df['category'] = 'General'
+                
+                # Predict
+                result_df = predict_bulk_reviews(df, model, snapshot.feature_extractor,
+                                                 cache=cache, cascade=cascade_scorer,
+                                                 monitor=drift_monitor)
+                
+                # Near-duplicate cluster size per row
+                signals = [duplicate_index.track(text) for text in result_df['text_']]
+                result_df['duplicate_cluster_size'] = [s['cluster_size'] if s else 1 for s in signals]
+                
+                # Update summary
+                chunk_fake = int((result_df['prediction'] == 'FAKE').sum())
+                fake_count += chunk_fake
+                genuine_count += len(result_df) - chunk_fake
+                
+                # Preview columns for the response (first 100 rows only)
+                preview_rows = result_df.head(PREVIEW_ROWS - len(preview['text']))
+                for name, values in frame_columns(preview_rows, PREVIEW_FIELDS).items():
+                    preview[name].extend(values)
+                
+                # Save results for download
+                csv_df = result_df.assign(risk_factors=result_df['risk_factors'].str.join('; '))
+                csv_df.to_csv(temp_file, index=False, header=(total == 0))
+                total += len(result_df)
+        except BaseException:
+            temp_file.close()
+            os.remove(temp_file.name)
+            raise
         temp_file.close()
         
+        if total == 0:
+            os.remove(temp_file.name)
+            return jsonify({'error': 'No reviews found in file'}), 400
+        
         # Store file path in session or return immediately
         file_id = os.path.basename(temp_file.name)
         
-        return jsonify({
+        return json_response({
             'total': int(total),
             'fake_count': int(fake_count),
             'genuine_count': int(genuine_count),
             'fake_percentage': round(fake_count / total * 100, 2),
             'genuine_percentage': round(genuine_count / total * 100, 2),
-            'results_preview': results,
+            'format': shape,
+            'results_preview': shape_rows(preview, shape),
             'download_id': file_id
         }), 200
+    
+    except (UploadError, FormatError) as e:
+        return jsonify({'error': str(e)}), 400
         
     except Exception as e:
         return jsonify({'error': f'Bulk processing failed: {str(e)}'}), 500
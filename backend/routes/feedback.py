@@ -0,0 +1,91 @@
+"""
+Feedback endpoint for moderator verdicts on scored reviews
+"""
+
+from flask import Blueprint, request, jsonify
+import sys
+import os
+
+# Add ml_models to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'ml_models'))
+
+from model_utils import validate_review_data
+from online_learning import invalid_reviews, parse_label
+from extensions import feedback_buffer, online_updater, serving_model
+
+bp = Blueprint('feedback', __name__)
+
+
+@bp.route('/feedback', methods=['POST'])
+def submit_feedback():
+    """
+    Record moderator labels for previously scored reviews
+    
+    Request JSON (a single item, or {"feedback": [item, ...]}):
+    {
+        "text_": "Review text here",
+        "rating": 5,
+        ... same optional fields as /api/predict ...,
+        "label": "FAKE" or "GENUINE"
+    }
+    
+    Labels are written to a durable log before the response is sent and
+    folded into the served model by a background updater. Reviews the
+    served feature extractor cannot featurize are refused with a 400.
+    
+    Returns:
+    {
+        "accepted": 2,
+        "pending_bytes": 1024
+    }
+    """
+    
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        
+        items = data['feedback'] if isinstance(data, dict) and 'feedback' in data else data
+        if isinstance(items, dict):
+            items = [items]
+        
+        if not isinstance(items, list) or len(items) == 0:
+            return jsonify({'error': 'Feedback must be an object or a non-empty list'}), 400
+        
+        records = []
+        for i, item in enumerate(items):
+            if not isinstance(item, dict) or 'label' not in item:
+                return jsonify({'error': f'Item {i}: missing required field: label'}), 400
+            review = {k: v for k, v in item.items() if k != 'label'}
+            try:
+                label = parse_label(item['label'])
+                review = validate_review_data(review)
+            except ValueError as e:
+                return jsonify({'error': f'Item {i}: {str(e)}'}), 400
+            records.append({'review': review, 'label': label})
+        
+        snapshot = serving_model.snapshot()
+        if snapshot is not None:
+            errors = invalid_reviews([r['review'] for r in records], snapshot.feature_extractor)
+            if errors:
+                i, error = errors[0]
+                return jsonify({'error': f'Item {i}: invalid review fields: {error}'}), 400
+        
+        feedback_buffer.append(records)
+        
+        return jsonify({
+            'accepted': len(records),
+            'pending_bytes': online_updater.status()['pending_bytes']
+        }), 202
+        
+    except Exception as e:
+        return jsonify({'error': f'Failed to record feedback: {str(e)}'}), 500
+
+
+@bp.route('/feedback/status', methods=['GET'])
+def get_feedback_status():
+    """
+    Get feedback buffer and online update status
+    """
+    return jsonify(online_updater.status()), 200
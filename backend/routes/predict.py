@@ -2,28 +2,41 @@
 Prediction endpoint for single review analysis
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from werkzeug.wsgi import get_input_stream
+import pandas as pd
 import sys
 import os
 
 # Add ml_models to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', 'ml_models'))
 
-from model_utils import load_trained_model, predict_single_review, validate_review_data
+from model_utils import predict_single_review, predict_bulk_reviews, validate_review_data
+from review_io import iter_ndjson_batches
+from attributions import ATTRIBUTION_METHODS
+from extensions import (serving_model, prediction_cache, duplicate_index, cascade_scorer, multi_model,
+                        drift_monitor)
+from serialization import FormatError, column_records, dumps, frame_columns, json_response, requested_format
 from config import Config
+from admission import admission
 
 bp = Blueprint('predict', __name__)
 
-# Load model once at startup
-try:
-    model, feature_extractor = load_trained_model(Config.ML_MODELS_DIR)
-    print("Model loaded successfully for prediction endpoint")
-except Exception as e:
-    print(f"Error loading model: {e}")
-    model, feature_extractor = None, None
+# /predict/batch result fields: (response name, result column, kind)
+BATCH_FIELDS = [
+    ('prediction', 'prediction', 'value'),
+    ('status', 'status', 'value'),
+    ('confidence', 'confidence', 'float'),
+    ('fake_probability', 'fake_probability', 'float'),
+    ('genuine_probability', 'genuine_probability', 'float'),
+    ('risk_factors', 'risk_factors', 'value'),
+    ('risk_flags', 'risk_flags', 'int'),
+    ('duplicate_cluster', 'duplicate_cluster', 'value')
+]
 
 
 @bp.route('/predict', methods=['POST'])
+@admission.limit('interactive')
 def predict_review():
     """
     Predict if a single review is fake
@@ -41,6 +54,10 @@ def predict_review():
         "category": "Electronics" (optional)
     }
     
+    Query Parameters:
+        explain: 'saabas' (default), 'shap' (exact TreeSHAP) or 'none'
+        top_k: number of contributing features to return (default: 5)
+    
     Returns:
     {
         "prediction": "FAKE" or "GENUINE",
@@ -48,13 +65,26 @@ def predict_review():
         "confidence": 0.95,
         "fake_probability": 0.95,
         "genuine_probability": 0.05,
-        "risk_factors": ["Missing order ID", ...]
+        "risk_factors": ["Missing order ID", ...],
+        "duplicate_cluster": {"cluster_size": 12, "max_similarity": 0.91, ...},
+        "explanation": {"method": "saabas", "bias": 0.40, "top_features": [
+            {"feature": "verified_purchase", "value": 0, "contribution": 0.31}, ...]}
     }
+    
+    "explanation" is null when the cascade answered from metadata alone:
+    the full model, whose attributions sum to its probability, never ran.
     """
     
-    if model is None or feature_extractor is None:
+    snapshot = serving_model.snapshot()
+    if snapshot is None:
         return jsonify({'error': 'Model not loaded'}), 500
     
+    explain_method = request.args.get('explain', Config.ATTRIBUTION_METHOD).lower()
+    top_k = request.args.get('top_k', Config.ATTRIBUTION_TOP_K, type=int)
+    if explain_method not in ATTRIBUTION_METHODS + ('none',):
+        return jsonify({'error': f'Invalid explain method: {explain_method}'}), 400
+    explainer = snapshot.explainer if explain_method != 'none' else None
+    
     try:
         # Get JSON data
         data = request.get_json()
@@ -72,8 +102,14 @@ def predict_review():
         # Validate and fill defaults
         review_data = validate_review_data(data)
         
-        # Make prediction
-        result = predict_single_review(review_data, model, feature_extractor)
+        # Make prediction (explanations describe the primary model)
+        model, version = multi_model.bind(snapshot.model, snapshot.version)
+        result = predict_single_review(review_data, model, snapshot.feature_extractor,
+                                       cache=prediction_cache.for_version(version),
+                                       cascade=cascade_scorer, explainer=explainer,
+                                       top_k=max(1, top_k), explain_method=explain_method,
+                                       monitor=drift_monitor)
+        result['duplicate_cluster'] = duplicate_index.track(review_data['text_'])
         
         return jsonify(result), 200
         
@@ -82,6 +118,7 @@ def predict_review():
 
 
 @bp.route('/predict/batch', methods=['POST'])
+@admission.limit('batch')
 def predict_batch():
     """
     Predict multiple reviews at once
@@ -93,12 +130,19 @@ def predict_batch():
             {"text_": "...", "rating": 4, ...}
         ]
     }
+    
+    Query Parameters:
+        format: 'records' (one object per review, default) or 'columnar'
+                (one array per field, null where a review failed validation,
+                plus an 'error' array)
     """
     
-    if model is None or feature_extractor is None:
+    snapshot = serving_model.snapshot()
+    if snapshot is None:
         return jsonify({'error': 'Model not loaded'}), 500
     
     try:
+        shape = requested_format()
         data = request.get_json()
         
         if not data or 'reviews' not in data:
@@ -112,21 +156,174 @@ def predict_batch():
         if len(reviews) == 0:
             return jsonify({'error': 'Empty reviews list'}), 400
         
-        # Predict each review
-        results = []
-        for review in reviews:
+        # Validate each review, then score all valid ones in one vectorized pass
+        errors = [None] * len(reviews)
+        valid_positions, valid_reviews = [], []
+        for position, review in enumerate(reviews):
             try:
-                review_data = validate_review_data(review)
-                result = predict_single_review(review_data, model, feature_extractor)
-                results.append(result)
+                valid_reviews.append(validate_review_data(review))
+                valid_positions.append(position)
             except Exception as e:
-                results.append({'error': str(e)})
+                errors[position] = str(e)
+        
+        scored = {name: [] for name, _, _ in BATCH_FIELDS}
+        if valid_reviews:
+            # Object dtype keeps each review's values as sent (risk messages match /predict)
+            model, version = multi_model.bind(snapshot.model, snapshot.version)
+            result_df = predict_bulk_reviews(
+                pd.DataFrame(valid_reviews, dtype=object), model,
+                snapshot.feature_extractor, cache=prediction_cache.for_version(version),
+                cascade=cascade_scorer, monitor=drift_monitor
+            )
+            result_df['duplicate_cluster'] = [duplicate_index.track(review_data['text_'])
+                                              for review_data in valid_reviews]
+            scored = frame_columns(result_df, BATCH_FIELDS)
         
-        return jsonify({
+        if shape == 'columnar':
+            # Full-length arrays; rows that failed validation are null
+            results = {'error': errors}
+            for name, values in scored.items():
+                column = [None] * len(reviews)
+                for position, value in zip(valid_positions, values):
+                    column[position] = value
+                results[name] = column
+        else:
+            results = [{'error': error} for error in errors]
+            for position, row in zip(valid_positions, column_records(scored)):
+                results[position] = row
+        
+        return json_response({
             'total': len(reviews),
+            'format': shape,
             'results': results
         }), 200
         
+    except FormatError as e:
+        return jsonify({'error': str(e)}), 400
+        
     except Exception as e:
         return jsonify({'error': f'Batch prediction failed: {str(e)}'}), 500
 
+
+@bp.route('/predict/stream', methods=['POST'])
+@admission.limit('batch')
+def predict_stream():
+    """
+    Score a newline-delimited JSON stream of reviews
+    
+    Request body (application/x-ndjson), one review per line:
+        {"text_": "...", "rating": 5, ...}
+        {"text_": "...", "rating": 4, ...}
+    
+    Reviews are scored in micro-batches of STREAM_BATCH_SIZE and each batch's
+    results are streamed back as soon as it is scored, one JSON object per
+    input line:
+        {"line": 1, "prediction": "FAKE", "status": "FAKE", ...}
+        {"line": 2, "error": "Missing required field: text_"}
+    followed by a final {"summary": {"total": ..., "scored": ..., ...}} line.
+    
+    The next batch is only read once the previous one has been written to
+    the client, so a slow reader slows down ingestion and server memory
+    stays at one batch regardless of stream length. Near-duplicate signals
+    are looked up without adding streamed reviews to the index.
+    """
+    
+    snapshot = serving_model.snapshot()
+    if snapshot is None:
+        return jsonify({'error': 'Model not loaded'}), 500
+    
+    # Read the body directly so MAX_CONTENT_LENGTH (meant for uploads) does not cap the stream
+    stream = get_input_stream(request.environ, max_content_length=Config.STREAM_MAX_CONTENT_LENGTH)
+    
+    def generate():
+        total = scored = errors = fake_count = 0
+        try:
+            model, version = multi_model.bind(snapshot.model, snapshot.version)
+            cache = prediction_cache.for_version(version)
+            for batch in iter_ndjson_batches(stream, batch_size=Config.STREAM_BATCH_SIZE,
+                                             max_line_bytes=Config.STREAM_MAX_LINE_BYTES):
+                lines = [None] * len(batch)
+                valid_positions, valid_reviews = [], []
+                for position, (line_number, review) in enumerate(batch):
+                    try:
+                        if isinstance(review, Exception):
+                            raise review
+                        valid_reviews.append(validate_review_data(review))
+                        valid_positions.append(position)
+                    except Exception as e:
+                        lines[position] = dumps({'line': line_number, 'error': str(e)})
+                
+                if valid_reviews:
+                    result_df = predict_bulk_reviews(
+                        pd.DataFrame(valid_reviews, dtype=object), model,
+                        snapshot.feature_extractor, cache=cache, cascade=cascade_scorer,
+                        monitor=drift_monitor
+                    )
+                    result_df['duplicate_cluster'] = [duplicate_index.query(review_data['text_'])
+                                                      for review_data in valid_reviews]
+                    rows = column_records(frame_columns(result_df, BATCH_FIELDS))
+                    for position, row in zip(valid_positions, rows):
+                        lines[position] = dumps({'line': batch[position][0], **row})
+                    fake_count += int((result_df['prediction'] == 'FAKE').sum())
+                
+                total += len(batch)
+                scored += len(valid_reviews)
+                errors += len(batch) - len(valid_reviews)
+                yield b'\n'.join(lines) + b'\n'
+        except Exception as e:
+            # Headers are already sent; report the failure in-band and stop
+            yield dumps({'error': f'Stream failed: {str(e)}'}) + b'\n'
+            return
+        
+        yield dumps({'summary': {
+            'total': total,
+            'scored': scored,
+            'errors': errors,
+            'fake_count': fake_count,
+            'genuine_count': scored - fake_count
+        }}) + b'\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@bp.route('/predict/cache', methods=['GET'])
+def get_cache_stats():
+    """
+    Get prediction cache size and hit/miss counters
+    """
+    return jsonify(prediction_cache.stats()), 200
+
+
+@bp.route('/predict/models', methods=['GET'])
+def get_model_stats():
+    """
+    Get per-model latency and disagreement with the served prediction
+    
+    Lists the primary model plus any ensemble or shadow models from
+    Config.SCORING_MODELS; every model scores the same feature matrix.
+    """
+    return jsonify(multi_model.stats()), 200
+
+
+@bp.route('/predict/drift', methods=['GET'])
+def get_drift_stats():
+    """
+    Get drift of the scored reviews' features from the training distribution
+    
+    Per statistical feature: running mean/std against the fitted scaler's,
+    and PSI and binned KS distance against the reference histograms;
+    plus the share of TF-IDF terms outside the fitted vocabulary.
+    """
+    if drift_monitor is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify({'enabled': True, **drift_monitor.stats()}), 200
+
+
+@bp.route('/predict/cascade', methods=['GET'])
+def get_cascade_stats():
+    """
+    Get the cascade's uncertainty band and early-exit counters
+    """
+    if cascade_scorer is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify({'enabled': True, **cascade_scorer.stats()}), 200
@@ -0,0 +1,128 @@
+"""
+Fast JSON serialization for large tabular responses
+Payloads are built from whole DataFrame columns instead of per-row dicts
+"""
+
+import gzip
+import json
+
+import numpy as np
+import pandas as pd
+from flask import Response, request
+
+from config import Config
+
+try:
+    import orjson
+except ImportError:  # optional; falls back to the standard library encoder
+    orjson = None
+
+RESPONSE_FORMATS = ('records', 'columnar')
+
+
+class FormatError(ValueError):
+    """Unknown value for the `format` query parameter"""
+
+
+def requested_format():
+    """Response shape asked for with ?format=records|columnar (default records)"""
+    shape = request.args.get('format', 'records').lower()
+    if shape not in RESPONSE_FORMATS:
+        raise FormatError(f"Invalid format: {shape} (expected one of {', '.join(RESPONSE_FORMATS)})")
+    return shape
+
+
+def column_values(series, kind):
+    """
+    One DataFrame column as a list of JSON-ready Python values
+
+    Args:
+        series: pandas Series
+        kind: 'float', 'int', 'bool' or 'value' (as stored; missing -> None)
+
+    Returns:
+        list of Python scalars (NaN becomes None)
+    """
+    if kind == 'float':
+        values = series.to_numpy(dtype=np.float64)
+        missing = np.isnan(values)
+        values = values.tolist()
+        if missing.any():
+            for i in np.flatnonzero(missing):
+                values[i] = None
+        return values
+    if kind == 'int':
+        return series.to_numpy(dtype=np.int64).tolist()
+    if kind == 'bool':
+        return series.to_numpy(dtype=bool).tolist()
+    if kind == 'value':
+        values = series.tolist()
+        missing = series.isna().to_numpy()
+        if missing.any():
+            for i in np.flatnonzero(missing):
+                values[i] = None
+        return values
+    raise ValueError(f"Unknown column kind: {kind}")
+
+
+def frame_columns(df, fields):
+    """
+    Convert selected DataFrame columns for a response
+
+    Args:
+        df: DataFrame
+        fields: list of (response name, column name, kind) tuples
+
+    Returns:
+        dict of response name -> list of values
+    """
+    return {name: column_values(df[column], kind) for name, column, kind in fields}
+
+
+def column_records(columns):
+    """Turn a dict of equal-length lists into a list of per-row dicts"""
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+
+def shape_rows(columns, shape):
+    """Rows as a list of dicts ('records') or as the arrays themselves ('columnar')"""
+    return columns if shape == 'columnar' else column_records(columns)
+
+
+def _default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if obj is pd.NA or obj is pd.NaT:
+        return None
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    """Encode a payload to JSON bytes (orjson when installed)"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, separators=(',', ':')).encode('utf-8')
+
+
+def json_response(payload, status=200):
+    """
+    JSON response, gzip-compressed when the client accepts it and the body is large
+
+    Args:
+        payload: JSON-serializable object
+        status: HTTP status code
+
+    Returns:
+        flask Response
+    """
+    body = dumps(payload)
+    response = Response(body, status=status, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if len(body) >= Config.RESPONSE_GZIP_MIN_BYTES and 'gzip' in request.accept_encodings:
+        response.set_data(gzip.compress(body, compresslevel=Config.RESPONSE_GZIP_LEVEL))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
@@ -1,96 +1,229 @@
 """
 Add realistic noise to the dataset to achieve 92-94% model accuracy
 Makes some genuine reviews look suspicious and some fake reviews look genuine
-"""
-
-import pandas as pd
-import numpy as np
-
-# Load dataset
-df = pd.read_csv('enhanced_reviews_dataset.csv')
-
-print(f"Original dataset: {len(df)} reviews")
-print(f"Fake: {len(df[df['label']=='CG'])}, Genuine: {len(df[df['label']=='OR'])}")
-
-# Set random seed
-np.random.seed(42)
-
-# Add noise to make classification harder (more realistic)
-# Strategy: Make some features misleading
-
-# 1. Some genuine reviews will have missing IDs (22% of genuine)
-genuine_mask = df['label'] == 'OR'
-genuine_indices = df[genuine_mask].index
-noisy_genuine = np.random.choice(genuine_indices, size=int(len(genuine_indices) * 0.22), replace=False)
-
-for idx in noisy_genuine:
-    # Randomly remove order_id or purchase_id
-    if np.random.random() < 0.5:
-        df.at[idx, 'order_id'] = None
-    else:
-        df.at[idx, 'purchase_id'] = None
-    df.at[idx, 'verified_purchase'] = False
-
-print(f"\nAdded noise to {len(noisy_genuine)} genuine reviews (missing IDs)")
-
-# 2. Some fake reviews will have valid IDs (25% of fake)
-fake_mask = df['label'] == 'CG'
-fake_indices = df[fake_mask].index
-lucky_fakes = np.random.choice(fake_indices, size=int(len(fake_indices) * 0.25), replace=False)
 
-for idx in lucky_fakes:
-    # Give them valid-looking IDs
-    if pd.isna(df.at[idx, 'order_id']):
-        df.at[idx, 'order_id'] = f"ORD-2024-{np.random.randint(10000, 99999)}"
-    if pd.isna(df.at[idx, 'purchase_id']):
-        df.at[idx, 'purchase_id'] = f"PUR-{np.random.choice(['ABC', 'XYZ', 'DEF'])}{np.random.randint(100, 999)}"
-    # But still mark as unverified (IDs don't actually match in system)
-    df.at[idx, 'verified_purchase'] = False
+Each strategy picks its rows with one seeded sample and applies its changes
+as column-wise mask assignments, so noisy variants of large datasets are
+cheap to regenerate. The source file is never modified: every run writes a
+new versioned file plus a JSON sidecar recording the seed and settings.
 
-print(f"Added noise to {len(lucky_fakes)} fake reviews (valid-looking IDs)")
-
-# 3. Adjust timing for some reviews to be more ambiguous
-# Some genuine reviews posted very late (6% of genuine - increased)
-late_genuine = np.random.choice(df[genuine_mask].index, size=int(len(genuine_indices) * 0.06), replace=False)
-for idx in late_genuine:
-    df.at[idx, 'days_after_purchase'] = np.random.randint(200, 450)
-
-print(f"Made {len(late_genuine)} genuine reviews look suspicious (late timing)")
-
-# 4. Some fake reviews have normal timing (20% of fake)
-normal_timing_fakes = np.random.choice(df[fake_mask].index, size=int(len(fake_indices) * 0.20), replace=False)
-for idx in normal_timing_fakes:
-    df.at[idx, 'days_after_purchase'] = np.random.randint(5, 60)
-
-print(f"Made {len(normal_timing_fakes)} fake reviews look normal (good timing)")
-
-# 5. Adjust user review counts to be more realistic
-# Some genuine users are prolific (2% have many reviews)
-prolific_genuine = np.random.choice(df[genuine_mask].index, size=int(len(genuine_indices) * 0.02), replace=False)
-for idx in prolific_genuine:
-    df.at[idx, 'user_review_count'] = np.random.randint(30, 80)
-
-print(f"Made {len(prolific_genuine)} genuine users look suspicious (many reviews)")
-
-# 6. Some fake accounts have low review counts (10% of fake)
-cautious_fakes = np.random.choice(df[fake_mask].index, size=int(len(fake_indices) * 0.10), replace=False)
-for idx in cautious_fakes:
-    df.at[idx, 'user_review_count'] = np.random.randint(1, 15)
-
-print(f"Made {len(cautious_fakes)} fake accounts look normal (few reviews)")
-
-# Save the noisy dataset
-df.to_csv('enhanced_reviews_dataset.csv', index=False)
+Usage:
+    python add_noise_to_data.py [--input enhanced_reviews_dataset.csv]
+                                [--config noise_config.json] [--seed 42]
+                                [--output path.csv]
+"""
 
-print("\n" + "="*60)
-print("Dataset updated with realistic noise")
-print("Expected model accuracy: 92-94%")
-print("="*60)
+import copy
+import glob
+import json
+import os
+import re
 
-# Verify the changes
-print(f"\nVerified purchase distribution:")
-print(f"  Genuine with verified=True: {len(df[(df['label']=='OR') & (df['verified_purchase']==True)])}")
-print(f"  Genuine with verified=False: {len(df[(df['label']=='OR') & (df['verified_purchase']==False)])}")
-print(f"  Fake with verified=True: {len(df[(df['label']=='CG') & (df['verified_purchase']==True)])}")
-print(f"  Fake with verified=False: {len(df[(df['label']=='CG') & (df['verified_purchase']==False)])}")
+import numpy as np
+import pandas as pd
 
+# Strategies run in this order; 'rate' is the fraction of that label's rows
+DEFAULT_NOISE_CONFIG = {
+    'seed': 42,
+    'strategies': {
+        # 1. Some genuine reviews have a missing order or purchase ID
+        'genuine_missing_ids': {'rate': 0.22},
+        # 2. Some fake reviews get valid-looking IDs (still unverified)
+        'fake_valid_ids': {'rate': 0.25, 'purchase_prefixes': ['ABC', 'XYZ', 'DEF']},
+        # 3. Some genuine reviews are posted very late
+        'genuine_late_timing': {'rate': 0.06, 'days': [200, 450]},
+        # 4. Some fake reviews have normal timing
+        'fake_normal_timing': {'rate': 0.20, 'days': [5, 60]},
+        # 5. Some genuine users are prolific reviewers
+        'genuine_prolific_users': {'rate': 0.02, 'review_count': [30, 80]},
+        # 6. Some fake accounts have few reviews
+        'fake_low_review_counts': {'rate': 0.10, 'review_count': [1, 15]}
+    }
+}
+
+STRATEGY_LABELS = {
+    'genuine_missing_ids': 'OR',
+    'fake_valid_ids': 'CG',
+    'genuine_late_timing': 'OR',
+    'fake_normal_timing': 'CG',
+    'genuine_prolific_users': 'OR',
+    'fake_low_review_counts': 'CG'
+}
+
+
+def load_noise_config(path=None):
+    """
+    Load a noise config, filling anything it leaves out from the defaults
+
+    Args:
+        path: JSON file with 'seed' and/or per-strategy settings, or None
+
+    Returns:
+        config dict
+    """
+    config = copy.deepcopy(DEFAULT_NOISE_CONFIG)
+    if path is None:
+        return config
+
+    with open(path, 'r') as f:
+        overrides = json.load(f)
+
+    unknown = set(overrides.get('strategies', {})) - set(STRATEGY_LABELS)
+    if unknown:
+        raise ValueError(f"Unknown noise strategies: {', '.join(sorted(unknown))}")
+
+    if 'seed' in overrides:
+        config['seed'] = overrides['seed']
+    for name, settings in overrides.get('strategies', {}).items():
+        config['strategies'][name].update(settings)
+    return config
+
+
+def _pick(rng, positions, rate):
+    """Sample int(len * rate) row positions without replacement"""
+    size = int(len(positions) * rate)
+    return rng.choice(positions, size=size, replace=False) if size else positions[:0]
+
+
+def _random_ids(rng, prefixes, low, high, size):
+    """Vectorized '<prefix><number>' strings"""
+    numbers = rng.integers(low, high, size=size).astype(str)
+    return np.char.add(np.asarray(prefixes, dtype=str), numbers).astype(object)
+
+
+def add_noise(df, config=None, seed=None):
+    """
+    Apply every enabled noise strategy to a copy of the dataset
+
+    Args:
+        df: reviews DataFrame with a 'label' column (CG / OR)
+        config: noise config (see DEFAULT_NOISE_CONFIG)
+        seed: overrides config['seed']
+
+    Returns:
+        (noisy DataFrame, dict of strategy name -> rows changed)
+    """
+    config = config or DEFAULT_NOISE_CONFIG
+    rng = np.random.default_rng(config['seed'] if seed is None else seed)
+    df = df.reset_index(drop=True).copy()
+    labels = df['label'].to_numpy()
+    positions = {label: np.flatnonzero(labels == label) for label in ('CG', 'OR')}
+
+    # Work on plain object/int arrays and write each column back once at the end
+    order_id = df['order_id'].to_numpy(dtype=object, copy=True)
+    purchase_id = df['purchase_id'].to_numpy(dtype=object, copy=True)
+    verified = df['verified_purchase'].to_numpy(dtype=bool, copy=True)
+    days = df['days_after_purchase'].to_numpy(dtype=np.int64, copy=True)
+    review_count = df['user_review_count'].to_numpy(dtype=np.int64, copy=True)
+
+    report = {}
+    for name, settings in config['strategies'].items():
+        if not settings.get('enabled', True):
+            continue
+        rows = _pick(rng, positions[STRATEGY_LABELS[name]], settings['rate'])
+
+        if name == 'genuine_missing_ids':
+            # Drop either the order ID or the purchase ID
+            drop_order = rng.random(len(rows)) < 0.5
+            order_id[rows[drop_order]] = None
+            purchase_id[rows[~drop_order]] = None
+            verified[rows] = False
+
+        elif name == 'fake_valid_ids':
+            # Fill in whichever IDs are missing; IDs still don't match in the system
+            missing_order = rows[pd.isna(order_id[rows])]
+            order_id[missing_order] = _random_ids(rng, 'ORD-2024-', 10000, 99999, len(missing_order))
+            missing_purchase = rows[pd.isna(purchase_id[rows])]
+            prefixes = rng.choice(settings['purchase_prefixes'], size=len(missing_purchase))
+            purchase_id[missing_purchase] = _random_ids(
+                rng, np.char.add('PUR-', prefixes.astype(str)), 100, 999, len(missing_purchase)
+            )
+            verified[rows] = False
+
+        elif name in ('genuine_late_timing', 'fake_normal_timing'):
+            low, high = settings['days']
+            days[rows] = rng.integers(low, high, size=len(rows))
+
+        elif name in ('genuine_prolific_users', 'fake_low_review_counts'):
+            low, high = settings['review_count']
+            review_count[rows] = rng.integers(low, high, size=len(rows))
+
+        report[name] = int(len(rows))
+
+    df['order_id'] = order_id
+    df['purchase_id'] = purchase_id
+    df['verified_purchase'] = verified
+    df['days_after_purchase'] = days
+    df['user_review_count'] = review_count
+    return df, report
+
+
+def next_version_path(source_path):
+    """'<stem>_noisy_v<N>.csv' next to the source, N one past the highest existing"""
+    stem, ext = os.path.splitext(source_path)
+    pattern = re.compile(re.escape(os.path.basename(stem)) + r'_noisy_v(\d+)' + re.escape(ext) + '$')
+    versions = [int(m.group(1)) for path in glob.glob(f"{stem}_noisy_v*{ext}")
+                if (m := pattern.search(os.path.basename(path)))]
+    return f"{stem}_noisy_v{max(versions, default=0) + 1}{ext}"
+
+
+def write_noisy_dataset(input_path, config, seed=None, output_path=None):
+    """
+    Read a dataset, add noise and write it to a new versioned file
+
+    Returns:
+        (output path, noisy DataFrame, report)
+    """
+    df = pd.read_csv(input_path)
+    print(f"Original dataset: {len(df)} reviews")
+    print(f"Fake: {int((df['label'] == 'CG').sum())}, Genuine: {int((df['label'] == 'OR').sum())}")
+
+    seed = config['seed'] if seed is None else seed
+    noisy, report = add_noise(df, config, seed=seed)
+
+    output_path = output_path or next_version_path(input_path)
+    if os.path.abspath(output_path) == os.path.abspath(input_path):
+        raise ValueError("Refusing to overwrite the source dataset; choose another --output")
+    noisy.to_csv(output_path, index=False)
+
+    with open(os.path.splitext(output_path)[0] + '.json', 'w') as f:
+        json.dump({
+            'source': os.path.abspath(input_path),
+            'rows': len(noisy),
+            'seed': seed,
+            'config': config,
+            'rows_changed': report
+        }, f, indent=2)
+    return output_path, noisy, report
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write a noisy, versioned copy of the review dataset")
+    parser.add_argument('--input', default='enhanced_reviews_dataset.csv')
+    parser.add_argument('--config', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                         'noise_config.json'))
+    parser.add_argument('--seed', type=int, default=None, help="overrides the config seed")
+    parser.add_argument('--output', default=None, help="default: <input>_noisy_v<N>.csv")
+    args = parser.parse_args()
+
+    config = load_noise_config(args.config)
+    output_path, df, report = write_noisy_dataset(args.input, config, seed=args.seed,
+                                                  output_path=args.output)
+
+    print()
+    for name, count in report.items():
+        print(f"{name:25} {count} reviews")
+
+    print("\n" + "="*60)
+    print(f"Noisy dataset saved to {output_path}")
+    print("Expected model accuracy: 92-94%")
+    print("="*60)
+
+    # Verify the changes
+    print(f"\nVerified purchase distribution:")
+    for label, name in (('OR', 'Genuine'), ('CG', 'Fake')):
+        rows = df[df['label'] == label]
+        print(f"  {name} with verified=True: {int(rows['verified_purchase'].sum())}")
+        print(f"  {name} with verified=False: {int((~rows['verified_purchase']).sum())}")
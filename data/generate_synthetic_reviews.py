@@ -0,0 +1,301 @@
+"""
+Generate large synthetic review datasets for load and performance testing
+
+A profile is fitted once on the real dataset: category shares, per-label
+rating / timing / review-count distributions, ID missing rates and a bank of
+review sentences. Category fake rates and size multipliers come from
+rebalance_config.json, and the noise strategies from noise_config.json are
+applied to every chunk.
+
+Rows are produced in fixed-size chunks, each with its own Generator seeded
+from (seed, chunk number), so the output is identical for a given seed no
+matter how many worker processes write it.
+
+Usage:
+    python generate_synthetic_reviews.py --rows 10000000 [--seed 42]
+                                         [--output-dir synthetic] [--chunksize 500000]
+                                         [--workers 4] [--format csv|parquet] [--no-noise]
+"""
+
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from add_noise_to_data import add_noise, load_noise_config
+from rebalance_dataset import load_rebalance_config
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+COLUMNS = ['category', 'rating', 'label', 'text_', 'order_id', 'purchase_id',
+           'verified_purchase', 'user_id', 'days_after_purchase', 'user_review_count']
+LABELS = ('CG', 'OR')
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+
+def _distribution(values):
+    """Empirical distribution as (unique values, probabilities)"""
+    values, counts = np.unique(np.asarray(values), return_counts=True)
+    return values, counts / counts.sum()
+
+
+def fit_profile(df, rebalance_config):
+    """
+    Empirical distributions of the real dataset
+
+    Args:
+        df: reviews DataFrame with the standard columns
+        rebalance_config: config from rebalance_dataset.load_rebalance_config
+
+    Returns:
+        profile dict (plain numpy arrays and lists, cheap to send to workers)
+    """
+    categories, shares = _distribution(df['category'].astype(str))
+    multipliers = np.array([rebalance_config['category_sizes'].get(c, 1.0) for c in categories])
+    weights = shares * multipliers
+
+    observed_rates = (df['label'] == 'CG').groupby(df['category'].astype(str)).mean()
+    fake_rates = np.array([rebalance_config['category_fake_rates'].get(c, observed_rates[c])
+                           for c in categories])
+
+    profile = {
+        'categories': categories,
+        'category_p': weights / weights.sum(),
+        'fake_rates': fake_rates,
+        'user_ratio': df['user_id'].nunique() / max(len(df), 1),
+        'labels': {}
+    }
+    for label in LABELS:
+        rows = df[df['label'] == label]
+        sentences = [s for text in rows['text_'].dropna().astype(str)
+                     for s in SENTENCE_SPLIT.split(text.strip()) if s]
+        sentence_counts = rows['text_'].dropna().astype(str).map(
+            lambda text: len([s for s in SENTENCE_SPLIT.split(text.strip()) if s]))
+        both_ids = rows['order_id'].notna() & rows['purchase_id'].notna()
+        profile['labels'][label] = {
+            'rating': _distribution(rows['rating']),
+            'days_after_purchase': _distribution(rows['days_after_purchase']),
+            'user_review_count': _distribution(rows['user_review_count']),
+            'sentences_per_review': _distribution(sentence_counts.clip(lower=1)),
+            'sentences': np.array(sentences, dtype=object),
+            'order_missing': float(rows['order_id'].isna().mean()),
+            'purchase_missing': float(rows['purchase_id'].isna().mean()),
+            'verified_given_ids': float(rows.loc[both_ids, 'verified_purchase'].mean())
+            if both_ids.any() else 0.0
+        }
+    return profile
+
+
+def _draw(rng, distribution, size):
+    values, p = distribution
+    return rng.choice(values, size=size, p=p)
+
+
+def _texts(rng, sentences, counts):
+    """One review per entry of counts, joining that many random sentences"""
+    picks = sentences[rng.integers(0, len(sentences), size=int(counts.sum()))]
+    ends = np.cumsum(counts)
+    return [' '.join(picks[end - count:end]) for count, end in zip(counts.tolist(), ends.tolist())]
+
+
+def generate_chunk(profile, size, rng, user_pool):
+    """
+    One chunk of synthetic reviews
+
+    Args:
+        profile: from fit_profile
+        size: rows to generate
+        rng: numpy Generator for this chunk
+        user_pool: number of distinct user IDs across the whole dataset
+
+    Returns:
+        DataFrame with COLUMNS
+    """
+    category_index = rng.choice(len(profile['categories']), size=size, p=profile['category_p'])
+    is_fake = rng.random(size) < profile['fake_rates'][category_index]
+
+    frame = {
+        'category': profile['categories'][category_index].astype(object),
+        'rating': np.empty(size, dtype=np.float64),
+        'label': np.where(is_fake, 'CG', 'OR').astype(object),
+        'text_': np.empty(size, dtype=object),
+        'order_id': np.empty(size, dtype=object),
+        'purchase_id': np.empty(size, dtype=object),
+        'verified_purchase': np.zeros(size, dtype=bool),
+        'user_id': np.char.add('USER-', rng.integers(1, user_pool + 1, size=size).astype(str)).astype(object),
+        'days_after_purchase': np.empty(size, dtype=np.int64),
+        'user_review_count': np.empty(size, dtype=np.int64)
+    }
+
+    for label, mask in (('CG', is_fake), ('OR', ~is_fake)):
+        rows = np.flatnonzero(mask)
+        n = len(rows)
+        if n == 0:
+            continue
+        stats = profile['labels'][label]
+        frame['rating'][rows] = _draw(rng, stats['rating'], n)
+        frame['days_after_purchase'][rows] = _draw(rng, stats['days_after_purchase'], n)
+        frame['user_review_count'][rows] = _draw(rng, stats['user_review_count'], n)
+        frame['text_'][rows] = _texts(rng, stats['sentences'],
+                                      _draw(rng, stats['sentences_per_review'], n).astype(np.int64))
+
+        order_ids = np.char.add('ORD-2024-', rng.integers(10000, 100000, size=n).astype(str)).astype(object)
+        prefixes = rng.choice(np.array(['PUR-ABC', 'PUR-XYZ', 'PUR-DEF']), size=n)
+        purchase_ids = np.char.add(prefixes, rng.integers(100, 1000, size=n).astype(str)).astype(object)
+        order_missing = rng.random(n) < stats['order_missing']
+        purchase_missing = rng.random(n) < stats['purchase_missing']
+        order_ids[order_missing] = None
+        purchase_ids[purchase_missing] = None
+        frame['order_id'][rows] = order_ids
+        frame['purchase_id'][rows] = purchase_ids
+        frame['verified_purchase'][rows] = (~order_missing & ~purchase_missing &
+                                            (rng.random(n) < stats['verified_given_ids']))
+
+    return pd.DataFrame(frame, columns=COLUMNS)
+
+
+# Worker state, set once per process by _init_worker
+_worker = {}
+
+
+def _init_worker(profile, options):
+    _worker['profile'] = profile
+    _worker['options'] = options
+
+
+def _write_chunk(chunk_number):
+    """Generate and write one chunk; returns (chunk number, rows, fake rows)"""
+    profile, options = _worker['profile'], _worker['options']
+    seed = options['seed']
+    size = min(options['chunksize'], options['rows'] - chunk_number * options['chunksize'])
+
+    rng = np.random.default_rng([seed, chunk_number])
+    df = generate_chunk(profile, size, rng, options['user_pool'])
+    if options['noise_config'] is not None:
+        noise_seed = int(np.random.SeedSequence([seed, chunk_number, 1]).generate_state(1)[0])
+        df, _ = add_noise(df, options['noise_config'], seed=noise_seed)
+
+    path = os.path.join(options['output_dir'], f"part-{chunk_number:05d}.{options['format']}")
+    if options['format'] == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return chunk_number, len(df), int((df['label'] == 'CG').sum())
+
+
+def generate_dataset(source_path, output_dir, rows, seed=42, chunksize=500000, workers=None,
+                     file_format='csv', noise_config=None, rebalance_config=None):
+    """
+    Write a synthetic dataset as numbered part files
+
+    Args:
+        source_path: real dataset the profile is fitted on
+        output_dir: new directory for part-00000.<format>, part-00001...
+        rows: total rows
+        seed: base seed; chunk i uses Generator((seed, i))
+        chunksize: rows per part file
+        workers: worker processes (default: CPU count)
+        file_format: 'csv' or 'parquet' (needs pyarrow)
+        noise_config: noise config to apply per chunk, or None for no noise
+        rebalance_config: category fake rates and sizes (defaults if None)
+
+    Returns:
+        summary dict (also written to output_dir/_generator.json)
+    """
+    if file_format not in ('csv', 'parquet'):
+        raise ValueError(f"Unknown output format: {file_format}")
+    if file_format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+    if os.path.isdir(output_dir) and os.listdir(output_dir):
+        raise ValueError(f"Output directory {output_dir} is not empty")
+    os.makedirs(output_dir, exist_ok=True)
+
+    rebalance_config = rebalance_config or load_rebalance_config()
+    with open(source_path, 'rb') as f:
+        source_sha256 = hashlib.sha256(f.read()).hexdigest()
+    profile = fit_profile(pd.read_csv(source_path), rebalance_config)
+
+    options = {
+        'seed': seed,
+        'rows': rows,
+        'chunksize': chunksize,
+        'user_pool': max(1, int(rows * profile['user_ratio'])),
+        'noise_config': noise_config,
+        'output_dir': output_dir,
+        'format': file_format
+    }
+    chunks = range((rows + chunksize - 1) // chunksize)
+    workers = workers or os.cpu_count() or 1
+
+    total = fake = 0
+    if workers == 1:
+        _init_worker(profile, options)
+        results = map(_write_chunk, chunks)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(profile, options))
+        results = executor.map(_write_chunk, chunks)
+    try:
+        for chunk_number, count, fake_count in results:
+            total += count
+            fake += fake_count
+            print(f"  part-{chunk_number:05d}: {count} rows")
+    finally:
+        if workers != 1:
+            executor.shutdown()
+
+    summary = {
+        'source': os.path.abspath(source_path),
+        'source_sha256': source_sha256,
+        'rows': total,
+        'fake_rows': fake,
+        'seed': seed,
+        'chunksize': chunksize,
+        'format': file_format,
+        'noise_config': noise_config,
+        'rebalance_config': rebalance_config
+    }
+    with open(os.path.join(output_dir, '_generator.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Generate a large synthetic review dataset")
+    parser.add_argument('--source', default=os.path.join(DATA_DIR, 'enhanced_reviews_dataset.csv'))
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output-dir', default='synthetic')
+    parser.add_argument('--chunksize', type=int, default=500000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--noise-config', default=os.path.join(DATA_DIR, 'noise_config.json'))
+    parser.add_argument('--no-noise', action='store_true')
+    parser.add_argument('--rebalance-config', default=os.path.join(DATA_DIR, 'rebalance_config.json'))
+    args = parser.parse_args()
+
+    start = time.time()
+    summary = generate_dataset(
+        args.source, args.output_dir, args.rows, seed=args.seed, chunksize=args.chunksize,
+        workers=args.workers, file_format=args.format,
+        noise_config=None if args.no_noise else load_noise_config(args.noise_config),
+        rebalance_config=load_rebalance_config(args.rebalance_config)
+    )
+    elapsed = time.time() - start
+
+    print("\n" + "="*60)
+    print(f"Generated {summary['rows']} reviews in {elapsed:.1f}s "
+          f"({summary['rows'] / elapsed:,.0f} rows/s)")
+    print(f"Fake reviews (CG): {summary['fake_rows']} "
+          f"({summary['fake_rows'] / max(summary['rows'], 1) * 100:.1f}%)")
+    print(f"Written to {args.output_dir}/")
+    print("="*60)
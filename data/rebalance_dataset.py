@@ -1,127 +1,336 @@
 """
 Rebalance the dataset to create more realistic, non-perfect distributions
+
+Works in two streamed passes over the CSV, so the input never has to fit in
+memory:
+  1. count rows per (category, label) group
+  2. re-read in chunks and emit each row as many times as it was sampled,
+     appending to one output partition per category
+
+Which rows are kept is decided between the passes: per group, a seeded
+Generator samples row ordinals (with replacement only when the group is too
+small for its target), stored as one small repeat count per input row.
+
+Usage:
+    python rebalance_dataset.py [--input enhanced_reviews_dataset.csv]
+                                [--config rebalance_config.json] [--seed 42]
+                                [--output-dir rebalanced] [--format csv|parquet]
+                                [--partition-by category|none] [--chunksize 100000]
 """
 
-import pandas as pd
+import copy
+import json
+import os
+import re
+from collections import defaultdict
+
 import numpy as np
+import pandas as pd
 
-# Load the enhanced dataset
-df = pd.read_csv('enhanced_reviews_dataset.csv')
-
-print(f"Original dataset size: {len(df)}")
-print(f"Original fake reviews: {len(df[df['label']=='CG'])}")
-print(f"Original genuine reviews: {len(df[df['label']=='OR'])}")
-
-# Set random seed for reproducibility
-np.random.seed(42)
-
-# Define realistic fake rates per category with HIGH VARIATION
-# Some categories are heavily targeted, others are trusted
-category_fake_rates = {
-    'Home_and_Kitchen_5': 0.28,      # Low - trusted, established sellers
-    'Electronics_5': 0.67,            # Very High - competitive, high-value items
-    'Books_5': 0.18,                 # Very Low - Amazon reviews, established publishers
-    'Clothing_Shoes_and_Jewelry_5': 0.58,  # High - fashion/trendy items, new sellers
-    'Toys_and_Games_5': 0.72,        # Highest - seasonal, gift items heavily targeted
-    'Sports_and_Outdoors_5': 0.35,   # Medium-Low - niche community
-    'Pet_Supplies_5': 0.23,          # Low - pet owners are loyal, careful buyers
-    'Kindle_Store_5': 0.15,          # Very Low - verified purchases, digital goods
-    'Tools_and_Home_Improvement_5': 0.42,  # Medium - professional buyers check specs
-    'Movies_and_TV_5': 0.52,         # Medium-High - entertainment, subjective
-}
+GROUP_COLUMNS = ['category', 'label']
+LABELS = ('CG', 'OR')
 
-# Get unique categories
-categories = df['category'].unique()
-
-# Define category sizes (some categories have more reviews than others - more natural)
-category_sizes = {
-    'Electronics_5': 1.2,        # Popular category - more reviews
-    'Books_5': 1.3,              # Very popular - most reviews
-    'Clothing_Shoes_and_Jewelry_5': 1.15,  # Popular
-    'Home_and_Kitchen_5': 1.1,   # Popular
-    'Toys_and_Games_5': 0.85,    # Seasonal - fewer reviews
-    'Movies_and_TV_5': 0.95,     # Medium
-    'Sports_and_Outdoors_5': 0.75, # Niche - fewer reviews
-    'Pet_Supplies_5': 0.70,      # Smaller market
-    'Kindle_Store_5': 1.05,      # Digital - decent size
-    'Tools_and_Home_Improvement_5': 0.80,  # Smaller niche
+DEFAULT_REBALANCE_CONFIG = {
+    'seed': 42,
+    # Realistic fake rates per category with HIGH VARIATION
+    # Some categories are heavily targeted, others are trusted
+    'category_fake_rates': {
+        'Home_and_Kitchen_5': 0.28,             # Low - trusted, established sellers
+        'Electronics_5': 0.67,                  # Very High - competitive, high-value items
+        'Books_5': 0.18,                        # Very Low - established publishers
+        'Clothing_Shoes_and_Jewelry_5': 0.58,   # High - fashion/trendy items, new sellers
+        'Toys_and_Games_5': 0.72,               # Highest - seasonal, gift items heavily targeted
+        'Sports_and_Outdoors_5': 0.35,          # Medium-Low - niche community
+        'Pet_Supplies_5': 0.23,                 # Low - loyal, careful buyers
+        'Kindle_Store_5': 0.15,                 # Very Low - verified purchases, digital goods
+        'Tools_and_Home_Improvement_5': 0.42,   # Medium - professional buyers check specs
+        'Movies_and_TV_5': 0.52                 # Medium-High - entertainment, subjective
+    },
+    # Categories not listed above get a random rate in this range
+    'default_fake_rate_range': [0.25, 0.60],
+    # Size multipliers (some categories have more reviews than others)
+    'category_sizes': {
+        'Electronics_5': 1.2,
+        'Books_5': 1.3,
+        'Clothing_Shoes_and_Jewelry_5': 1.15,
+        'Home_and_Kitchen_5': 1.1,
+        'Toys_and_Games_5': 0.85,
+        'Movies_and_TV_5': 0.95,
+        'Sports_and_Outdoors_5': 0.75,
+        'Pet_Supplies_5': 0.70,
+        'Kindle_Store_5': 1.05,
+        'Tools_and_Home_Improvement_5': 0.80
+    }
 }
 
-# Create new balanced dataset
-new_rows = []
-
-for category in categories:
-    cat_df = df[df['category'] == category].copy()
-    
-    # Get target fake rate for this category
-    # If category not in our mapping, use a random rate between 25-60%
-    if category in category_fake_rates:
-        target_fake_rate = category_fake_rates[category]
-    else:
-        target_fake_rate = np.random.uniform(0.25, 0.60)
-    
-    # Apply size multiplier to create varied category sizes
-    size_multiplier = category_sizes.get(category, 1.0)
-    
-    print(f"\n{category}:")
-    print(f"  Target fake rate = {target_fake_rate:.1%}")
-    print(f"  Size multiplier = {size_multiplier:.2f}x")
-    
-    # Separate fake and genuine
-    fake_reviews = cat_df[cat_df['label'] == 'CG'].copy()
-    genuine_reviews = cat_df[cat_df['label'] == 'OR'].copy()
-    
-    # Apply size multiplier to total
-    total_reviews = int(len(cat_df) * size_multiplier)
-    target_fake_count = int(total_reviews * target_fake_rate)
-    target_genuine_count = total_reviews - target_fake_count
-    
-    # Sample to get desired distribution (with replacement if needed)
-    if len(fake_reviews) >= target_fake_count:
-        fake_sample = fake_reviews.sample(n=target_fake_count, random_state=42)
-    else:
-        # Need more samples - sample with replacement
-        fake_sample = fake_reviews.sample(n=target_fake_count, replace=True, random_state=42)
-    
-    if len(genuine_reviews) >= target_genuine_count:
-        genuine_sample = genuine_reviews.sample(n=target_genuine_count, random_state=42)
-    else:
-        # Need more samples - sample with replacement
-        genuine_sample = genuine_reviews.sample(n=target_genuine_count, replace=True, random_state=42)
-    
-    # Combine
-    category_sample = pd.concat([fake_sample, genuine_sample])
-    
-    print(f"  Fake: {len(fake_sample)} ({len(fake_sample)/len(category_sample)*100:.1f}%)")
-    print(f"  Genuine: {len(genuine_sample)} ({len(genuine_sample)/len(category_sample)*100:.1f}%)")
-    
-    new_rows.append(category_sample)
-
-# Combine all categories
-new_df = pd.concat(new_rows, ignore_index=True)
-
-# Shuffle the dataset
-new_df = new_df.sample(frac=1, random_state=42).reset_index(drop=True)
-
-print("\n" + "="*60)
-print("NEW DATASET STATISTICS")
-print("="*60)
-print(f"Total reviews: {len(new_df)}")
-print(f"Fake reviews (CG): {len(new_df[new_df['label']=='CG'])} ({len(new_df[new_df['label']=='CG'])/len(new_df)*100:.1f}%)")
-print(f"Genuine reviews (OR): {len(new_df[new_df['label']=='OR'])} ({len(new_df[new_df['label']=='OR'])/len(new_df)*100:.1f}%)")
-
-# Save the rebalanced dataset
-new_df.to_csv('enhanced_reviews_dataset.csv', index=False)
-print("\n✅ Rebalanced dataset saved to 'enhanced_reviews_dataset.csv'")
-
-# Show per-category breakdown
-print("\n" + "="*60)
-print("PER-CATEGORY BREAKDOWN")
-print("="*60)
-for category in new_df['category'].unique():
-    cat_data = new_df[new_df['category'] == category]
-    fake_count = len(cat_data[cat_data['label'] == 'CG'])
-    total = len(cat_data)
-    fake_rate = fake_count / total * 100 if total > 0 else 0
-    print(f"{category:30} Total: {total:5} Fake: {fake_count:5} ({fake_rate:5.1f}%)")
 
+def load_rebalance_config(path=None):
+    """
+    Load a rebalance config, filling anything it leaves out from the defaults
+
+    Args:
+        path: JSON file overriding some of DEFAULT_REBALANCE_CONFIG, or None
+
+    Returns:
+        config dict
+    """
+    config = copy.deepcopy(DEFAULT_REBALANCE_CONFIG)
+    if path is None:
+        return config
+
+    with open(path, 'r') as f:
+        overrides = json.load(f)
+
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(config.get(key), dict):
+            config[key].update(value)
+        else:
+            config[key] = value
+    return config
+
+
+def count_groups(input_path, chunksize=100000):
+    """
+    First pass: rows per (category, label), reading only those two columns
+
+    Returns:
+        dict of (category, label) -> row count
+    """
+    counts = defaultdict(int)
+    for chunk in pd.read_csv(input_path, usecols=GROUP_COLUMNS, chunksize=chunksize):
+        for key, count in chunk.groupby(GROUP_COLUMNS, sort=False, dropna=False).size().items():
+            counts[key] += int(count)
+    return dict(counts)
+
+
+def plan_targets(group_counts, config, rng):
+    """
+    Target row count per (category, label) group
+
+    Args:
+        group_counts: dict from count_groups
+        config: rebalance config
+        rng: numpy Generator (used for categories without a configured rate)
+
+    Returns:
+        (dict of group -> target count, dict of category -> fake rate)
+    """
+    category_sizes = defaultdict(int)
+    for (category, label), count in group_counts.items():
+        if label in LABELS:
+            category_sizes[category] += count
+
+    targets, fake_rates = {}, {}
+    low, high = config['default_fake_rate_range']
+    for category in sorted(category_sizes, key=str):
+        rate = config['category_fake_rates'].get(category)
+        if rate is None:
+            rate = float(rng.uniform(low, high))
+        fake_rates[category] = rate
+
+        total = int(category_sizes[category] * config['category_sizes'].get(category, 1.0))
+        fake_target = int(total * rate)
+        for label, target in (('CG', fake_target), ('OR', total - fake_target)):
+            if group_counts.get((category, label), 0) == 0 and target > 0:
+                print(f"Warning: {category} has no {label} reviews to sample; skipping them")
+                target = 0
+            targets[(category, label)] = target
+    return targets, fake_rates
+
+
+def draw_repeats(group_counts, targets, rng):
+    """
+    How many times each row of each group is emitted
+
+    Groups at least as large as their target are sampled without
+    replacement (counts of 0 or 1); smaller groups with replacement.
+
+    Returns:
+        dict of group -> uint32 array with one repeat count per row, in file order
+    """
+    repeats = {}
+    for key in sorted(targets, key=str):
+        size, target = group_counts.get(key, 0), targets[key]
+        if size == 0:
+            continue
+        if target <= size:
+            counts = np.zeros(size, dtype=np.uint32)
+            counts[rng.choice(size, size=target, replace=False)] = 1
+        else:
+            counts = np.bincount(rng.integers(0, size, size=target), minlength=size).astype(np.uint32)
+        repeats[key] = counts
+    return repeats
+
+
+def _partition_name(column, value):
+    """Filesystem-safe hive-style partition directory name"""
+    return f"{column}=" + re.sub(r'[^A-Za-z0-9_.-]', '_', str(value))
+
+
+class PartitionWriter:
+    """
+    Append DataFrame chunks to one CSV or Parquet file per partition
+
+    Parquet output needs pyarrow; the schema of each partition is fixed by
+    its first chunk.
+    """
+
+    def __init__(self, output_dir, file_format='csv', partition_by='category'):
+        if file_format not in ('csv', 'parquet'):
+            raise ValueError(f"Unknown output format: {file_format}")
+        if file_format == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+        self.output_dir = output_dir
+        self.file_format = file_format
+        self.partition_by = partition_by
+        self.rows = defaultdict(int)
+        self._files = {}
+
+    def _path(self, partition):
+        name = 'part-00000.' + self.file_format
+        if partition is None:
+            return os.path.join(self.output_dir, name)
+        directory = os.path.join(self.output_dir, _partition_name(self.partition_by, partition))
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, name)
+
+    def _write(self, partition, frame):
+        if self.file_format == 'csv':
+            first = partition not in self._files
+            if first:
+                self._files[partition] = open(self._path(partition), 'w', newline='', encoding='utf-8')
+            frame.to_csv(self._files[partition], index=False, header=first)
+            return
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = self._files.get(partition)
+        if writer is None:
+            schema = pa.Schema.from_pandas(frame, preserve_index=False)
+            # All-null columns in the first chunk would otherwise be typed null
+            schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                                for field in schema])
+            writer = self._files[partition] = pq.ParquetWriter(self._path(partition), schema)
+        writer.write_table(pa.Table.from_pandas(frame, schema=writer.schema, preserve_index=False))
+
+    def write(self, frame):
+        if frame.empty:
+            return
+        if self.partition_by is None:
+            self._write(None, frame)
+            self.rows[None] += len(frame)
+            return
+        for value, part in frame.groupby(self.partition_by, sort=False, dropna=False):
+            self._write(value, part)
+            self.rows[value] += len(part)
+
+    def close(self):
+        for handle in self._files.values():
+            handle.close()
+        self._files = {}
+
+
+def rebalance(input_path, output_dir, config=None, seed=None, chunksize=100000,
+              file_format='csv', partition_by='category'):
+    """
+    Rebalance a review CSV to per-category fake rates and sizes
+
+    Args:
+        input_path: source CSV (read twice, in chunks)
+        output_dir: new directory for the partitioned output
+        config: rebalance config (see DEFAULT_REBALANCE_CONFIG)
+        seed: overrides config['seed']
+        chunksize: rows per chunk in both passes
+        file_format: 'csv' or 'parquet'
+        partition_by: column to partition on, or None for a single file
+
+    Returns:
+        dict with per-group targets, fake rates and rows written per partition
+    """
+    config = config or DEFAULT_REBALANCE_CONFIG
+    seed = config['seed'] if seed is None else seed
+    rng = np.random.default_rng(seed)
+
+    if os.path.isdir(output_dir) and os.listdir(output_dir):
+        raise ValueError(f"Output directory {output_dir} is not empty")
+    writer = PartitionWriter(output_dir, file_format=file_format, partition_by=partition_by)
+    os.makedirs(output_dir, exist_ok=True)
+
+    group_counts = count_groups(input_path, chunksize=chunksize)
+    targets, fake_rates = plan_targets(group_counts, config, rng)
+    repeats = draw_repeats(group_counts, targets, rng)
+
+    # Second pass: each row's ordinal within its group indexes the repeat counts
+    seen = defaultdict(int)
+    try:
+        for chunk in pd.read_csv(input_path, chunksize=chunksize):
+            chunk_repeats = np.zeros(len(chunk), dtype=np.int64)
+            groups = chunk.groupby(GROUP_COLUMNS, sort=False, dropna=False).indices
+            for key, rows in groups.items():
+                start = seen[key]
+                seen[key] += len(rows)
+                if key in repeats:
+                    chunk_repeats[rows] = repeats[key][start:start + len(rows)]
+
+            selected = np.repeat(np.arange(len(chunk)), chunk_repeats)
+            # Shuffle within the chunk so duplicates and labels are interleaved
+            writer.write(chunk.iloc[rng.permutation(selected)])
+    finally:
+        writer.close()
+
+    report = {
+        'source': os.path.abspath(input_path),
+        'seed': seed,
+        'format': file_format,
+        'partition_by': partition_by,
+        'config': config,
+        'fake_rates': fake_rates,
+        'targets': {f"{category}/{label}": target for (category, label), target in targets.items()},
+        'rows_written': {str(partition): rows for partition, rows in writer.rows.items()}
+    }
+    with open(os.path.join(output_dir, '_rebalance.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rebalance the review dataset per category")
+    parser.add_argument('--input', default='enhanced_reviews_dataset.csv')
+    parser.add_argument('--config', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                         'rebalance_config.json'))
+    parser.add_argument('--seed', type=int, default=None, help="overrides the config seed")
+    parser.add_argument('--output-dir', default='rebalanced')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--partition-by', default='category', help="column, or 'none' for one file")
+    parser.add_argument('--chunksize', type=int, default=100000)
+    args = parser.parse_args()
+
+    partition_by = None if args.partition_by.lower() == 'none' else args.partition_by
+    report = rebalance(args.input, args.output_dir, config=load_rebalance_config(args.config),
+                       seed=args.seed, chunksize=args.chunksize, file_format=args.format,
+                       partition_by=partition_by)
+
+    print("\n" + "="*60)
+    print("PER-CATEGORY BREAKDOWN")
+    print("="*60)
+    total_fake = total = 0
+    for category, rate in report['fake_rates'].items():
+        fake = report['targets'][f"{category}/CG"]
+        count = fake + report['targets'][f"{category}/OR"]
+        total_fake += fake
+        total += count
+        share = fake / count * 100 if count > 0 else 0
+        print(f"{category:30} Total: {count:5} Fake: {fake:5} ({share:5.1f}%, target {rate:.1%})")
+
+    print("\n" + "="*60)
+    print(f"Total reviews: {total}")
+    if total:
+        print(f"Fake reviews (CG): {total_fake} ({total_fake / total * 100:.1f}%)")
+        print(f"Genuine reviews (OR): {total - total_fake} ({(total - total_fake) / total * 100:.1f}%)")
+    print(f"\nRebalanced dataset written to {args.output_dir}/")
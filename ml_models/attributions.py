@@ -0,0 +1,207 @@
+"""
+Per-Prediction Feature Attributions for Tree Ensembles
+Saabas-style decision-path contributions and exact path-dependent TreeSHAP
+over flat forest node arrays
+"""
+
+import numpy as np
+
+from model_artifact import CompactForest, flatten_forest
+
+ATTRIBUTION_METHODS = ('saabas', 'shap')
+
+
+def feature_names_for(feature_extractor, n_features):
+    """Statistical feature names followed by the TF-IDF vocabulary (or hash buckets)"""
+    scaler = feature_extractor.scaler
+    names = [str(n) for n in getattr(scaler, 'feature_names_in_', [])]
+    vectorizer = feature_extractor.tfidf_vectorizer
+    if hasattr(vectorizer, 'vocabulary_'):
+        names += [f"tfidf: {term}" for term in vectorizer.get_feature_names_out()]
+    names += [f"text_hash_{i}" for i in range(n_features - len(names))]
+    return names[:n_features]
+
+
+def _extend(zeros, ones, weights, zero_fraction, one_fraction):
+    """Grow the path weights by one element (already appended to the lists)"""
+    depth = len(weights) - 1
+    for i in range(depth - 1, -1, -1):
+        weights[i + 1] += one_fraction * weights[i] * (i + 1) / (depth + 1)
+        weights[i] = zero_fraction * weights[i] * (depth - i) / (depth + 1)
+
+
+def _unwind(features, zeros, ones, weights, index):
+    """Remove path element `index`, undoing its effect on the weights"""
+    depth = len(weights) - 1
+    one_fraction, zero_fraction = ones[index], zeros[index]
+    next_one = weights[depth]
+    for i in range(depth - 1, -1, -1):
+        if one_fraction != 0:
+            previous = weights[i]
+            weights[i] = next_one * (depth + 1) / ((i + 1) * one_fraction)
+            next_one = previous - weights[i] * zero_fraction * (depth - i) / (depth + 1)
+        else:
+            weights[i] = weights[i] * (depth + 1) / (zero_fraction * (depth - i))
+    del features[index], zeros[index], ones[index]
+    weights.pop()
+
+
+def _unwound_sum(zeros, ones, weights, index):
+    """Total path weight with element `index` removed"""
+    depth = len(weights) - 1
+    one_fraction, zero_fraction = ones[index], zeros[index]
+    next_one = weights[depth]
+    total = 0.0
+    for i in range(depth - 1, -1, -1):
+        if one_fraction != 0:
+            part = next_one * (depth + 1) / ((i + 1) * one_fraction)
+            total += part
+            next_one = weights[i] - part * zero_fraction * (depth - i) / (depth + 1)
+        else:
+            total += weights[i] / zero_fraction / ((depth - i) / (depth + 1))
+    return total
+
+
+class ForestExplainer:
+    """
+    Per-prediction attributions for a random forest
+
+    Node statistics (fake-class probability per node, node cover and the
+    per-split probability change) are computed once when the explainer is
+    built, so explaining a prediction only walks the decision paths.
+
+    - 'saabas': for every split on the decision path, the change in fake
+      probability from parent to child is credited to the split feature.
+      All trees are walked together with vectorized numpy steps.
+    - 'shap': exact path-dependent TreeSHAP (Lundberg et al.), weighting
+      both branches by training cover. Slower, but consistent.
+
+    Both satisfy bias + sum(contributions) == predicted fake probability.
+    """
+
+    def __init__(self, arrays, feature_names):
+        self.roots = np.asarray(arrays['tree_roots'], dtype=np.int64)
+        self.left = np.asarray(arrays['tree_children_left'], dtype=np.int64)
+        self.right = np.asarray(arrays['tree_children_right'], dtype=np.int64)
+        self.feature = np.asarray(arrays['tree_feature'], dtype=np.int64)
+        self.threshold = np.asarray(arrays['tree_threshold'], dtype=np.float32)
+        self.node_value = np.asarray(arrays['tree_value'], dtype=np.float64)[:, 1]
+        cover = arrays.get('tree_cover')
+        self.cover = np.asarray(cover, dtype=np.float64) if cover is not None else None
+        self.feature_names = list(feature_names)
+        self.n_trees = len(self.roots)
+        self.bias = float(self.node_value[self.roots].mean())
+
+        # Probability change when a split sends a row left / right
+        internal = self.left >= 0
+        self.left_delta = np.where(internal, self.node_value[self.left] - self.node_value, 0.0)
+        self.right_delta = np.where(internal, self.node_value[self.right] - self.node_value, 0.0)
+
+        # Python lists for the recursive TreeSHAP walk
+        self._lists = (self.left.tolist(), self.right.tolist(), self.feature.tolist(),
+                       self.threshold.astype(np.float64).tolist(), self.node_value.tolist(),
+                       self.cover.tolist() if self.cover is not None else None)
+
+    @classmethod
+    def from_model(cls, model, feature_extractor):
+        """Build an explainer for a sklearn forest or CompactForest, or return None"""
+        if isinstance(model, CompactForest):
+            arrays = {
+                'tree_roots': model.roots, 'tree_children_left': model.children_left,
+                'tree_children_right': model.children_right, 'tree_feature': model.feature,
+                'tree_threshold': model.threshold, 'tree_value': model.value,
+                'tree_cover': model.cover
+            }
+        elif hasattr(model, 'estimators_') and hasattr(model.estimators_[0], 'tree_'):
+            arrays = flatten_forest(model)
+        else:
+            return None
+        return cls(arrays, feature_names_for(feature_extractor, model.n_features_in_))
+
+    def saabas(self, x):
+        """Saabas contributions to the fake probability for one feature row"""
+        x = np.asarray(x, dtype=np.float32).ravel()
+        contributions = np.zeros(len(x), dtype=np.float64)
+        node = self.roots.copy()
+        while True:
+            internal = self.left[node] >= 0
+            if not internal.any():
+                break
+            node = node[internal]
+            go_left = x[self.feature[node]] <= self.threshold[node]
+            np.add.at(contributions, self.feature[node],
+                      np.where(go_left, self.left_delta[node], self.right_delta[node]))
+            node = np.where(go_left, self.left[node], self.right[node])
+        return contributions / self.n_trees
+
+    def shap(self, x):
+        """Exact path-dependent TreeSHAP values for the fake probability of one row"""
+        if self.cover is None:
+            raise ValueError("TreeSHAP needs node cover, which this model does not store")
+        x = np.asarray(x, dtype=np.float32).astype(np.float64).ravel().tolist()
+        left, right, feature, threshold, value, cover = self._lists
+        phi = np.zeros(len(x), dtype=np.float64)
+
+        def recurse(node, features, zeros, ones, weights, zero_fraction, one_fraction, split):
+            features = features + [split]
+            zeros = zeros + [zero_fraction]
+            ones = ones + [one_fraction]
+            weights = weights + [1.0 if not weights else 0.0]
+            _extend(zeros, ones, weights, zero_fraction, one_fraction)
+
+            if left[node] < 0:
+                for i in range(1, len(weights)):
+                    weight = _unwound_sum(zeros, ones, weights, i)
+                    phi[features[i]] += weight * (ones[i] - zeros[i]) * value[node]
+                return
+
+            split = feature[node]
+            hot, cold = ((left[node], right[node]) if x[split] <= threshold[node]
+                         else (right[node], left[node]))
+            incoming_zero, incoming_one = 1.0, 1.0
+            if split in features[1:]:
+                index = features.index(split, 1)
+                incoming_zero, incoming_one = zeros[index], ones[index]
+                _unwind(features, zeros, ones, weights, index)
+
+            recurse(hot, features, zeros, ones, weights,
+                    cover[hot] / cover[node] * incoming_zero, incoming_one, split)
+            recurse(cold, features, zeros, ones, weights,
+                    cover[cold] / cover[node] * incoming_zero, 0.0, split)
+
+        for root in self.roots.tolist():
+            recurse(root, [], [], [], [], 1.0, 1.0, -1)
+        return phi / self.n_trees
+
+    def explain(self, x, top_k=5, method='saabas', raw_values=None):
+        """
+        Top-K features by absolute contribution for one prediction
+
+        Args:
+            x: feature row as passed to the model
+            top_k: number of features to return
+            method: 'saabas' or 'shap'
+            raw_values: optional display values per feature (e.g. unscaled)
+
+        Returns:
+            dict with method, bias and a list of {feature, value, contribution}
+        """
+        if method not in ATTRIBUTION_METHODS:
+            raise ValueError(f"Unknown attribution method: {method}")
+        x = np.asarray(x.toarray() if hasattr(x, 'toarray') else x).ravel()
+        contributions = self.saabas(x) if method == 'saabas' else self.shap(x)
+        display = x if raw_values is None else np.asarray(raw_values)
+
+        top = np.argsort(-np.abs(contributions), kind='stable')[:top_k]
+        return {
+            'method': method,
+            'bias': round(self.bias, 6),
+            'top_features': [
+                {
+                    'feature': self.feature_names[i],
+                    'value': round(float(display[i]), 6),
+                    'contribution': round(float(contributions[i]), 6)
+                }
+                for i in top if contributions[i] != 0
+            ]
+        }
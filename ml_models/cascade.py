@@ -0,0 +1,238 @@
+"""
+Metadata-First Cascade Scorer
+A cheap model over metadata features answers clear-cut reviews; only
+uncertain reviews pay for NLTK tokenization and TF-IDF
+"""
+
+import json
+import os
+import threading
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import train_test_split
+from sklearn.tree import DecisionTreeClassifier
+
+from feature_extraction import ReviewFeatureExtractor, prepare_features
+
+# Bands evaluated by the training report (low, high)
+REPORT_BANDS = [(0.01, 0.99), (0.02, 0.98), (0.05, 0.95), (0.1, 0.9), (0.2, 0.8)]
+
+
+class CascadeScorer:
+    """
+    Two-stage scorer: metadata model first, full text model when uncertain
+
+    A review exits early when the metadata model's fake probability is at
+    or below `low` or at or above `high`; its metadata probabilities are
+    returned as-is. Everything inside the band goes through the full
+    feature pipeline and model.
+    """
+
+    def __init__(self, metadata_model, low=0.05, high=0.95):
+        if not 0.0 <= low < high <= 1.0:
+            raise ValueError(f"Invalid uncertainty band: ({low}, {high})")
+        self.metadata_model = metadata_model
+        self.low = low
+        self.high = high
+        self._extractor = ReviewFeatureExtractor()
+        self._lock = threading.Lock()
+        self.scored = 0
+        self.early_exits = 0
+
+    def metadata_proba(self, reviews_df):
+        """Fake probability from the metadata model for every row"""
+        features = self._extractor.extract_metadata_frame(reviews_df)
+        return self.metadata_model.predict_proba(features.to_numpy(dtype=np.float64))[:, 1]
+
+    def uncertain_rows(self, reviews_df):
+        """Positions of the rows inside the band (the ones the full model scores)"""
+        fake = self.metadata_proba(reviews_df)
+        return np.flatnonzero((fake > self.low) & (fake < self.high))
+
+    def predict_proba(self, reviews_df, model, feature_extractor, monitor=None):
+        """
+        Class probabilities for every row, running the full model only inside the band
+
+        Args:
+            reviews_df: DataFrame with review data
+            model: trained full model
+            feature_extractor: fitted feature extractor for the full model
+            monitor: optional DriftMonitor recording the rows that reach the full model
+
+        Returns:
+            (n_rows, 2) array of [genuine, fake] probabilities
+        """
+        return self.score(reviews_df, model, feature_extractor, monitor)[0]
+
+    def score(self, reviews_df, model, feature_extractor, monitor=None):
+        """
+        Same as predict_proba, also returning what the full model saw
+
+        Returns:
+            (probabilities, positions of the rows inside the band, their
+            full feature matrix or None when every row exited early)
+        """
+        fake = self.metadata_proba(reviews_df)
+        probabilities = np.column_stack([1.0 - fake, fake])
+        uncertain = np.flatnonzero((fake > self.low) & (fake < self.high))
+
+        uncertain_features = None
+        if len(uncertain):
+            uncertain_df = reviews_df.iloc[uncertain].reset_index(drop=True)
+            uncertain_features, _ = prepare_features(uncertain_df, feature_extractor, is_training=False)
+            if monitor is not None:
+                monitor.observe(uncertain_features, uncertain_df['text_'], feature_extractor)
+            probabilities[uncertain] = model.predict_proba(uncertain_features)
+
+        with self._lock:
+            self.scored += len(fake)
+            self.early_exits += len(fake) - len(uncertain)
+        return probabilities, uncertain, uncertain_features
+
+    def stats(self):
+        """Return the band and early-exit counters"""
+        with self._lock:
+            return {
+                'low': self.low,
+                'high': self.high,
+                'scored': self.scored,
+                'early_exits': self.early_exits,
+                'skip_rate': round(self.early_exits / self.scored, 4) if self.scored else 0.0
+            }
+
+    def save(self, save_dir='saved_models', report=None):
+        """Save the metadata model and band settings"""
+        os.makedirs(save_dir, exist_ok=True)
+        joblib.dump(self.metadata_model, f"{save_dir}/metadata_model.pkl")
+        with open(f"{save_dir}/cascade.json", 'w') as f:
+            json.dump({'low': self.low, 'high': self.high, 'report': report}, f, indent=4)
+
+    @classmethod
+    def load(cls, save_dir='saved_models', low=None, high=None):
+        """Load a saved cascade, optionally overriding the saved band"""
+        with open(f"{save_dir}/cascade.json", 'r') as f:
+            settings = json.load(f)
+        return cls(
+            joblib.load(f"{save_dir}/metadata_model.pkl"),
+            low=settings['low'] if low is None else low,
+            high=settings['high'] if high is None else high
+        )
+
+
+def _band_metrics(y_true, full_proba, meta_proba, low, high, full_seconds, meta_seconds):
+    """Accuracy and cost of one band, given both stages' hold-out outputs"""
+    exits = (meta_proba <= low) | (meta_proba >= high)
+    cascade_proba = np.where(exits, meta_proba, full_proba)
+    full_pred = (full_proba > 0.5).astype(int)
+    cascade_pred = (cascade_proba > 0.5).astype(int)
+    full_ms = full_seconds / len(y_true) * 1e3
+    meta_ms = meta_seconds / len(y_true) * 1e3
+    cascade_ms = meta_ms + (1 - exits.mean()) * full_ms
+    return {
+        'low': low,
+        'high': high,
+        'skip_rate': round(float(exits.mean()), 4),
+        'early_exit_accuracy': round(float(accuracy_score(y_true[exits], cascade_pred[exits])), 4)
+                               if exits.any() else None,
+        'full_accuracy': round(float(accuracy_score(y_true, full_pred)), 4),
+        'cascade_accuracy': round(float(accuracy_score(y_true, cascade_pred)), 4),
+        'full_f1': round(float(f1_score(y_true, full_pred)), 4),
+        'cascade_f1': round(float(f1_score(y_true, cascade_pred)), 4),
+        'prediction_agreement': round(float(np.mean(full_pred == cascade_pred)), 4),
+        'full_ms_per_review': round(full_ms, 4),
+        'cascade_ms_per_review': round(cascade_ms, 4),
+        'latency_saved_pct': round((1 - cascade_ms / full_ms) * 100, 2) if full_ms else 0.0
+    }
+
+
+def train_cascade(data_path='../data/enhanced_reviews_dataset.csv', model_dir='saved_models',
+                  low=0.05, high=0.95, max_depth=6, min_samples_leaf=50):
+    """
+    Fit the metadata model and report the cascade on the hold-out set
+
+    Uses the same stratified 70/30 split as train_model.py, so the
+    hold-out rows were not seen by either stage.
+
+    Args:
+        data_path: labeled review CSV
+        model_dir: directory with the trained full model; the cascade is saved here
+        low, high: uncertainty band for early exit
+        max_depth, min_samples_leaf: metadata decision tree settings
+
+    Returns:
+        report dict for the chosen band
+    """
+    from model_utils import load_trained_model
+
+    print("="*60)
+    print("METADATA CASCADE - TRAINING")
+    print("="*60)
+
+    df = pd.read_csv(data_path)
+    df['label_binary'] = (df['label'] == 'CG').astype(int)
+    train_df, test_df = train_test_split(
+        df, test_size=0.3, random_state=42, stratify=df['label_binary']
+    )
+    y_train = train_df['label_binary'].values
+    y_test = test_df['label_binary'].values
+
+    extractor = ReviewFeatureExtractor()
+    metadata_model = DecisionTreeClassifier(
+        max_depth=max_depth, min_samples_leaf=min_samples_leaf, random_state=42
+    )
+    metadata_model.fit(extractor.extract_metadata_frame(train_df).to_numpy(dtype=np.float64), y_train)
+    cascade = CascadeScorer(metadata_model, low=low, high=high)
+
+    # Time each stage on the full hold-out set
+    model, feature_extractor = load_trained_model(model_dir)
+    start = time.perf_counter()
+    meta_proba = cascade.metadata_proba(test_df)
+    meta_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    features, _ = prepare_features(test_df, feature_extractor, is_training=False)
+    full_proba = model.predict_proba(features)[:, 1]
+    full_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cascade.predict_proba(test_df, model, feature_extractor)
+    measured_ms = (time.perf_counter() - start) / len(test_df) * 1e3
+
+    print(f"\nHold-out: {len(test_df)} reviews")
+    print(f"{'band':>12} {'skip':>7} {'acc full':>9} {'acc casc':>9} {'agree':>7} {'saved':>7}")
+    for band_low, band_high in sorted(set(REPORT_BANDS + [(low, high)])):
+        row = _band_metrics(y_test, full_proba, meta_proba, band_low, band_high,
+                            full_seconds, meta_seconds)
+        print(f"{band_low:>5}-{band_high:<6} {row['skip_rate']:>7.2%} {row['full_accuracy']:>9.4f} "
+              f"{row['cascade_accuracy']:>9.4f} {row['prediction_agreement']:>7.2%} "
+              f"{row['latency_saved_pct']:>6.1f}%")
+
+    report = _band_metrics(y_test, full_proba, meta_proba, low, high, full_seconds, meta_seconds)
+    report['measured_cascade_ms_per_review'] = round(measured_ms, 4)
+    report['holdout_rows'] = int(len(test_df))
+
+    print(f"\nChosen band ({low}, {high}): skip rate {report['skip_rate']:.2%}, "
+          f"{report['full_ms_per_review']:.3f} -> {measured_ms:.3f} ms/review measured, "
+          f"accuracy {report['full_accuracy']:.4f} -> {report['cascade_accuracy']:.4f}")
+
+    cascade.save(model_dir, report=report)
+    print(f"Cascade saved: {model_dir}/metadata_model.pkl, {model_dir}/cascade.json")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the metadata-first cascade scorer")
+    parser.add_argument('--data', default='../data/enhanced_reviews_dataset.csv')
+    parser.add_argument('--model-dir', default='saved_models')
+    parser.add_argument('--low', type=float, default=0.05)
+    parser.add_argument('--high', type=float, default=0.95)
+    parser.add_argument('--max-depth', type=int, default=6)
+    args = parser.parse_args()
+
+    train_cascade(args.data, args.model_dir, low=args.low, high=args.high, max_depth=args.max_depth)
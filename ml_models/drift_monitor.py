@@ -0,0 +1,347 @@
+"""
+Feature Drift Monitoring
+Running moments and fixed-bin histograms of the statistical features of
+scored reviews, compared with the fitted scaler and a reference profile of
+the training data (PSI / binned KS), plus TF-IDF out-of-vocabulary rates
+"""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Smallest bin share used in PSI, so empty bins do not divide by zero
+PSI_FLOOR = 1e-4
+
+# Relative slack added to bin edges (see build_reference)
+EDGE_TOLERANCE = 1e-9
+
+
+def _feature_names(scaler):
+    names = getattr(scaler, 'feature_names_in_', None)
+    if names is None:
+        return [f"feature_{i}" for i in range(len(scaler.mean_))]
+    return [str(name) for name in names]
+
+
+def _bin_index(values, edges):
+    """Right-inclusive bin of every value: number of edges below it (edges padded with +inf)"""
+    return (values[:, :, None] > edges[None, :, :]).sum(axis=2)
+
+
+def _tfidf_analyzer(feature_extractor):
+    """(analyzer, vocabulary) of a fitted TF-IDF vectorizer, or None when it has no vocabulary"""
+    vectorizer = feature_extractor.tfidf_vectorizer
+    vocabulary = getattr(vectorizer, 'vocabulary_', None)
+    if vocabulary is None:
+        return None
+    return vectorizer.build_analyzer(), vocabulary
+
+
+def _term_counts(texts, feature_extractor, analyzer=None):
+    """(texts, analyzed terms, terms outside the vocabulary, texts with no vocabulary term)"""
+    analyzer = analyzer or _tfidf_analyzer(feature_extractor)
+    if analyzer is None:
+        return 0, 0, 0, 0
+    analyze, vocabulary = analyzer
+    count = terms = oov = empty = 0
+    for text in texts:
+        analyzed = analyze(feature_extractor.preprocess_text(text))
+        missing = sum(1 for term in analyzed if term not in vocabulary)
+        count += 1
+        terms += len(analyzed)
+        oov += missing
+        empty += missing == len(analyzed)
+    return count, terms, oov, empty
+
+
+def build_reference(df, feature_extractor, bins=10):
+    """
+    Reference profile of the statistical features for drift comparisons
+
+    Bin edges are the deciles (for bins=10) of each feature over df, so
+    every bin holds about the same share of the reference rows; repeated
+    quantiles (binary and count features) collapse into fewer bins.
+
+    Args:
+        df: reviews representative of the training data
+        feature_extractor: fitted feature extractor of the served model
+
+    Returns:
+        dict of numpy arrays (see DriftMonitor)
+    """
+    scaler = feature_extractor.scaler
+    values = feature_extractor.extract_all_features(df, verbose=False).to_numpy(dtype=np.float64)
+    values = values[np.isfinite(values).all(axis=1)]
+
+    edges = np.full((values.shape[1], bins - 1), np.inf)
+    proportions = np.zeros((values.shape[1], bins))
+    for feature in range(values.shape[1]):
+        cuts = np.unique(np.quantile(values[:, feature], np.linspace(0, 1, bins + 1)[1:-1]))
+        # Served values are unscaled from the scaled matrix, so a value equal to a cut
+        # may come back a few ulps above it; nudge the cuts up to keep it in its bin
+        edges[feature, :len(cuts)] = cuts + EDGE_TOLERANCE * np.maximum(np.abs(cuts), 1.0)
+    counts = _bin_index(values, edges)
+    for feature in range(values.shape[1]):
+        proportions[feature] = np.bincount(counts[:, feature], minlength=bins) / len(values)
+
+    texts, terms, oov, empty = _term_counts(df['text_'], feature_extractor)
+    return {
+        'feature_names': np.array(_feature_names(scaler)),
+        'scaler_mean': np.asarray(scaler.mean_, dtype=np.float64),
+        'scaler_var': np.asarray(scaler.var_, dtype=np.float64),
+        'edges': edges,
+        'proportions': proportions,
+        'rows': np.array(len(values)),
+        'oov_rate': np.array(oov / terms if terms else np.nan),
+        'empty_rate': np.array(empty / texts if texts else np.nan)
+    }
+
+
+class _Accumulator:
+    """Running moments, histograms and term counters; written by one thread only"""
+
+    def __init__(self, n_features, n_bins):
+        self.rows = 0
+        self.mean = np.zeros(n_features)
+        self.m2 = np.zeros(n_features)
+        self.histogram = np.zeros((n_features, n_bins), dtype=np.int64)
+        self.texts = 0
+        self.terms = 0
+        self.oov_terms = 0
+        self.empty_texts = 0
+
+    def _merge_moments(self, rows, mean, m2):
+        """Chan et al. parallel update of count, mean and sum of squared deviations"""
+        if not rows:
+            return
+        total = self.rows + rows
+        delta = mean - self.mean
+        self.m2 += m2 + delta ** 2 * self.rows * rows / total
+        self.mean += delta * rows / total
+        self.rows = total
+
+    def add(self, values, bins, term_counts):
+        mean = values.mean(axis=0)
+        self._merge_moments(len(values), mean, ((values - mean) ** 2).sum(axis=0))
+        n_features, n_bins = self.histogram.shape
+        flat = (bins + np.arange(n_features) * n_bins).ravel()
+        self.histogram += np.bincount(flat, minlength=n_features * n_bins).reshape(n_features, n_bins)
+        texts, terms, oov, empty = term_counts
+        self.texts += texts
+        self.terms += terms
+        self.oov_terms += oov
+        self.empty_texts += empty
+
+    def merge(self, other):
+        self._merge_moments(other.rows, other.mean, other.m2)
+        self.histogram += other.histogram
+        self.texts += other.texts
+        self.terms += other.terms
+        self.oov_terms += other.oov_terms
+        self.empty_texts += other.empty_texts
+
+
+class DriftMonitor:
+    """
+    Streaming comparison of scored reviews with the training distribution
+
+    Every thread updates its own accumulator, so observe() takes no lock;
+    stats() merges them on read, and accumulators of finished threads are
+    folded into one, so memory stays O(features x bins) per live thread.
+    Reviews answered from the prediction cache or by the cascade's
+    metadata model are not observed, since no text features are built for
+    them. Counters are per worker process.
+
+    Moments are compared with the scaler the model was trained with
+    (mean shift in training standard deviations, ratio of standard
+    deviations); histograms with the reference profile from
+    build_reference (population stability index and the largest gap
+    between the binned cumulative distributions, a binned KS distance).
+    """
+
+    def __init__(self, reference, psi_threshold=0.2, min_rows=100):
+        self.feature_names = [str(name) for name in reference['feature_names']]
+        self.train_mean = np.asarray(reference['scaler_mean'], dtype=np.float64)
+        self.train_std = np.sqrt(np.asarray(reference['scaler_var'], dtype=np.float64))
+        self.edges = np.asarray(reference['edges'], dtype=np.float64)
+        self.proportions = np.asarray(reference['proportions'], dtype=np.float64)
+        self.n_bins = self.proportions.shape[1]
+        self.used_bins = (self.edges < np.inf).sum(axis=1) + 1
+        self.reference_rows = int(reference['rows'])
+        self.reference_oov_rate = float(reference['oov_rate'])
+        self.reference_empty_rate = float(reference['empty_rate'])
+        self.psi_threshold = psi_threshold
+        self.min_rows = min_rows
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._accumulators = []
+        self._retired = self._new_accumulator()
+        self._analyzer = (None, None)
+
+    @classmethod
+    def load(cls, reference_path, feature_extractor, data_path, bins=10, sample_rows=5000, **kwargs):
+        """
+        Load the saved reference profile, (re)building it from the dataset
+        when it is missing or was built for a different scaler
+
+        Returns:
+            DriftMonitor
+        """
+        reference = None
+        if os.path.exists(reference_path):
+            with np.load(reference_path) as saved:
+                reference = {key: saved[key] for key in saved.files}
+            scaler = feature_extractor.scaler
+            if (reference['proportions'].shape[1] != bins or
+                    reference['scaler_mean'].shape != scaler.mean_.shape or
+                    not np.allclose(reference['scaler_mean'], scaler.mean_) or
+                    not np.allclose(reference['scaler_var'], scaler.var_)):
+                reference = None
+
+        if reference is None:
+            print(f"Building drift reference from {data_path}...")
+            df = pd.read_csv(data_path)
+            if len(df) > sample_rows:
+                df = df.sample(sample_rows, random_state=42)
+            reference = build_reference(df, feature_extractor, bins=bins)
+            os.makedirs(os.path.dirname(os.path.abspath(reference_path)), exist_ok=True)
+            np.savez(reference_path, **reference)
+        return cls(reference, **kwargs)
+
+    def _new_accumulator(self):
+        return _Accumulator(len(self.feature_names), self.n_bins)
+
+    def _retire_finished(self):
+        """Fold accumulators of finished threads into the retired one (caller holds the lock)"""
+        live = []
+        for thread, accumulator in self._accumulators:
+            if thread.is_alive():
+                live.append((thread, accumulator))
+            else:
+                self._retired.merge(accumulator)
+        self._accumulators = live
+
+    def _accumulator(self):
+        accumulator = getattr(self._local, 'accumulator', None)
+        if accumulator is None:
+            accumulator = self._local.accumulator = self._new_accumulator()
+            with self._lock:
+                self._retire_finished()
+                self._accumulators.append((threading.current_thread(), accumulator))
+        return accumulator
+
+    def observe(self, features, texts, feature_extractor):
+        """
+        Record the reviews of one scored feature matrix
+
+        Args:
+            features: matrix from prepare_features (scaled statistical
+                      features first, dense or sparse)
+            texts: raw review texts of the rows
+            feature_extractor: extractor that built the matrix
+        """
+        n_features = len(self.feature_names)
+        block = features[:, :n_features]
+        block = block.toarray() if hasattr(block, 'toarray') else np.asarray(block, dtype=np.float64)
+        scaler = feature_extractor.scaler
+        values = block * scaler.scale_ + scaler.mean_
+        values = values[np.isfinite(values).all(axis=1)]
+        if not len(values):
+            return
+
+        # The analyzer is rebuilt only when a new model snapshot brings a new vectorizer
+        vectorizer, analyzer = self._analyzer
+        if vectorizer is not feature_extractor.tfidf_vectorizer:
+            analyzer = _tfidf_analyzer(feature_extractor)
+            self._analyzer = (feature_extractor.tfidf_vectorizer, analyzer)
+        term_counts = _term_counts(texts, feature_extractor, analyzer) if analyzer else (0, 0, 0, 0)
+
+        self._accumulator().add(values, _bin_index(values, self.edges), term_counts)
+
+    def _merged(self):
+        merged = self._new_accumulator()
+        with self._lock:
+            self._retire_finished()
+            merged.merge(self._retired)
+            for _, accumulator in self._accumulators:
+                merged.merge(accumulator)
+        return merged
+
+    def stats(self):
+        """Per-feature moments, PSI and KS against the reference, and TF-IDF vocabulary coverage"""
+        merged = self._merged()
+        rows = merged.rows
+        live_std = np.sqrt(merged.m2 / rows) if rows else np.zeros_like(self.train_std)
+        scale = np.where(self.train_std > 0, self.train_std, 1.0)
+
+        features = []
+        drifted = []
+        for i, name in enumerate(self.feature_names):
+            used = self.used_bins[i]
+            psi = ks = None
+            if rows:
+                live = merged.histogram[i, :used] / rows
+                expected = self.proportions[i, :used]
+                ks = float(np.max(np.abs(np.cumsum(live) - np.cumsum(expected))))
+                live, expected = np.maximum(live, PSI_FLOOR), np.maximum(expected, PSI_FLOOR)
+                psi = float(np.sum((live - expected) * np.log(live / expected)))
+                if rows >= self.min_rows and psi >= self.psi_threshold:
+                    drifted.append(name)
+            features.append({
+                'feature': name,
+                'train_mean': round(float(self.train_mean[i]), 6),
+                'train_std': round(float(self.train_std[i]), 6),
+                'live_mean': round(float(merged.mean[i]), 6) if rows else None,
+                'live_std': round(float(live_std[i]), 6) if rows else None,
+                'mean_shift': round(float((merged.mean[i] - self.train_mean[i]) / scale[i]), 4) if rows else None,
+                'std_ratio': (round(float(live_std[i] / self.train_std[i]), 4)
+                              if rows and self.train_std[i] > 0 else None),
+                'psi': round(psi, 4) if psi is not None else None,
+                'ks': round(ks, 4) if ks is not None else None
+            })
+
+        def rate(value):
+            return None if value is None or np.isnan(value) else round(float(value), 4)
+
+        return {
+            'rows': rows,
+            'reference_rows': self.reference_rows,
+            'bins': self.n_bins,
+            'psi_threshold': self.psi_threshold,
+            'min_rows': self.min_rows,
+            'drifted_features': drifted,
+            'features': features,
+            'tfidf': {
+                'reviews': merged.texts,
+                'terms': merged.terms,
+                'oov_rate': rate(merged.oov_terms / merged.terms if merged.terms else None),
+                'reference_oov_rate': rate(self.reference_oov_rate),
+                'empty_rate': rate(merged.empty_texts / merged.texts if merged.texts else None),
+                'reference_empty_rate': rate(self.reference_empty_rate)
+            }
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from model_utils import load_trained_model
+
+    parser = argparse.ArgumentParser(description="Build the drift reference profile of the served model")
+    parser.add_argument('--data', default='../data/enhanced_reviews_dataset.csv')
+    parser.add_argument('--model-dir', default='saved_models')
+    parser.add_argument('--output', default=None, help="default: <model-dir>/drift_reference.npz")
+    parser.add_argument('--bins', type=int, default=10)
+    parser.add_argument('--sample-rows', type=int, default=5000)
+    args = parser.parse_args()
+
+    _, feature_extractor = load_trained_model(args.model_dir)
+    output = args.output or os.path.join(args.model_dir, 'drift_reference.npz')
+    if os.path.exists(output):
+        os.remove(output)
+    monitor = DriftMonitor.load(output, feature_extractor, args.data, bins=args.bins,
+                                sample_rows=args.sample_rows)
+    print(f"Saved {output} ({monitor.reference_rows} reference rows)")
@@ -0,0 +1,335 @@
+"""
+Near-Duplicate Index for Fake Review Campaigns
+MinHash signatures with LSH banding over preprocessed review text
+"""
+
+import hashlib
+import re
+import threading
+import zlib
+import heapq
+
+import numpy as np
+import pandas as pd
+
+# Mersenne prime used by the universal hash family
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+class DuplicateIndex:
+    """
+    Incremental MinHash/LSH index that groups near-copies into clusters
+
+    Each review is reduced to a set of word shingles, summarised by a MinHash
+    signature and split into bands. Reviews sharing any band bucket become
+    candidates; candidates whose estimated Jaccard similarity clears the
+    threshold are merged into one cluster (union-find), so lookups only touch
+    the handful of reviews in matching buckets instead of the whole corpus.
+
+    Scored traffic goes through track(), which is bounded: at most
+    max_tracked reviews are indexed at runtime, and a text that was
+    already tracked (e.g. a retried request) is not counted again.
+    """
+
+    def __init__(self, preprocess, num_perm=128, bands=16, shingle_size=3,
+                 threshold=0.7, seed=42, max_tracked=100000):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.preprocess = preprocess
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.max_tracked = max_tracked
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = []
+        self._previews = []
+        self._exact = {}
+
+        # Union-find state: parent per document, stats per cluster root
+        self._parent = []
+        self._cluster_size = {}
+        self._cluster_fake = {}
+        self._cluster_labelled = {}
+        self._documents = 0
+        # Roots of clusters with more than one review, and up to 3 member
+        # doc ids (lowest first) per such root, for largest_clusters()
+        self._duplicate_roots = set()
+        self._samples = {}
+
+        # Text hash -> (doc id, similarity, exact) for reviews indexed by track()
+        self._tracked = {}
+
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._documents
+
+    def shingles(self, text):
+        """Return the set of word shingles of the preprocessed text"""
+        tokens = re.findall(r'[a-z0-9]+', self.preprocess(text))
+        if not tokens:
+            return set()
+        if len(tokens) < self.shingle_size:
+            return {' '.join(tokens)}
+        return {
+            ' '.join(tokens[i:i + self.shingle_size])
+            for i in range(len(tokens) - self.shingle_size + 1)
+        }
+
+    def signature(self, text):
+        """Compute the MinHash signature of a review, or None for empty text"""
+        shingles = self.shingles(text)
+        if not shingles:
+            return None
+
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode('utf-8')) for s in shingles),
+            dtype=np.uint64, count=len(shingles)
+        )
+        permuted = (hashes[:, None] * self._a + self._b) % _MERSENNE_PRIME
+        return (permuted & _MAX_HASH).min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        r = self.rows_per_band
+        return [signature[i * r:(i + 1) * r].tobytes() for i in range(self.bands)]
+
+    def _find(self, doc_id):
+        parent = self._parent
+        while parent[doc_id] != doc_id:
+            parent[doc_id] = parent[parent[doc_id]]
+            doc_id = parent[doc_id]
+        return doc_id
+
+    def _union(self, a, b):
+        root_a, root_b = self._find(a), self._find(b)
+        if root_a == root_b:
+            return root_a
+        if self._cluster_size[root_a] < self._cluster_size[root_b]:
+            root_a, root_b = root_b, root_a
+        self._parent[root_b] = root_a
+        self._cluster_size[root_a] += self._cluster_size.pop(root_b)
+        self._cluster_fake[root_a] += self._cluster_fake.pop(root_b)
+        self._cluster_labelled[root_a] += self._cluster_labelled.pop(root_b)
+        self._duplicate_roots.discard(root_b)
+        self._duplicate_roots.add(root_a)
+        self._samples[root_a] = sorted(self._samples.get(root_a, [root_a]) +
+                                       self._samples.pop(root_b, [root_b]))[:3]
+        return root_a
+
+    def _matches(self, signature):
+        """Return {doc_id: similarity} for indexed documents above threshold"""
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+
+        matches = {}
+        for doc_id in candidates:
+            similarity = float(np.mean(self._signatures[doc_id] == signature))
+            if similarity >= self.threshold:
+                matches[doc_id] = similarity
+        return matches
+
+    def _signal(self, root, similarity, exact):
+        size = self._cluster_size[root]
+        labelled = self._cluster_labelled[root]
+        return {
+            'cluster_id': int(root),
+            'cluster_size': int(size),
+            'is_duplicate': size > 1,
+            'exact_duplicate': exact,
+            'max_similarity': round(similarity, 4),
+            'cluster_fake_rate': round(self._cluster_fake[root] / labelled, 4) if labelled else None
+        }
+
+    def query(self, text):
+        """
+        Look up the cluster a review would join, without indexing it
+
+        Returns:
+            duplicate signal dict, or None when the text has no tokens
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return None
+
+        with self._lock:
+            matches = self._matches(signature)
+            if not matches:
+                return {
+                    'cluster_id': None,
+                    'cluster_size': 1,
+                    'is_duplicate': False,
+                    'exact_duplicate': False,
+                    'max_similarity': 0.0,
+                    'cluster_fake_rate': None
+                }
+            best = max(matches, key=matches.get)
+            signal = self._signal(self._find(best), matches[best], matches[best] == 1.0)
+            signal['cluster_size'] += 1
+            return signal
+
+    def add(self, text, label=None):
+        """
+        Index a review and merge it into any matching cluster
+
+        Exact signature repeats are counted towards their cluster but not
+        stored again, so verbatim copies cost no extra index memory.
+
+        Args:
+            text: raw review text
+            label: 'CG' / 'OR' when known, None for unlabelled traffic
+
+        Returns:
+            duplicate signal dict, or None when the text has no tokens
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return None
+
+        with self._lock:
+            doc_id, similarity, exact = self._insert(signature, text, label)
+            return self._signal(self._find(doc_id), similarity, exact)
+
+    def _insert(self, signature, text, label):
+        """
+        Index one review (caller holds the lock)
+
+        Returns:
+            (doc id of the stored document it is or repeats, best similarity, exact repeat)
+        """
+        self._documents += 1
+        digest = signature.tobytes()
+        if digest in self._exact:
+            doc_id = self._exact[digest]
+            root = self._find(doc_id)
+            self._cluster_size[root] += 1
+            self._duplicate_roots.add(root)
+            self._cluster_fake[root] += int(label == 'CG')
+            self._cluster_labelled[root] += int(label in ('CG', 'OR'))
+            return doc_id, 1.0, True
+
+        matches = self._matches(signature)
+
+        doc_id = len(self._signatures)
+        self._signatures.append(signature)
+        self._previews.append(str(text)[:200])
+        self._exact[digest] = doc_id
+        self._parent.append(doc_id)
+        self._cluster_size[doc_id] = 1
+        self._cluster_fake[doc_id] = int(label == 'CG')
+        self._cluster_labelled[doc_id] = int(label in ('CG', 'OR'))
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, []).append(doc_id)
+
+        root = doc_id
+        for match in matches:
+            root = self._union(root, match)
+
+        return doc_id, max(matches.values()) if matches else 0.0, False
+
+    def track(self, text):
+        """
+        Index a scored review, at most once per distinct text
+
+        A text already tracked gets the signal of the cluster it joined
+        without being counted again, so retries do not inflate clusters.
+        Once max_tracked reviews have been tracked, new ones are only
+        looked up (query) so the index stops growing.
+
+        Returns:
+            duplicate signal dict, or None when the text has no tokens
+        """
+        # A 128-bit digest: colliding texts would share (and misreport) one cluster signal
+        key = hashlib.blake2b(str(text).encode('utf-8'), digest_size=16).digest()
+        with self._lock:
+            tracked = self._tracked.get(key)
+            if tracked is not None:
+                doc_id, similarity, exact = tracked
+                return self._signal(self._find(doc_id), similarity, exact)
+            full = len(self._tracked) >= self.max_tracked
+        if full:
+            return self.query(text)
+
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        with self._lock:
+            # Another request may have tracked the same text meanwhile
+            tracked = self._tracked.get(key)
+            if tracked is None:
+                tracked = self._tracked[key] = self._insert(signature, text, None)
+            doc_id, similarity, exact = tracked
+            return self._signal(self._find(doc_id), similarity, exact)
+
+    def largest_clusters(self, limit=10, min_size=2):
+        """Return the largest clusters with a sample of their member texts"""
+        with self._lock:
+            # Singletons cannot qualify, so only clusters that have merged are ranked
+            # (in doc id order, so ties rank the oldest cluster first)
+            candidates = sorted(self._duplicate_roots) if min_size >= 2 else self._cluster_size
+            roots = heapq.nlargest(
+                limit,
+                (root for root in candidates if self._cluster_size[root] >= min_size),
+                key=self._cluster_size.get
+            )
+            members = {root: [self._previews[doc_id] for doc_id in self._samples.get(root, [root])]
+                       for root in roots}
+
+            clusters = []
+            for root in roots:
+                labelled = self._cluster_labelled[root]
+                clusters.append({
+                    'cluster_id': int(root),
+                    'cluster_size': int(self._cluster_size[root]),
+                    'fake_count': int(self._cluster_fake[root]),
+                    'cluster_fake_rate': round(self._cluster_fake[root] / labelled, 4) if labelled else None,
+                    'sample_texts': members[root]
+                })
+            return clusters
+
+    def stats(self):
+        """Return index size and cluster counts"""
+        with self._lock:
+            return {
+                'documents': self._documents,
+                'unique_signatures': len(self._signatures),
+                'clusters': len(self._cluster_size),
+                'duplicate_clusters': len(self._duplicate_roots),
+                'tracked': len(self._tracked),
+                'max_tracked': self.max_tracked,
+                'num_perm': self.num_perm,
+                'bands': self.bands,
+                'threshold': self.threshold
+            }
+
+    @classmethod
+    def from_csv(cls, data_path, preprocess, chunksize=10000, **kwargs):
+        """Build an index over the text_ and label columns of a review CSV"""
+        index = cls(preprocess, **kwargs)
+        for chunk in pd.read_csv(data_path, usecols=['text_', 'label'], chunksize=chunksize):
+            for text, label in zip(chunk['text_'], chunk['label']):
+                index.add(text, label)
+        return index
+
+
+if __name__ == "__main__":
+    from feature_extraction import ReviewFeatureExtractor
+
+    print("Building near-duplicate index...")
+    index = DuplicateIndex.from_csv(
+        '../data/enhanced_reviews_dataset.csv',
+        ReviewFeatureExtractor().preprocess_text
+    )
+    print(index.stats())
+    for cluster in index.largest_clusters(limit=5):
+        print(f"  {cluster['cluster_size']:4} reviews  fake rate {cluster['cluster_fake_rate']}  "
+              f"{cluster['sample_texts'][0][:70]!r}")
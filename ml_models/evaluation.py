@@ -0,0 +1,318 @@
+"""
+Single-Pass Model Evaluation
+Scores a hold-out set once and derives every metric, curve and threshold
+sweep from that one probability vector
+"""
+
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from model_utils import SUSPICIOUS_THRESHOLD
+
+DECISION_THRESHOLD = 0.5          # predict() picks FAKE when P(fake) > 0.5
+SWEEP_THRESHOLDS = np.round(np.linspace(0.0, 1.0, 101), 2)
+MAX_CURVE_POINTS = 200
+
+
+def metrics_from_counts(tn, fp, fn, tp, roc_auc):
+    """Build the metrics dict (same keys as evaluate()) from confusion counts"""
+    def ratio(a, b):
+        return a / b if b > 0 else 0.0
+
+    per_class = {}
+    for label, (correct, predicted, actual) in (
+        ('0', (tn, tn + fn, tn + fp)),
+        ('1', (tp, tp + fp, tp + fn))
+    ):
+        precision = ratio(correct, predicted)
+        recall = ratio(correct, actual)
+        per_class[label] = {
+            'precision': precision,
+            'recall': recall,
+            'f1-score': ratio(2 * precision * recall, precision + recall),
+            'support': int(actual)
+        }
+
+    total = tn + fp + fn + tp
+    report = dict(per_class)
+    report['accuracy'] = ratio(tn + tp, total)
+    for avg_name, weights in (('macro avg', (1, 1)),
+                              ('weighted avg', (per_class['0']['support'], per_class['1']['support']))):
+        report[avg_name] = {
+            key: ratio(weights[0] * per_class['0'][key] + weights[1] * per_class['1'][key], sum(weights))
+            for key in ('precision', 'recall', 'f1-score')
+        }
+        report[avg_name]['support'] = int(total)
+
+    return {
+        'accuracy': report['accuracy'],
+        'precision': per_class['1']['precision'],
+        'recall': per_class['1']['recall'],
+        'f1_score': per_class['1']['f1-score'],
+        'roc_auc': roc_auc,
+        'confusion_matrix': [[int(tn), int(fp)], [int(fn), int(tp)]],
+        'true_negatives': int(tn),
+        'false_positives': int(fp),
+        'false_negatives': int(fn),
+        'true_positives': int(tp),
+        'classification_report': report
+    }
+
+
+def histogram_auc(positive_hist, negative_hist):
+    """ROC-AUC from per-class score histograms (bins in ascending score order)"""
+    positives, negatives = positive_hist.sum(), negative_hist.sum()
+    if positives == 0 or negatives == 0:
+        return 0.0
+    negatives_below = np.cumsum(negative_hist) - negative_hist
+    wins = (positive_hist * (negatives_below + 0.5 * negative_hist)).sum()
+    return float(wins / (positives * negatives))
+
+
+def _ratio(a, b):
+    """Elementwise a / b with 0 where b == 0"""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    return np.divide(a, b, out=np.zeros_like(a), where=b > 0)
+
+
+def counts_above(y_true, scores, thresholds):
+    """
+    Confusion counts for 'P(fake) > t' at every threshold, in one sort
+
+    Returns:
+        (tn, fp, fn, tp) integer arrays, one entry per threshold
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    positives = np.sort(scores[y_true == 1])
+    negatives = np.sort(scores[y_true == 0])
+    tp = len(positives) - np.searchsorted(positives, thresholds, side='right')
+    fp = len(negatives) - np.searchsorted(negatives, thresholds, side='right')
+    return len(negatives) - fp, fp, len(positives) - tp, tp
+
+
+def _downsample(*columns, max_points=MAX_CURVE_POINTS):
+    """Keep at most max_points evenly spaced points (always the first and last)"""
+    n = len(columns[0])
+    if n <= max_points:
+        keep = np.arange(n)
+    else:
+        keep = np.unique(np.linspace(0, n - 1, max_points).round().astype(int))
+    return [np.round(np.asarray(column)[keep], 6).tolist() for column in columns]
+
+
+def ranking_curves(y_true, scores):
+    """
+    ROC and precision-recall curves over every distinct score
+
+    Returns:
+        dict with roc_auc, average_precision and downsampled roc_curve / pr_curve
+    """
+    order = np.argsort(-scores, kind='mergesort')
+    sorted_scores = scores[order]
+    sorted_labels = y_true[order]
+
+    # Last position of each distinct score: predicting FAKE for score >= that value
+    distinct = np.r_[np.flatnonzero(np.diff(sorted_scores)), len(scores) - 1]
+    tps = np.cumsum(sorted_labels)[distinct].astype(np.float64)
+    fps = (distinct + 1) - tps
+    thresholds = sorted_scores[distinct]
+
+    positives, negatives = tps[-1], fps[-1]
+    tpr = np.r_[0.0, _ratio(tps, positives)]
+    fpr = np.r_[0.0, _ratio(fps, negatives)]
+    precision = _ratio(tps, tps + fps)
+    recall = _ratio(tps, positives)
+
+    roc_auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2)) if positives and negatives else 0.0
+    average_precision = float(np.sum(np.diff(np.r_[0.0, recall]) * precision))
+
+    roc_fpr, roc_tpr, roc_thresholds = _downsample(fpr, tpr, np.r_[1.0, thresholds])
+    pr_recall, pr_precision, pr_thresholds = _downsample(recall, precision, thresholds)
+    return {
+        'roc_auc': roc_auc,
+        'average_precision': average_precision,
+        'roc_curve': {'fpr': roc_fpr, 'tpr': roc_tpr, 'thresholds': roc_thresholds},
+        'pr_curve': {'precision': pr_precision, 'recall': pr_recall, 'thresholds': pr_thresholds}
+    }
+
+
+def threshold_sweep(y_true, scores, thresholds=SWEEP_THRESHOLDS):
+    """Confusion counts and rates at each threshold, as one array per field"""
+    tn, fp, fn, tp = counts_above(y_true, scores, thresholds)
+    precision = _ratio(tp, tp + fp)
+    recall = _ratio(tp, tp + fn)
+    return {
+        'threshold': np.asarray(thresholds, dtype=np.float64).tolist(),
+        'true_negatives': tn.tolist(),
+        'false_positives': fp.tolist(),
+        'false_negatives': fn.tolist(),
+        'true_positives': tp.tolist(),
+        'precision': np.round(precision, 6).tolist(),
+        'recall': np.round(recall, 6).tolist(),
+        'f1_score': np.round(_ratio(2 * precision * recall, precision + recall), 6).tolist(),
+        'false_positive_rate': np.round(_ratio(fp, fp + tn), 6).tolist(),
+        'accuracy': np.round(_ratio(tp + tn, len(scores)), 6).tolist()
+    }
+
+
+def status_breakdown(y_true, scores, threshold=DECISION_THRESHOLD,
+                     suspicious_threshold=SUSPICIOUS_THRESHOLD):
+    """
+    Reviews per served status (FAKE / SUSPICIOUS / GENUINE) and true label
+
+    SUSPICIOUS is predicted genuine with P(fake) above suspicious_threshold,
+    as in model_utils.prediction_status.
+    """
+    status = np.select([scores > threshold, scores > suspicious_threshold], [0, 1], default=2)
+    counts = np.bincount(status * 2 + y_true, minlength=6).reshape(3, 2)
+    breakdown = {}
+    for row, name in enumerate(('FAKE', 'SUSPICIOUS', 'GENUINE')):
+        genuine, fake = int(counts[row, 0]), int(counts[row, 1])
+        breakdown[name] = {
+            'fake': fake,
+            'genuine': genuine,
+            'fake_rate': round(fake / (fake + genuine), 6) if fake + genuine else 0.0
+        }
+    breakdown['suspicious_threshold'] = suspicious_threshold
+    return breakdown
+
+
+def evaluate_scores(y_true, scores, threshold=DECISION_THRESHOLD):
+    """
+    Every evaluation metric from one vector of fake probabilities
+
+    Args:
+        y_true: 0/1 labels (1 = fake)
+        scores: P(fake) per review
+        threshold: decision threshold for the headline metrics
+
+    Returns:
+        metrics dict: the keys evaluate() always produced (accuracy ...
+        classification_report) plus average_precision, roc_curve, pr_curve,
+        threshold_sweep, status_breakdown and test_samples
+    """
+    y_true = np.asarray(y_true, dtype=np.int64).ravel()
+    scores = np.asarray(scores, dtype=np.float64).ravel()
+
+    curves = ranking_curves(y_true, scores)
+    (tn,), (fp,), (fn,), (tp,) = counts_above(y_true, scores, [threshold])
+    metrics = metrics_from_counts(int(tn), int(fp), int(fn), int(tp), curves.pop('roc_auc'))
+    metrics.update(curves)
+    metrics['decision_threshold'] = threshold
+    metrics['threshold_sweep'] = threshold_sweep(
+        y_true, scores, np.union1d(SWEEP_THRESHOLDS, [threshold, SUSPICIOUS_THRESHOLD])
+    )
+    metrics['status_breakdown'] = status_breakdown(y_true, scores, threshold)
+    metrics['test_samples'] = int(len(y_true))
+    metrics['evaluated_at'] = datetime.now().isoformat(timespec='seconds')
+    return metrics
+
+
+def score_batches(model, batches):
+    """
+    Run the model once over (X, y) batches
+
+    Returns:
+        (labels, fake probabilities) as flat arrays
+    """
+    labels, scores = [], []
+    for X, y in batches:
+        scores.append(model.predict_proba(X)[:, 1])
+        labels.append(np.asarray(y))
+    if not scores:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    return np.concatenate(labels), np.concatenate(scores)
+
+
+def evaluate_model(model, X_test, y_test, batch_size=10000, threshold=DECISION_THRESHOLD):
+    """Evaluate a fitted model on an in-memory test set, scoring it once in batches"""
+    batches = ((X_test[start:start + batch_size], y_test[start:start + batch_size])
+               for start in range(0, X_test.shape[0], batch_size))
+    y_true, scores = score_batches(model, batches)
+    return evaluate_scores(y_true, scores, threshold)
+
+
+def holdout_batches(test_df, feature_extractor, batch_size=10000):
+    """Feature batches for a hold-out DataFrame, extracted one batch at a time"""
+    from feature_extraction import prepare_features
+
+    for start in range(0, len(test_df), batch_size):
+        batch = test_df.iloc[start:start + batch_size]
+        features, _ = prepare_features(batch, feature_extractor, is_training=False)
+        yield features, (batch['label'] == 'CG').astype(int).values
+
+
+def write_metrics(metrics, save_dir, model_type=None):
+    """
+    Write the metrics files served by /api/analytics/model-performance
+
+    full_metrics.json gets everything; model_metrics.json the scalar values.
+    """
+    os.makedirs(save_dir, exist_ok=True)
+    with open(os.path.join(save_dir, 'full_metrics.json'), 'w') as f:
+        json.dump(metrics, f, indent=4, default=str)
+
+    simple = {k: v for k, v in metrics.items() if not isinstance(v, (dict, list, np.ndarray))}
+    simple['confusion_matrix'] = metrics['confusion_matrix']
+    if model_type:
+        simple['model_type'] = model_type
+    with open(os.path.join(save_dir, 'model_metrics.json'), 'w') as f:
+        json.dump(simple, f, indent=4)
+
+
+def main(data_path='../data/enhanced_reviews_dataset.csv', model_dir='saved_models',
+         batch_size=10000, threshold=DECISION_THRESHOLD):
+    """
+    Re-evaluate the saved model on the training script's hold-out split
+    and write the measured metrics next to it
+    """
+    from sklearn.model_selection import train_test_split
+    from model_utils import load_trained_model
+
+    print("="*60)
+    print("MODEL EVALUATION")
+    print("="*60)
+
+    df = pd.read_csv(data_path)
+    labels = (df['label'] == 'CG').astype(int)
+    _, test_df = train_test_split(df, test_size=0.3, random_state=42, stratify=labels)
+    print(f"Hold-out set: {len(test_df)} reviews")
+
+    model, feature_extractor = load_trained_model(model_dir)
+    y_true, scores = score_batches(model, holdout_batches(test_df, feature_extractor, batch_size))
+    metrics = evaluate_scores(y_true, scores, threshold)
+    if hasattr(model, 'feature_importances_'):
+        metrics['feature_importance'] = model.feature_importances_.tolist()
+    write_metrics(metrics, model_dir, model_type=type(model).__name__)
+
+    print(f"\nAccuracy:  {metrics['accuracy']:.4f}")
+    print(f"Precision: {metrics['precision']:.4f}")
+    print(f"Recall:    {metrics['recall']:.4f}")
+    print(f"F1-Score:  {metrics['f1_score']:.4f}")
+    print(f"ROC-AUC:   {metrics['roc_auc']:.4f}")
+    print(f"Avg Prec:  {metrics['average_precision']:.4f}")
+    print("\nStatus breakdown:")
+    for status in ('FAKE', 'SUSPICIOUS', 'GENUINE'):
+        row = metrics['status_breakdown'][status]
+        print(f"  {status:10} fake: {row['fake']:6}  genuine: {row['genuine']:6}  "
+              f"fake rate: {row['fake_rate']:.1%}")
+    print(f"\nMetrics written to {model_dir}/full_metrics.json")
+    return metrics
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Evaluate the saved model and write its metrics")
+    parser.add_argument('--data', default='../data/enhanced_reviews_dataset.csv')
+    parser.add_argument('--model-dir', default='saved_models')
+    parser.add_argument('--batch-size', type=int, default=10000)
+    parser.add_argument('--threshold', type=float, default=DECISION_THRESHOLD)
+    args = parser.parse_args()
+
+    main(args.data, args.model_dir, batch_size=args.batch_size, threshold=args.threshold)
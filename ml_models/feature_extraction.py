@@ -6,7 +6,8 @@ Extracts NLP and metadata features from reviews
 import pandas as pd
 import numpy as np
 import re
-from sklearn.feature_extraction.text import TfidfVectorizer
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
 from sklearn.preprocessing import StandardScaler
 import nltk
 from nltk.corpus import stopwords
@@ -25,6 +26,14 @@ try:
 except LookupError:
     nltk.download('stopwords', quiet=True)
 
+# TF-IDF settings shared by training and the feature store cache key
+TFIDF_PARAMS = {
+    'stop_words': 'english',
+    'ngram_range': (1, 2),
+    'min_df': 5,
+    'max_df': 0.8
+}
+
 
 class ReviewFeatureExtractor:
     """Extract features from review text and metadata"""
@@ -33,8 +42,23 @@ class ReviewFeatureExtractor:
         self.max_tfidf_features = max_tfidf_features
         self.tfidf_vectorizer = None
         self.scaler = None
-        self.stop_words = set(stopwords.words('english'))
-        
+        self._stop_words = None
+
+    @property
+    def stop_words(self):
+        """NLTK English stop words (loaded on first use)"""
+        if getattr(self, '_stop_words', None) is None:
+            self._stop_words = set(stopwords.words('english'))
+        return self._stop_words
+
+    def get_config(self):
+        """Return the settings that determine the extracted features"""
+        return {
+            'max_tfidf_features': self.max_tfidf_features,
+            'tfidf_params': {k: list(v) if isinstance(v, tuple) else v
+                             for k, v in TFIDF_PARAMS.items()}
+        }
+    
     def preprocess_text(self, text):
         """Clean and preprocess review text"""
         if pd.isna(text):
@@ -129,53 +153,90 @@ class ReviewFeatureExtractor:
         features['extreme_rating'] = int(row.get('rating', 3.0) in [1.0, 5.0])
         
         return features
-    
-    def extract_all_features(self, df):
-        """Extract all features from dataframe"""
-        print("Extracting text statistics...")
+
+    def extract_metadata_frame(self, df):
+        """
+        Column-wise equivalent of extract_metadata_features for a whole DataFrame
+
+        Values that are not numbers (e.g. verified_purchase "yes") raise
+        ValueError, as they do row by row.
+
+        Returns:
+            DataFrame with the same columns, in the same order, as the
+            per-row dicts of extract_metadata_features
+        """
+        def column(name, default):
+            if name in df.columns:
+                return df[name]
+            return pd.Series(default, index=df.index)
+
+        def numeric(name, default):
+            return pd.to_numeric(column(name, default))
+
+        days = numeric('days_after_purchase', 0)
+        review_count = numeric('user_review_count', 0)
+        rating = numeric('rating', 3.0)
+
+        return pd.DataFrame({
+            'verified_purchase': numeric('verified_purchase', False).fillna(0).astype(int),
+            'order_id_missing': column('order_id', None).isna().astype(int),
+            'purchase_id_missing': column('purchase_id', None).isna().astype(int),
+            'days_after_purchase': days,
+            'negative_days': (days < 0).astype(int),
+            'very_late_review': (days > 365).astype(int),
+            'user_review_count': review_count,
+            'high_review_count': (review_count > 50).astype(int),
+            'rating': rating,
+            'extreme_rating': rating.isin([1.0, 5.0]).astype(int)
+        }).reset_index(drop=True)
+
+    def extract_all_features(self, df, verbose=True, cleaned_texts=None):
+        """
+        Extract all features from dataframe
+        
+        Args:
+            cleaned_texts: preprocess_text of every df['text_'] value, when
+                           the caller already has them (skips cleaning again)
+        """
+        if verbose:
+            print("Extracting text statistics...")
+        if cleaned_texts is None:
+            cleaned_texts = (self.preprocess_text(text) for text in df['text_'])
         text_stats_list = []
-        for text in df['text_']:
-            cleaned_text = self.preprocess_text(text)
+        for cleaned_text in cleaned_texts:
             stats = self.extract_text_statistics(cleaned_text)
             text_stats_list.append(stats)
         
         text_stats_df = pd.DataFrame(text_stats_list)
         
-        print("Extracting metadata features...")
-        metadata_list = []
-        for _, row in df.iterrows():
-            meta_features = self.extract_metadata_features(row)
-            metadata_list.append(meta_features)
-        
-        metadata_df = pd.DataFrame(metadata_list)
+        if verbose:
+            print("Extracting metadata features...")
+        metadata_df = self.extract_metadata_frame(df)
         
         # Combine all features
         combined_features = pd.concat([text_stats_df, metadata_df], axis=1)
         
         return combined_features
     
-    def fit_tfidf(self, texts):
-        """Fit TF-IDF vectorizer on texts"""
+    def fit_tfidf(self, texts, cleaned=False):
+        """Fit TF-IDF vectorizer on texts (pass cleaned=True if already preprocessed)"""
         print("Fitting TF-IDF vectorizer...")
-        cleaned_texts = [self.preprocess_text(text) for text in texts]
+        cleaned_texts = list(texts) if cleaned else [self.preprocess_text(text) for text in texts]
         
         self.tfidf_vectorizer = TfidfVectorizer(
             max_features=self.max_tfidf_features,
-            stop_words='english',
-            ngram_range=(1, 2),
-            min_df=5,
-            max_df=0.8
+            **TFIDF_PARAMS
         )
         
         tfidf_matrix = self.tfidf_vectorizer.fit_transform(cleaned_texts)
         return tfidf_matrix
     
-    def transform_tfidf(self, texts):
+    def transform_tfidf(self, texts, cleaned=False):
         """Transform texts using fitted TF-IDF vectorizer"""
         if self.tfidf_vectorizer is None:
             raise ValueError("TF-IDF vectorizer not fitted. Call fit_tfidf first.")
         
-        cleaned_texts = [self.preprocess_text(text) for text in texts]
+        cleaned_texts = list(texts) if cleaned else [self.preprocess_text(text) for text in texts]
         return self.tfidf_vectorizer.transform(cleaned_texts)
     
     def fit_scaler(self, features):
@@ -193,6 +254,45 @@ class ReviewFeatureExtractor:
         return self.scaler.transform(features)
 
 
+class HashingFeatureExtractor(ReviewFeatureExtractor):
+    """
+    Feature extractor for out-of-core training
+    
+    Replaces the fitted TF-IDF vocabulary with a stateless HashingVectorizer
+    so text features can be produced chunk by chunk without a fitting pass,
+    and keeps the feature matrix sparse instead of densifying it.
+    """
+    
+    sparse_output = True
+    
+    def __init__(self, n_hash_features=2 ** 14):
+        super().__init__(max_tfidf_features=n_hash_features)
+        self.n_hash_features = n_hash_features
+        self.tfidf_vectorizer = HashingVectorizer(
+            n_features=n_hash_features,
+            stop_words=TFIDF_PARAMS['stop_words'],
+            ngram_range=TFIDF_PARAMS['ngram_range'],
+            alternate_sign=False,
+            norm='l2'
+        )
+    
+    def get_config(self):
+        """Return the settings that determine the extracted features"""
+        config = super().get_config()
+        config['hashing'] = True
+        return config
+    
+    def fit_tfidf(self, texts, cleaned=False):
+        """Hashing needs no fitting; transform directly"""
+        return self.transform_tfidf(texts, cleaned=cleaned)
+    
+    def partial_fit_scaler(self, features):
+        """Update the scaler's running mean/variance with one chunk"""
+        if self.scaler is None:
+            self.scaler = StandardScaler()
+        self.scaler.partial_fit(features)
+
+
 def prepare_features(df, extractor, is_training=True):
     """
     Prepare complete feature set for ML model
@@ -216,11 +316,17 @@ def prepare_features(df, extractor, is_training=True):
         tfidf_features = extractor.transform_tfidf(df['text_'])
         scaled_features = extractor.transform_scaler(statistical_features)
     
-    # Convert TF-IDF sparse matrix to dense
-    tfidf_dense = tfidf_features.toarray()
-    
-    # Combine all features
-    final_features = np.hstack([scaled_features, tfidf_dense])
+    if getattr(extractor, 'sparse_output', False):
+        # Hashed text features are too wide to densify
+        final_features = sparse.hstack(
+            [sparse.csr_matrix(scaled_features), tfidf_features], format='csr'
+        )
+    else:
+        # Convert TF-IDF sparse matrix to dense
+        tfidf_dense = tfidf_features.toarray()
+        
+        # Combine all features
+        final_features = np.hstack([scaled_features, tfidf_dense])
     
     print(f"Final feature matrix shape: {final_features.shape}")
     
@@ -0,0 +1,250 @@
+"""
+Feature Store for Training Runs
+Caches extracted features on disk as memory-mappable .npy files
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.model_selection import train_test_split
+
+from parallel_pipeline import StageTimer, extract_features_parallel
+
+# Bump when preprocess_text or the statistical features change
+FEATURE_STORE_VERSION = 1
+
+
+def file_content_hash(path, block_size=1 << 20):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _config_key(*parts):
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def save_texts(directory, name, texts):
+    """Store strings as one UTF-8 blob plus int64 offsets"""
+    encoded = [str(t).encode('utf-8') for t in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    np.save(os.path.join(directory, f"{name}_text_blob.npy"), blob)
+    np.save(os.path.join(directory, f"{name}_text_offsets.npy"), offsets)
+
+
+def load_texts(directory, name):
+    """Load strings written by save_texts (the blob is memory-mapped)"""
+    blob = np.load(os.path.join(directory, f"{name}_text_blob.npy"), mmap_mode='r')
+    offsets = np.load(os.path.join(directory, f"{name}_text_offsets.npy"))
+    return [blob[offsets[i]:offsets[i + 1]].tobytes().decode('utf-8')
+            for i in range(len(offsets) - 1)]
+
+
+def save_sparse(directory, name, matrix):
+    """Store a CSR matrix as uncompressed component arrays"""
+    matrix = sparse.csr_matrix(matrix)
+    np.save(os.path.join(directory, f"{name}_data.npy"), matrix.data)
+    np.save(os.path.join(directory, f"{name}_indices.npy"), matrix.indices)
+    np.save(os.path.join(directory, f"{name}_indptr.npy"), matrix.indptr)
+    np.save(os.path.join(directory, f"{name}_shape.npy"), np.array(matrix.shape, dtype=np.int64))
+
+
+def load_sparse(directory, name):
+    """Load a CSR matrix written by save_sparse without copying its arrays"""
+    arrays = [np.load(os.path.join(directory, f"{name}_{part}.npy"), mmap_mode='r')
+              for part in ('data', 'indices', 'indptr')]
+    shape = tuple(np.load(os.path.join(directory, f"{name}_shape.npy")))
+    return sparse.csr_matrix(tuple(arrays), shape=shape, copy=False)
+
+
+class FeatureStore:
+    """
+    On-disk cache of training features, keyed on dataset content and config
+
+    Entries are stored in two stages so each can be reused independently:
+    - text stage: statistical features, cleaned text and labels per split,
+      keyed on the dataset hash and the split settings
+    - tfidf stage: TF-IDF matrices and the fitted vectorizer, keyed on the
+      text stage plus the extractor config
+
+    Model hyperparameters are not part of either key, so retraining with a
+    different classifier configuration reuses every cached array.
+    """
+
+    def __init__(self, root='feature_store'):
+        self.root = root
+
+    def _path(self, stage, key):
+        return os.path.join(self.root, stage, key)
+
+    def _has(self, stage, key):
+        return os.path.exists(os.path.join(self._path(stage, key), 'meta.json'))
+
+    def _write(self, stage, key, writer, meta):
+        """Write an entry into a temp dir and rename it into place atomically"""
+        final_path = self._path(stage, key)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        tmp_path = tempfile.mkdtemp(prefix=f".{key}-", dir=os.path.dirname(final_path))
+        try:
+            writer(tmp_path)
+            with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+                json.dump(meta, f, indent=4)
+            os.replace(tmp_path, final_path)
+        except OSError:
+            # Another run published the same entry first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if not self._has(stage, key):
+                raise
+
+    def _read_meta(self, stage, key):
+        with open(os.path.join(self._path(stage, key), 'meta.json'), 'r') as f:
+            return json.load(f)
+
+    def text_stage(self, data_path, extractor, test_size=0.3, random_state=42,
+                   n_jobs=-1, timer=None):
+        """
+        Load or build statistical features, cleaned text and labels per split
+
+        On a miss, both splits are extracted concurrently across n_jobs
+        worker processes.
+
+        Returns:
+            (key, dict with train/test stats DataFrames, texts and labels)
+        """
+        timer = timer or StageTimer()
+        with timer.stage('hash dataset'):
+            dataset_hash = file_content_hash(data_path)
+        key = _config_key(FEATURE_STORE_VERSION, dataset_hash,
+                          {'test_size': test_size, 'random_state': random_state})
+
+        if not self._has('text', key):
+            print("Feature store miss: extracting statistical features...")
+            with timer.stage('load + split'):
+                df = pd.read_csv(data_path)
+                df['label_binary'] = (df['label'] == 'CG').astype(int)
+                train_df, test_df = train_test_split(
+                    df,
+                    test_size=test_size,
+                    random_state=random_state,
+                    stratify=df['label_binary']
+                )
+
+            with timer.stage('extract text statistics'):
+                extracted = extract_features_parallel([train_df, test_df], extractor, n_jobs=n_jobs)
+            splits = {
+                name: (stats, cleaned, split_df['label_binary'].values)
+                for name, split_df, (stats, cleaned) in zip(
+                    ('train', 'test'), (train_df, test_df), extracted
+                )
+            }
+
+            def writer(path):
+                for name, (stats, cleaned, labels) in splits.items():
+                    np.save(os.path.join(path, f"{name}_stats.npy"),
+                            stats.to_numpy(dtype=np.float64))
+                    np.save(os.path.join(path, f"{name}_labels.npy"), labels.astype(np.int8))
+                    save_texts(path, name, cleaned)
+
+            with timer.stage('write feature store'):
+                self._write('text', key, writer, {
+                    'version': FEATURE_STORE_VERSION,
+                    'dataset_hash': dataset_hash,
+                    'test_size': test_size,
+                    'random_state': random_state,
+                    'feature_names': splits['train'][0].columns.tolist(),
+                    'train_rows': len(train_df),
+                    'test_rows': len(test_df)
+                })
+        else:
+            print(f"Feature store hit: text stage {key}")
+
+        meta = self._read_meta('text', key)
+        path = self._path('text', key)
+        result = {'feature_names': meta['feature_names']}
+        with timer.stage('load feature store'):
+            for name in ('train', 'test'):
+                stats = np.load(os.path.join(path, f"{name}_stats.npy"), mmap_mode='r')
+                result[f"{name}_stats"] = pd.DataFrame(stats, columns=meta['feature_names'])
+                result[f"{name}_texts"] = load_texts(path, name)
+                result[f"y_{name}"] = np.load(os.path.join(path, f"{name}_labels.npy")).astype(int)
+        return key, result
+
+    def tfidf_stage(self, text_key, text_data, extractor, timer=None):
+        """
+        Load or build TF-IDF matrices, leaving a fitted vectorizer on extractor
+
+        Returns:
+            dict with train/test CSR matrices
+        """
+        timer = timer or StageTimer()
+        key = _config_key(text_key, extractor.get_config())
+        path = self._path('tfidf', key)
+
+        if not self._has('tfidf', key):
+            print("Feature store miss: fitting TF-IDF...")
+            with timer.stage('fit tfidf'):
+                train_tfidf = extractor.fit_tfidf(text_data['train_texts'], cleaned=True)
+                test_tfidf = extractor.transform_tfidf(text_data['test_texts'], cleaned=True)
+
+            def writer(tmp_path):
+                save_sparse(tmp_path, 'train_tfidf', train_tfidf)
+                save_sparse(tmp_path, 'test_tfidf', test_tfidf)
+                joblib.dump(extractor.tfidf_vectorizer,
+                            os.path.join(tmp_path, 'tfidf_vectorizer.pkl'))
+
+            self._write('tfidf', key, writer, {
+                'text_key': text_key,
+                'extractor_config': extractor.get_config()
+            })
+        else:
+            print(f"Feature store hit: tfidf stage {key}")
+            extractor.tfidf_vectorizer = joblib.load(os.path.join(path, 'tfidf_vectorizer.pkl'))
+
+        return {
+            'train_tfidf': load_sparse(path, 'train_tfidf'),
+            'test_tfidf': load_sparse(path, 'test_tfidf')
+        }
+
+    def load_training_features(self, data_path, extractor, test_size=0.3, random_state=42,
+                               n_jobs=-1, timer=None):
+        """
+        Build the train/test feature matrices, extracting only what is not cached
+
+        Fits the extractor's TF-IDF vectorizer and scaler exactly as
+        prepare_features(is_training=True) would.
+
+        Returns:
+            X_train, X_test, y_train, y_test, feature_names
+        """
+        timer = timer or StageTimer()
+        text_key, text_data = self.text_stage(data_path, extractor, test_size, random_state,
+                                              n_jobs=n_jobs, timer=timer)
+        tfidf_data = self.tfidf_stage(text_key, text_data, extractor, timer=timer)
+
+        with timer.stage('scale + assemble'):
+            train_scaled = extractor.fit_scaler(text_data['train_stats'])
+            test_scaled = extractor.transform_scaler(text_data['test_stats'])
+
+            X_train = np.hstack([train_scaled, tfidf_data['train_tfidf'].toarray()])
+            X_test = np.hstack([test_scaled, tfidf_data['test_tfidf'].toarray()])
+        print(f"Final feature matrix shape: {X_train.shape}")
+
+        return (X_train, X_test, text_data['y_train'], text_data['y_test'],
+                text_data['feature_names'])
+
+    def clear(self):
+        """Remove every cached entry"""
+        shutil.rmtree(self.root, ignore_errors=True)
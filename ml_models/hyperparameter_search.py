@@ -0,0 +1,270 @@
+"""
+Hyperparameter Search for Fake Review Detection
+Extracts features once, then cross-validates candidate configurations in
+parallel against a shared read-only feature matrix
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import ParameterGrid, ParameterSampler, StratifiedKFold
+from sklearn.metrics import accuracy_score, f1_score, roc_auc_score
+
+from feature_store import FeatureStore
+from parallel_pipeline import StageTimer, resolve_n_jobs
+from train_model import FakeReviewDetector, build_model
+
+# Search spaces per model type
+SEARCH_SPACES = {
+    'random_forest': {
+        'max_depth': [6, 8, 12, 16, None],
+        'min_samples_split': [2, 10, 40],
+        'min_samples_leaf': [1, 5, 20],
+        'max_features': ['sqrt', 0.3, 0.5],
+        'class_weight': [None, 'balanced']
+    },
+    'logistic_regression': {
+        'C': [0.01, 0.1, 1.0, 10.0],
+        'class_weight': [None, 'balanced']
+    }
+}
+
+# Parameter grown when a promising candidate is warm-started
+BUDGET_PARAMS = {
+    'random_forest': ('n_estimators', 25),
+    'logistic_regression': ('max_iter', 100)
+}
+
+# Shared read-only training matrix, memory-mapped once per worker
+_shared = {}
+
+
+def _init_worker(matrix_dir):
+    _shared['X'] = np.load(os.path.join(matrix_dir, 'X_train.npy'), mmap_mode='r')
+    _shared['y'] = np.load(os.path.join(matrix_dir, 'y_train.npy'), mmap_mode='r')
+
+
+def _evaluate_candidate(task):
+    """
+    Cross-validate one candidate, optionally warm-starting fold models
+
+    Args:
+        task: dict with model_type, params, budget, folds and, when promoting
+              a candidate, the fold models fitted at the previous budget
+
+    Returns:
+        dict with fold metrics, timings and the fitted fold models
+    """
+    X, y = _shared['X'], _shared['y']
+    model_type = task['model_type']
+    budget_param, _ = BUDGET_PARAMS[model_type]
+    previous_models = task.get('fold_models')
+
+    fold_models, scores = [], {'accuracy': [], 'f1_score': [], 'roc_auc': []}
+    fit_time, predict_time, predicted_rows, single_latencies = 0.0, 0.0, 0, []
+
+    for fold, (train_idx, val_idx) in enumerate(task['folds']):
+        if previous_models is not None:
+            model = previous_models[fold]
+            model.set_params(warm_start=True, **{budget_param: task['budget']})
+        else:
+            params = dict(task['params'], **{budget_param: task['budget']})
+            if model_type == 'random_forest':
+                params['n_jobs'] = 1  # parallelism comes from the process pool
+            model = build_model(model_type, **params)
+
+        start = time.perf_counter()
+        model.fit(X[train_idx], y[train_idx])
+        fit_time += time.perf_counter() - start
+
+        X_val = X[val_idx]
+        start = time.perf_counter()
+        proba = model.predict_proba(X_val)[:, 1]
+        predict_time += time.perf_counter() - start
+        predicted_rows += len(val_idx)
+
+        single_row = X_val[:1]
+        for _ in range(5):
+            start = time.perf_counter()
+            model.predict_proba(single_row)
+            single_latencies.append(time.perf_counter() - start)
+
+        y_val = y[val_idx]
+        y_pred = (proba > 0.5).astype(int)
+        scores['accuracy'].append(accuracy_score(y_val, y_pred))
+        scores['f1_score'].append(f1_score(y_val, y_pred))
+        scores['roc_auc'].append(roc_auc_score(y_val, proba))
+        fold_models.append(model)
+
+    result = {
+        'candidate_id': task['candidate_id'],
+        'params': task['params'],
+        'budget': task['budget'],
+        'warm_started': previous_models is not None,
+        'fit_time_s': round(fit_time, 4),
+        'predict_us_per_row': round(predict_time / predicted_rows * 1e6, 3),
+        'single_row_latency_ms': round(float(np.median(single_latencies)) * 1e3, 3),
+        'fold_models': fold_models
+    }
+    for metric, values in scores.items():
+        result[f"{metric}_mean"] = round(float(np.mean(values)), 4)
+        result[f"{metric}_std"] = round(float(np.std(values)), 4)
+    return result
+
+
+def generate_candidates(model_type, mode='random', n_iter=20, random_state=42):
+    """Return a list of parameter dicts from the model type's search space"""
+    space = SEARCH_SPACES[model_type]
+    if mode == 'grid':
+        return list(ParameterGrid(space))
+    if mode == 'random':
+        total = len(ParameterGrid(space))
+        return list(ParameterSampler(space, n_iter=min(n_iter, total), random_state=random_state))
+    raise ValueError(f"Unknown search mode: {mode}")
+
+
+def run_search(data_path='../data/enhanced_reviews_dataset.csv', model_type='random_forest',
+               mode='random', n_iter=20, cv=3, scoring='roc_auc', promote_fraction=0.25,
+               budget_factor=4, n_jobs=-1, feature_store_dir='feature_store',
+               save_dir='saved_models'):
+    """
+    Search hyperparameters and save the best model
+
+    Stage 1 cross-validates every candidate at the base budget (25 trees
+    for a random forest). Stage 2 takes the top promote_fraction of
+    candidates and warm-starts their fold models up to budget_factor times
+    the base budget, so promising candidates keep the work already done.
+
+    Args:
+        data_path: labeled review CSV
+        model_type: 'random_forest' or 'logistic_regression'
+        mode: 'grid' or 'random'
+        n_iter: candidates to sample in random mode
+        cv: cross-validation folds
+        scoring: leaderboard metric ('roc_auc', 'f1_score' or 'accuracy')
+        promote_fraction: share of candidates warm-started in stage 2
+        budget_factor: stage 2 budget as a multiple of the base budget
+        n_jobs: worker processes (-1 = all cores)
+        feature_store_dir: feature cache directory
+        save_dir: where the leaderboard and best model are written
+
+    Returns:
+        leaderboard DataFrame, sorted best first
+    """
+    print("="*60)
+    print("FAKE REVIEW DETECTION - HYPERPARAMETER SEARCH")
+    print("="*60)
+
+    timer = StageTimer()
+    detector = FakeReviewDetector(model_type=model_type)
+
+    # Extract features once for every candidate
+    X_train, X_test, y_train, y_test, feature_names = FeatureStore(
+        feature_store_dir
+    ).load_training_features(data_path, detector.feature_extractor, n_jobs=n_jobs, timer=timer)
+    detector.feature_names = feature_names
+
+    folds = [
+        (train_idx, val_idx) for train_idx, val_idx in
+        StratifiedKFold(n_splits=cv, shuffle=True, random_state=42).split(X_train, y_train)
+    ]
+    candidates = generate_candidates(model_type, mode, n_iter)
+    budget_param, base_budget = BUDGET_PARAMS[model_type]
+    print(f"\nEvaluating {len(candidates)} {model_type} candidates with {cv}-fold CV...")
+
+    matrix_dir = tempfile.mkdtemp(prefix='search-matrix-')
+    try:
+        np.save(os.path.join(matrix_dir, 'X_train.npy'), np.ascontiguousarray(X_train))
+        np.save(os.path.join(matrix_dir, 'y_train.npy'), np.asarray(y_train))
+
+        with ProcessPoolExecutor(max_workers=resolve_n_jobs(n_jobs), initializer=_init_worker,
+                                 initargs=(matrix_dir,)) as pool:
+            with timer.stage('search: base budget'):
+                stage1 = list(pool.map(_evaluate_candidate, [
+                    {'candidate_id': i, 'model_type': model_type, 'params': params,
+                     'budget': base_budget, 'folds': folds}
+                    for i, params in enumerate(candidates)
+                ]))
+
+            stage1.sort(key=lambda r: r[f"{scoring}_mean"], reverse=True)
+            promoted = stage1[:max(1, int(round(len(stage1) * promote_fraction)))]
+            print(f"Warm-starting top {len(promoted)} candidates to "
+                  f"{budget_param}={base_budget * budget_factor}...")
+
+            with timer.stage('search: warm-started'):
+                stage2 = list(pool.map(_evaluate_candidate, [
+                    {'candidate_id': r['candidate_id'], 'model_type': model_type,
+                     'params': r['params'], 'budget': base_budget * budget_factor,
+                     'folds': folds, 'fold_models': r['fold_models']}
+                    for r in promoted
+                ]))
+    finally:
+        shutil.rmtree(matrix_dir, ignore_errors=True)
+
+    rows = []
+    for result in stage1 + stage2:
+        row = {k: v for k, v in result.items() if k != 'fold_models'}
+        row['params'] = json.dumps(row['params'], sort_keys=True, default=str)
+        rows.append(row)
+    leaderboard = pd.DataFrame(rows).sort_values(
+        [f"{scoring}_mean", 'budget'], ascending=[False, False]
+    ).reset_index(drop=True)
+    leaderboard.insert(0, 'rank', range(1, len(leaderboard) + 1))
+
+    # Refit the winner on the full training split and save it
+    best = leaderboard.iloc[0]
+    best_params = {**json.loads(best['params']), budget_param: int(best['budget'])}
+    print(f"\nBest candidate: {best_params} ({scoring}={best[f'{scoring}_mean']:.4f})")
+
+    with timer.stage('refit best'):
+        detector.create_model(**best_params)
+        detector.train(X_train, y_train)
+    with timer.stage('evaluate'):
+        detector.evaluate(X_test, y_test)
+    detector.print_metrics()
+    detector.metrics['search_params'] = best_params
+
+    os.makedirs(save_dir, exist_ok=True)
+    with timer.stage('save model'):
+        detector.save_model(save_dir)
+        leaderboard_path = f"{save_dir}/search_leaderboard.csv"
+        leaderboard.to_csv(leaderboard_path, index=False)
+    print(f"Leaderboard saved: {leaderboard_path}")
+
+    print("\nTop candidates:")
+    print(leaderboard.head(10)[['rank', 'budget', f"{scoring}_mean", 'fit_time_s',
+                                'single_row_latency_ms', 'params']].to_string(index=False))
+    timer.report()
+    return leaderboard
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Search fake review detector hyperparameters")
+    parser.add_argument('--data', default='../data/enhanced_reviews_dataset.csv')
+    parser.add_argument('--model-type', default='random_forest', choices=sorted(SEARCH_SPACES))
+    parser.add_argument('--mode', default='random', choices=['grid', 'random'])
+    parser.add_argument('--n-iter', type=int, default=20)
+    parser.add_argument('--cv', type=int, default=3)
+    parser.add_argument('--scoring', default='roc_auc', choices=['roc_auc', 'f1_score', 'accuracy'])
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--feature-store', default='feature_store')
+    args = parser.parse_args()
+
+    run_search(
+        data_path=args.data,
+        model_type=args.model_type,
+        mode=args.mode,
+        n_iter=args.n_iter,
+        cv=args.cv,
+        scoring=args.scoring,
+        n_jobs=args.n_jobs,
+        feature_store_dir=args.feature_store
+    )
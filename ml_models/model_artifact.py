@@ -0,0 +1,454 @@
+"""
+Compact Model Artifact Format
+Stores the trained model and feature extractor as a JSON manifest plus flat
+.npy arrays that load without unpickling and can be memory-mapped
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import StandardScaler
+
+from feature_extraction import (
+    HashingFeatureExtractor, ReviewFeatureExtractor, TFIDF_PARAMS
+)
+
+# Bump when the array layout or manifest schema changes
+ARTIFACT_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+# Rows routed through the forest at a time (bounds the rows x trees index arrays)
+PREDICT_CHUNK_ROWS = 4096
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _float32_floor(values):
+    """
+    Largest float32 not above each float64 value
+
+    Trees compare float32 inputs against float64 thresholds; rounding every
+    threshold down to float32 keeps `x <= threshold` identical for all
+    float32 x, so the smaller arrays give exactly the same routing.
+    """
+    rounded = values.astype(np.float32)
+    too_high = rounded.astype(np.float64) > values
+    rounded[too_high] = np.nextafter(rounded[too_high], np.float32(-np.inf))
+    return rounded
+
+
+class CompactForest:
+    """
+    Random forest predictor over flat node arrays
+
+    All trees are concatenated into one set of node arrays with global child
+    indices (-1 marks a leaf). Leaf values hold per-class probabilities, so
+    predict_proba matches RandomForestClassifier: the mean of the leaf
+    distributions reached in every tree.
+    """
+
+    def __init__(self, roots, children_left, children_right, feature, threshold, value,
+                 classes, feature_importances=None, cover=None):
+        self.roots = roots
+        self.children_left = children_left
+        self.children_right = children_right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.cover = cover
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = None
+        if feature_importances is not None:
+            self.feature_importances_ = np.asarray(feature_importances, dtype=np.float64)
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def _leaves(self, X):
+        """Global leaf index reached by every row in every tree"""
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.repeat(self.roots[None, :], X.shape[0], axis=0)
+        while True:
+            left = self.children_left[node]
+            internal = left >= 0
+            if not internal.any():
+                return node
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(internal, np.where(go_left, left, self.children_right[node]), node)
+
+    def predict_proba(self, X):
+        if hasattr(X, 'toarray'):
+            X = X.toarray()
+        X = np.asarray(X, dtype=np.float32)
+        proba = np.empty((X.shape[0], len(self.classes_)), dtype=np.float64)
+        for start in range(0, X.shape[0], PREDICT_CHUNK_ROWS):
+            leaves = self._leaves(X[start:start + PREDICT_CHUNK_ROWS])
+            proba[start:start + len(leaves)] = self.value[leaves].astype(np.float64).mean(axis=1)
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class CompactLinear:
+    """Binary logistic model (LogisticRegression or log-loss SGD) over flat weights"""
+
+    def __init__(self, coef, intercept, classes):
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = coef.shape[1]
+
+    def predict_proba(self, X):
+        scores = np.asarray(X @ self.coef_[0].astype(np.float64)).ravel() + float(self.intercept_[0])
+        positive = 1.0 / (1.0 + np.exp(-scores))
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def flatten_forest(model):
+    """
+    Concatenate every tree of a fitted forest into flat node arrays
+
+    Child indices are global (offset per tree) with -1 for leaves, value
+    holds per-class probabilities and cover the weighted training samples
+    reaching each node.
+
+    Returns:
+        dict of arrays (tree_roots, tree_children_left, tree_children_right,
+        tree_feature, tree_threshold, tree_value, tree_cover)
+    """
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+
+    def concat_children(attr):
+        parts = []
+        for tree, offset in zip(trees, offsets):
+            children = getattr(tree, attr).astype(np.int64)
+            parts.append(np.where(children >= 0, children + offset, -1))
+        return np.concatenate(parts).astype(np.int32)
+
+    value = np.concatenate([tree.value[:, 0, :] for tree in trees])
+    value = value / value.sum(axis=1, keepdims=True)
+    return {
+        'tree_roots': offsets[:-1].astype(np.int32),
+        'tree_children_left': concat_children('children_left'),
+        'tree_children_right': concat_children('children_right'),
+        'tree_feature': np.concatenate([tree.feature for tree in trees]).astype(np.int32),
+        'tree_threshold': _float32_floor(np.concatenate([tree.threshold for tree in trees])),
+        'tree_value': value.astype(np.float32),
+        'tree_cover': np.concatenate([tree.weighted_n_node_samples for tree in trees]).astype(np.float32)
+    }
+
+
+def _model_arrays(model):
+    """Flatten a fitted model into (manifest section, dict of arrays)"""
+    name = type(model).__name__
+    classes = [int(c) for c in model.classes_]
+
+    if hasattr(model, 'estimators_'):
+        arrays = flatten_forest(model)
+        arrays['feature_importances'] = model.feature_importances_.astype(np.float32)
+        section = {'kind': 'forest', 'class': name, 'classes': classes,
+                   'n_trees': len(arrays['tree_roots']), 'n_nodes': len(arrays['tree_value'])}
+        return section, arrays
+
+    if hasattr(model, 'coef_') and len(classes) == 2:
+        if getattr(model, 'loss', 'log_loss') != 'log_loss':
+            raise ValueError(f"{name} with loss={model.loss!r} has no logistic predict_proba")
+        arrays = {
+            'linear_coef': model.coef_.astype(np.float32),
+            'linear_intercept': np.asarray(model.intercept_, dtype=np.float32)
+        }
+        return {'kind': 'linear', 'class': name, 'classes': classes}, arrays
+
+    raise ValueError(f"Cannot export {name} to the compact artifact format")
+
+
+def _extractor_arrays(feature_extractor):
+    """Flatten a fitted feature extractor into (manifest section, dict of arrays)"""
+    scaler = feature_extractor.scaler
+    if scaler is None:
+        raise ValueError("Feature extractor has no fitted scaler")
+
+    # Scaler and idf stay float64: they are tiny, and rounding them would
+    # move feature values across tree thresholds
+    arrays = {
+        'scaler_mean': np.asarray(scaler.mean_, dtype=np.float64),
+        'scaler_scale': np.asarray(scaler.scale_, dtype=np.float64),
+        'scaler_var': np.asarray(scaler.var_, dtype=np.float64)
+    }
+    section = {
+        'statistical_features': [str(n) for n in getattr(scaler, 'feature_names_in_', [])],
+        'scaler_samples_seen': int(np.max(scaler.n_samples_seen_)),
+        'extractor_config': feature_extractor.get_config()
+    }
+
+    if isinstance(feature_extractor, HashingFeatureExtractor):
+        section['text_features'] = 'hashing'
+        section['n_text_features'] = feature_extractor.n_hash_features
+        return section, arrays
+
+    vectorizer = feature_extractor.tfidf_vectorizer
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    encoded = [term.encode('utf-8') for term in terms]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int32)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    arrays['vocab_blob'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    arrays['vocab_offsets'] = offsets
+    arrays['idf'] = np.asarray(vectorizer.idf_, dtype=np.float64)
+    section['text_features'] = 'tfidf'
+    section['n_text_features'] = len(terms)
+    return section, arrays
+
+
+def save_artifact(model, feature_extractor, out_dir):
+    """
+    Write model + feature extractor as a compact artifact directory
+
+    The directory is built next to out_dir and renamed into place, so a
+    reader never sees a half-written artifact.
+
+    Args:
+        model: fitted RandomForestClassifier, LogisticRegression or log-loss SGDClassifier
+        feature_extractor: fitted ReviewFeatureExtractor / HashingFeatureExtractor
+        out_dir: artifact directory to create or replace
+
+    Returns:
+        manifest dict
+    """
+    model_section, model_arrays = _model_arrays(model)
+    schema, extractor_arrays = _extractor_arrays(feature_extractor)
+    n_features = len(schema['statistical_features']) + schema['n_text_features']
+    schema['n_features'] = n_features
+    model_section['n_features'] = n_features
+
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix='.artifact-', dir=parent)
+    try:
+        files = {}
+        for name, array in {**model_arrays, **extractor_arrays}.items():
+            path = os.path.join(tmp_dir, f"{name}.npy")
+            np.save(path, np.ascontiguousarray(array))
+            files[name] = {
+                'file': f"{name}.npy",
+                'dtype': str(array.dtype),
+                'shape': list(array.shape),
+                'sha256': _sha256(path)
+            }
+
+        content = json.dumps({k: v['sha256'] for k, v in sorted(files.items())})
+        manifest = {
+            'format_version': ARTIFACT_FORMAT_VERSION,
+            'model_version': hashlib.sha256(content.encode('utf-8')).hexdigest()[:12],
+            'created_at': datetime.now().isoformat(),
+            'model': model_section,
+            'feature_schema': schema,
+            'arrays': files
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w') as f:
+            json.dump(manifest, f, indent=4)
+        os.chmod(tmp_dir, 0o755)
+
+        previous = None
+        if os.path.exists(out_dir):
+            previous = f"{tmp_dir}.old"
+            os.replace(out_dir, previous)
+        os.replace(tmp_dir, out_dir)
+        if previous:
+            shutil.rmtree(previous, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return manifest
+
+
+def read_manifest(artifact_dir):
+    """Load and version-check an artifact manifest"""
+    with open(os.path.join(artifact_dir, MANIFEST_NAME), 'r') as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format version: {manifest.get('format_version')}")
+    return manifest
+
+
+def _load_arrays(artifact_dir, manifest, verify=True, mmap=True):
+    arrays = {}
+    for name, entry in manifest['arrays'].items():
+        path = os.path.join(artifact_dir, entry['file'])
+        if verify and _sha256(path) != entry['sha256']:
+            raise ValueError(f"Checksum mismatch for {entry['file']}")
+        array = np.load(path, mmap_mode='r' if mmap else None, allow_pickle=False)
+        if str(array.dtype) != entry['dtype'] or list(array.shape) != entry['shape']:
+            raise ValueError(f"{entry['file']} does not match the manifest")
+        arrays[name] = array
+    return arrays
+
+
+def _build_model(section, arrays):
+    if section['kind'] == 'forest':
+        model = CompactForest(
+            roots=np.asarray(arrays['tree_roots']),
+            children_left=arrays['tree_children_left'],
+            children_right=arrays['tree_children_right'],
+            feature=arrays['tree_feature'],
+            threshold=arrays['tree_threshold'],
+            value=arrays['tree_value'],
+            classes=section['classes'],
+            feature_importances=arrays['feature_importances'],
+            cover=arrays.get('tree_cover')
+        )
+        model.n_features_in_ = section['n_features']
+        return model
+    if section['kind'] == 'linear':
+        return CompactLinear(arrays['linear_coef'], arrays['linear_intercept'], section['classes'])
+    raise ValueError(f"Unknown model kind in artifact: {section['kind']}")
+
+
+def _build_extractor(schema, arrays):
+    config = schema['extractor_config']
+    if schema['text_features'] == 'hashing':
+        extractor = HashingFeatureExtractor(n_hash_features=schema['n_text_features'])
+    else:
+        extractor = ReviewFeatureExtractor(max_tfidf_features=config['max_tfidf_features'])
+        blob = arrays['vocab_blob'].tobytes()
+        offsets = arrays['vocab_offsets']
+        vectorizer = TfidfVectorizer(max_features=config['max_tfidf_features'], **TFIDF_PARAMS)
+        vectorizer.vocabulary_ = {
+            blob[offsets[i]:offsets[i + 1]].decode('utf-8'): i for i in range(len(offsets) - 1)
+        }
+        vectorizer.idf_ = np.asarray(arrays['idf'])
+        extractor.tfidf_vectorizer = vectorizer
+
+    scaler = StandardScaler()
+    scaler.mean_ = np.asarray(arrays['scaler_mean'])
+    scaler.scale_ = np.asarray(arrays['scaler_scale'])
+    scaler.var_ = np.asarray(arrays['scaler_var'])
+    scaler.n_samples_seen_ = schema['scaler_samples_seen']
+    scaler.n_features_in_ = len(scaler.mean_)
+    if schema['statistical_features']:
+        scaler.feature_names_in_ = np.array(schema['statistical_features'], dtype=object)
+    extractor.scaler = scaler
+    return extractor
+
+
+def load_artifact(artifact_dir, verify=True, mmap=True):
+    """
+    Load a compact artifact
+
+    Args:
+        artifact_dir: directory written by save_artifact
+        verify: check every array against its manifest checksum
+        mmap: memory-map the arrays instead of reading them into memory
+
+    Returns:
+        (model, feature_extractor, manifest)
+    """
+    manifest = read_manifest(artifact_dir)
+    arrays = _load_arrays(artifact_dir, manifest, verify=verify, mmap=mmap)
+    model = _build_model(manifest['model'], arrays)
+    feature_extractor = _build_extractor(manifest['feature_schema'], arrays)
+    return model, feature_extractor, manifest
+
+
+def _directory_size(paths):
+    return sum(os.path.getsize(p) for p in paths)
+
+
+def _cold_load_seconds(code, repeats=5):
+    """Median load time measured in fresh interpreter processes"""
+    import subprocess
+    import sys
+
+    times = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, '-c', code], check=True, capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout
+        times.append(float(output.strip().splitlines()[-1]))
+    return float(np.median(times))
+
+
+def benchmark(model_dir='saved_models', artifact_dir=None, repeats=5):
+    """
+    Export the saved pickles to an artifact and compare size, load time and predictions
+
+    Returns:
+        dict with sizes (bytes), cold load times (seconds) and parity results
+    """
+    from model_utils import load_trained_model
+
+    model_dir = os.path.abspath(model_dir)
+    artifact_dir = os.path.abspath(artifact_dir or os.path.join(model_dir, 'artifact'))
+
+    model, feature_extractor = load_trained_model(model_dir)
+    manifest = save_artifact(model, feature_extractor, artifact_dir)
+    compact_model, _, _ = load_artifact(artifact_dir)
+
+    # Parity on random inputs that exercise every branch of every tree
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(5000, manifest['model']['n_features']))
+    X[:, len(manifest['feature_schema']['statistical_features']):] = np.abs(
+        X[:, len(manifest['feature_schema']['statistical_features']):]) / 4
+    expected = model.predict_proba(X)
+    actual = compact_model.predict_proba(X)
+
+    pickle_files = [os.path.join(model_dir, 'random_forest_model.pkl'),
+                    os.path.join(model_dir, 'feature_extractor.pkl')]
+    artifact_files = [os.path.join(artifact_dir, name) for name in os.listdir(artifact_dir)]
+
+    timing = ("import time; from {module} import {func}; start = time.perf_counter(); "
+              "{func}({path!r}); print(time.perf_counter() - start)")
+    results = {
+        'model_version': manifest['model_version'],
+        'pickle_bytes': _directory_size(pickle_files),
+        'artifact_bytes': _directory_size(artifact_files),
+        'pickle_load_s': _cold_load_seconds(
+            timing.format(module='model_utils', func='load_trained_model', path=model_dir), repeats),
+        'artifact_load_s': _cold_load_seconds(
+            timing.format(module='model_artifact', func='load_artifact', path=artifact_dir), repeats),
+        'max_proba_diff': float(np.max(np.abs(expected - actual))),
+        'prediction_agreement': float(np.mean(
+            np.argmax(expected, axis=1) == np.argmax(actual, axis=1)))
+    }
+
+    print("="*60)
+    print("MODEL ARTIFACT vs PICKLES")
+    print("="*60)
+    print(f"Artifact: {artifact_dir} (version {results['model_version']})")
+    print(f"  {'':18} {'pickles':>12} {'artifact':>12}")
+    print(f"  {'size (bytes)':18} {results['pickle_bytes']:>12,} {results['artifact_bytes']:>12,}")
+    print(f"  {'cold load (ms)':18} {results['pickle_load_s'] * 1e3:>12.2f} "
+          f"{results['artifact_load_s'] * 1e3:>12.2f}")
+    print(f"Max predict_proba difference: {results['max_proba_diff']:.2e}")
+    print(f"Prediction agreement: {results['prediction_agreement']:.2%}")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export saved pickles to the compact artifact format")
+    parser.add_argument('--model-dir', default='saved_models')
+    parser.add_argument('--out', default=None, help="artifact directory (default: <model-dir>/artifact)")
+    parser.add_argument('--repeats', type=int, default=5, help="cold load measurements per format")
+    args = parser.parse_args()
+
+    benchmark(args.model_dir, args.out, repeats=args.repeats)
@@ -2,10 +2,17 @@
 Utility functions for model operations
 """
 
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
 import joblib
 import pandas as pd
 import numpy as np
 from feature_extraction import prepare_features
+from attributions import ForestExplainer
+from risk_rules import risk_factor_lists
 
 
 def load_trained_model(model_dir='saved_models'):
@@ -18,7 +25,241 @@ def load_trained_model(model_dir='saved_models'):
         raise Exception(f"Error loading model: {str(e)}")
 
 
-def predict_single_review(review_data, model, feature_extractor):
+def get_model_version(model_dir='saved_models'):
+    """Short content hash of the saved model artifacts"""
+    digest = hashlib.sha256()
+    for filename in ('random_forest_model.pkl', 'feature_extractor.pkl'):
+        with open(f"{model_dir}/{filename}", 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+# Immutable view of the model a request is served with; explainer is the
+# ForestExplainer built for the model at publish time (None if unsupported)
+ModelSnapshot = namedtuple('ModelSnapshot', ['model', 'feature_extractor', 'version', 'explainer'],
+                           defaults=(None,))
+
+
+class ServingModel:
+    """
+    Holder for the model currently used to serve predictions
+    
+    The model, feature extractor and version are published together as one
+    snapshot by a single reference assignment. Request handlers take a
+    snapshot once and use it for the whole request, so a swap never mixes
+    versions mid-request and needs no downtime.
+    """
+    
+    def __init__(self):
+        self._snapshot = None
+    
+    def load(self, model_dir, model_format='pickle'):
+        """
+        Load the saved model and publish it
+        
+        Args:
+            model_dir: directory with the saved model
+            model_format: 'pickle' for the joblib files, 'artifact' for the
+                          compact artifact in model_dir/artifact
+        """
+        if model_format == 'artifact':
+            from model_artifact import load_artifact
+            model, feature_extractor, manifest = load_artifact(f"{model_dir}/artifact")
+            self.publish(model, feature_extractor, manifest['model_version'])
+        elif model_format == 'pickle':
+            model, feature_extractor = load_trained_model(model_dir)
+            self.publish(model, feature_extractor, get_model_version(model_dir))
+        else:
+            raise ValueError(f"Unknown model format: {model_format}")
+    
+    def publish(self, model, feature_extractor, version):
+        """Atomically replace the served model (node statistics for attributions are built first)"""
+        try:
+            explainer = ForestExplainer.from_model(model, feature_extractor)
+        except Exception as e:
+            print(f"Attributions unavailable for model {version}: {e}")
+            explainer = None
+        self._snapshot = ModelSnapshot(model, feature_extractor, version, explainer)
+    
+    def snapshot(self):
+        """Return the current ModelSnapshot, or None if no model is loaded"""
+        return self._snapshot
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of prediction probabilities with TTL expiry
+    
+    Entries are keyed on (model_version, payload_hash) so that publishing a
+    new model makes every older entry unreachable; those entries then age
+    out through normal LRU/TTL eviction. Use for_version() to get a view
+    bound to the version a request is served with.
+    
+    An entry can also keep the review's feature row, so a cached single
+    prediction can still be explained without extracting features again.
+    """
+    
+    def __init__(self, max_entries=10000, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def for_version(self, model_version):
+        """Return a view of the cache scoped to one model version"""
+        return _VersionedCache(self, model_version)
+    
+    def get(self, payload_hash, model_version=''):
+        """Return cached probabilities for a payload hash, or None"""
+        entry = self.get_entry(payload_hash, model_version)
+        return None if entry is None else entry[0]
+    
+    def get_entry(self, payload_hash, model_version=''):
+        """Return (probabilities, feature row or None) for a payload hash, or None"""
+        key = (model_version, int(payload_hash))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+    
+    def put(self, payload_hash, probabilities, model_version='', features=None):
+        """
+        Store probabilities (and optionally the feature row) for a payload
+        hash, evicting the LRU entry if full
+        """
+        key = (model_version, int(payload_hash))
+        value = tuple(float(p) for p in probabilities)
+        if features is not None:
+            features = np.array(features.toarray() if hasattr(features, 'toarray') else features,
+                                dtype=np.float64).ravel()
+            features.flags.writeable = False
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value, features)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self):
+        """Return size and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+
+class _VersionedCache:
+    """PredictionCache view whose keys are scoped to one model version"""
+    
+    def __init__(self, cache, model_version):
+        self.cache = cache
+        self.model_version = model_version
+    
+    def get(self, payload_hash):
+        return self.cache.get(payload_hash, self.model_version)
+    
+    def get_entry(self, payload_hash):
+        return self.cache.get_entry(payload_hash, self.model_version)
+    
+    def put(self, payload_hash, probabilities, features=None):
+        self.cache.put(payload_hash, probabilities, self.model_version, features=features)
+
+
+def _column_or_default(df, column, default):
+    """Return a column, or a constant Series when the column is absent"""
+    if column in df.columns:
+        return df[column]
+    return pd.Series([default] * len(df), index=df.index, dtype=object)
+
+
+def review_payload_hashes(reviews_df, feature_extractor):
+    """
+    Hash the normalized payload of every review row
+    
+    Only inputs that reach the feature matrix are hashed: the cleaned text
+    and the metadata values read by extract_metadata_features. Reviews that
+    differ only in category, user_id or the literal ID strings therefore
+    share a hash, because the model cannot tell them apart.
+    
+    Returns:
+        numpy uint64 array with one hash per row
+    """
+    def numeric(column, default):
+        values = _column_or_default(reviews_df, column, default)
+        return pd.to_numeric(values, errors='coerce').astype(float)
+    
+    normalized = pd.DataFrame({
+        'text': reviews_df['text_'].map(feature_extractor.preprocess_text),
+        'verified_purchase': numeric('verified_purchase', False),
+        'order_id_missing': _column_or_default(reviews_df, 'order_id', None).isna(),
+        'purchase_id_missing': _column_or_default(reviews_df, 'purchase_id', None).isna(),
+        'days_after_purchase': numeric('days_after_purchase', 0),
+        'user_review_count': numeric('user_review_count', 0),
+        'rating': numeric('rating', 3.0)
+    })
+    
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+
+def _review_features(reviews_df, feature_extractor, monitor=None):
+    """Feature matrix for scoring; recorded by the drift monitor when one is given"""
+    features, _ = prepare_features(reviews_df, feature_extractor, is_training=False)
+    if monitor is not None:
+        monitor.observe(features, reviews_df['text_'], feature_extractor)
+    return features
+
+
+def _score_reviews(reviews_df, model, feature_extractor, cascade=None, monitor=None):
+    """Class probabilities for every row, through the cascade when one is given"""
+    if cascade is not None:
+        return cascade.predict_proba(reviews_df, model, feature_extractor, monitor=monitor)
+    return model.predict_proba(_review_features(reviews_df, feature_extractor, monitor))
+
+
+# Genuine predictions with a fake probability above this are reported as SUSPICIOUS
+SUSPICIOUS_THRESHOLD = 0.3
+
+
+def prediction_status(predictions, fake_probabilities):
+    """FAKE / SUSPICIOUS (genuine but fake probability > SUSPICIOUS_THRESHOLD) / GENUINE per row"""
+    predictions = np.asarray(predictions)
+    fake_probabilities = np.asarray(fake_probabilities, dtype=np.float64)
+    return np.select(
+        [predictions == 1, fake_probabilities > SUSPICIOUS_THRESHOLD],
+        ['FAKE', 'SUSPICIOUS'],
+        default='GENUINE'
+    ).tolist()
+
+
+def predict_single_review(review_data, model, feature_extractor, cache=None, cascade=None,
+                          explainer=None, top_k=5, explain_method='saabas', monitor=None):
     """
     Predict whether a single review is fake
     
@@ -26,6 +267,13 @@ def predict_single_review(review_data, model, feature_extractor):
         review_data: dict with review information
         model: trained ML model
         feature_extractor: fitted feature extractor
+        cache: optional PredictionCache consulted before scoring
+        cascade: optional CascadeScorer that may answer from metadata alone
+        explainer: optional ForestExplainer; adds the top_k contributing
+                   features ('saabas' or 'shap') of the full model as
+                   result['explanation'] (None when the cascade answered
+                   from metadata and the full model never ran)
+        monitor: optional DriftMonitor recording the features of scored reviews
     
     Returns:
         dict with prediction results
@@ -33,25 +281,43 @@ def predict_single_review(review_data, model, feature_extractor):
     # Convert to DataFrame
     df = pd.DataFrame([review_data])
     
-    # Extract features
-    features, _ = prepare_features(df, feature_extractor, is_training=False)
+    probabilities = features = None
+    if cache is not None:
+        payload_hash = review_payload_hashes(df, feature_extractor)[0]
+        entry = cache.get_entry(payload_hash)
+        if entry is not None:
+            probabilities, features = entry
+            features = None if features is None else features.reshape(1, -1)
     
-    # Predict
-    prediction = model.predict(features)[0]
-    probabilities = model.predict_proba(features)[0]
+    if probabilities is None:
+        if explainer is not None and cascade is not None:
+            # Features are extracted (and kept for the explanation) only if the review is in the band
+            all_probabilities, _, features = cascade.score(df, model, feature_extractor, monitor)
+            probabilities = all_probabilities[0]
+        elif explainer is not None:
+            # The explanation needs the full feature row anyway: extract it once and score with it
+            features = _review_features(df, feature_extractor, monitor)
+            probabilities = model.predict_proba(features)[0]
+        else:
+            probabilities = _score_reviews(df, model, feature_extractor, cascade, monitor)[0]
+        if cache is not None:
+            cache.put(payload_hash, probabilities, features=features)
+    elif (explainer is not None and features is None
+          and (cascade is None or len(cascade.uncertain_rows(df)))):
+        # Cached by a path that kept no features (batch scoring or explain=none)
+        features, _ = prepare_features(df, feature_extractor, is_training=False)
+        cache.put(payload_hash, probabilities, features=features)
+    
+    # Predict (same argmax the classifier's predict() applies)
+    prediction = int(np.argmax(probabilities))
     
     # Determine status
-    if prediction == 1:
-        status = 'FAKE'
-    elif probabilities[1] > 0.3:
-        status = 'SUSPICIOUS'
-    else:
-        status = 'GENUINE'
+    status = prediction_status([prediction], [probabilities[1]])[0]
     
     # Analyze risk factors
     risk_factors = analyze_risk_factors(review_data, probabilities[1])
     
-    return {
+    result = {
         'prediction': 'FAKE' if prediction == 1 else 'GENUINE',
         'status': status,
         'confidence': float(max(probabilities)),
@@ -59,26 +325,74 @@ def predict_single_review(review_data, model, feature_extractor):
         'genuine_probability': float(probabilities[0]),
         'risk_factors': risk_factors
     }
+    
+    if explainer is not None:
+        # The attributions add up to the full model's probability; an early exit has none
+        result['explanation'] = None if features is None else explainer.explain(
+            features[0], top_k=top_k, method=explain_method,
+            raw_values=_unscaled_row(features[0], feature_extractor)
+        )
+    
+    return result
+
 
+def _unscaled_row(row, feature_extractor):
+    """Feature row with the statistical features mapped back to their original units"""
+    row = np.asarray(row.toarray() if hasattr(row, 'toarray') else row, dtype=np.float64).ravel()
+    scaler = feature_extractor.scaler
+    n_stats = len(scaler.mean_)
+    return np.concatenate([row[:n_stats] * scaler.scale_ + scaler.mean_, row[n_stats:]])
 
-def predict_bulk_reviews(reviews_df, model, feature_extractor):
+
+def predict_bulk_reviews(reviews_df, model, feature_extractor, cache=None, cascade=None,
+                         monitor=None):
     """
     Predict multiple reviews at once
     
+    Rows with the same normalized payload are scored once and the result is
+    fanned back out to every duplicate. When a cache is given, only hashes
+    missing from it reach feature extraction.
+    
     Args:
         reviews_df: DataFrame with review data
         model: trained ML model
         feature_extractor: fitted feature extractor
+        cache: optional PredictionCache consulted before scoring
+        cascade: optional CascadeScorer; only rows it cannot settle from
+                 metadata reach the text pipeline
+        monitor: optional DriftMonitor recording the features of scored reviews
     
     Returns:
-        DataFrame with predictions added
+        DataFrame with predictions, status, risk_factors (message lists) and
+        risk_flags (bit i set when risk_rules.RISK_RULES[i] fired) added
     """
-    # Extract features
-    features, _ = prepare_features(reviews_df, feature_extractor, is_training=False)
+    # Deduplicate rows by payload hash
+    payload_hashes = review_payload_hashes(reviews_df, feature_extractor)
+    unique_hashes, first_rows, inverse = np.unique(
+        payload_hashes, return_index=True, return_inverse=True
+    )
+    
+    unique_probabilities = np.zeros((len(unique_hashes), len(model.classes_)))
+    pending = []
+    for i, payload_hash in enumerate(unique_hashes):
+        cached = cache.get(payload_hash) if cache is not None else None
+        if cached is None:
+            pending.append(i)
+        else:
+            unique_probabilities[i] = cached
+    
+    if pending:
+        pending_df = reviews_df.iloc[first_rows[pending]].reset_index(drop=True)
+        pending_probabilities = _score_reviews(pending_df, model, feature_extractor, cascade,
+                                               monitor)
+        unique_probabilities[pending] = pending_probabilities
+        if cache is not None:
+            for i, row_probabilities in zip(pending, pending_probabilities):
+                cache.put(unique_hashes[i], row_probabilities)
     
     # Predict
-    predictions = model.predict(features)
-    probabilities = model.predict_proba(features)
+    probabilities = unique_probabilities[inverse.ravel()]
+    predictions = np.argmax(probabilities, axis=1)
     
     # Add predictions to dataframe
     result_df = reviews_df.copy()
@@ -86,51 +400,21 @@ def predict_bulk_reviews(reviews_df, model, feature_extractor):
     result_df['fake_probability'] = probabilities[:, 1]
     result_df['genuine_probability'] = probabilities[:, 0]
     result_df['confidence'] = np.max(probabilities, axis=1)
+    result_df['status'] = prediction_status(predictions, probabilities[:, 1])
+    
+    # Risk factors for every row (vectorized rules, same messages as single reviews)
+    risk_factors, flags = risk_factor_lists(reviews_df, probabilities[:, 1])
+    result_df['risk_factors'] = risk_factors
+    result_df['risk_flags'] = flags
     
     return result_df
 
 
 def analyze_risk_factors(review_data, fake_probability):
     """Identify specific risk factors in a review"""
-    risk_factors = []
-    
-    # Check metadata issues
-    if pd.isna(review_data.get('order_id')) or review_data.get('order_id') is None:
-        risk_factors.append("Missing order ID")
-    
-    if pd.isna(review_data.get('purchase_id')) or review_data.get('purchase_id') is None:
-        risk_factors.append("Missing purchase ID")
-    
-    if not review_data.get('verified_purchase', True):
-        risk_factors.append("Unverified purchase - IDs do not match")
-    
-    # Check timing issues
-    days = review_data.get('days_after_purchase', 0)
-    if days < 0:
-        risk_factors.append(f"Review posted before purchase (impossible timing)")
-    elif days > 365:
-        risk_factors.append(f"Review posted {days} days after purchase (very late)")
-    
-    # Check user behavior
-    review_count = review_data.get('user_review_count', 0)
-    if review_count > 50:
-        risk_factors.append(f"User has posted {review_count} reviews (potential bot)")
-    
-    # Check rating
-    rating = review_data.get('rating', 3.0)
-    if rating in [1.0, 5.0]:
-        risk_factors.append(f"Extreme rating ({rating} stars)")
-    
-    # Check text quality
-    text = review_data.get('text_', '')
-    if len(str(text)) < 50:
-        risk_factors.append("Very short review (low detail)")
-    
-    # Overall risk
-    if fake_probability > 0.7:
-        risk_factors.append(f"High fake probability ({fake_probability:.1%})")
-    
-    return risk_factors
+    # Object dtype keeps values exactly as given (e.g. 5 vs 5.0 in messages)
+    messages, _ = risk_factor_lists(pd.DataFrame([review_data], dtype=object), [fake_probability])
+    return messages[0]
 
 
 def get_feature_importance(model, feature_extractor):
@@ -0,0 +1,271 @@
+"""
+Shared-Feature Multi-Model Scoring
+The feature matrix of a request is built once and fanned out to several
+models trained on the same feature space: 'ensemble' members are averaged
+into the served probabilities, 'shadow' members are scored in the
+background and only compared against what was served
+"""
+
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+
+SCORING_MODES = ('ensemble', 'shadow')
+
+
+class _ModelStats:
+    """Latency and disagreement counters for one model"""
+
+    def __init__(self):
+        self.calls = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.compared = 0
+        self.disagreements = 0
+        self.errors = 0
+
+    def record(self, rows, seconds, disagreements=None):
+        self.calls += 1
+        self.rows += rows
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        if disagreements is not None:
+            self.compared += rows
+            self.disagreements += disagreements
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'rows': self.rows,
+            'errors': self.errors,
+            'avg_ms_per_call': round(self.seconds / self.calls * 1e3, 3) if self.calls else 0.0,
+            'avg_ms_per_review': round(self.seconds / self.rows * 1e3, 4) if self.rows else 0.0,
+            'max_ms_per_call': round(self.max_seconds * 1e3, 3),
+            'disagreement_rate': round(self.disagreements / self.compared, 4) if self.compared else 0.0
+        }
+
+
+class MultiModelScorer:
+    """
+    Extra models scored on the feature matrix already built for the served model
+
+    Members are (name, model, weight, mode) with mode 'ensemble' or
+    'shadow'. The served probabilities are the weighted mean of the primary
+    model and the ensemble members; with no ensemble members they are the
+    primary model's own output. Shadow members run on a single background
+    thread after the response has its probabilities; when more than
+    max_pending shadow jobs are queued, new ones are dropped (and counted)
+    rather than letting the queue grow.
+
+    Disagreement is the share of rows where a model's own prediction
+    (argmax) differs from the served prediction.
+    """
+
+    def __init__(self, members=(), primary_weight=1.0, max_pending=64):
+        self.members = []
+        for name, model, weight, mode in members:
+            if mode not in SCORING_MODES:
+                raise ValueError(f"Unknown scoring mode for {name}: {mode}")
+            if list(getattr(model, 'classes_', [0, 1])) != [0, 1]:
+                raise ValueError(f"Model {name} must be a binary classifier over labels [0, 1]")
+            self.members.append((name, model, float(weight), mode))
+        self.primary_weight = float(primary_weight)
+        self.max_pending = max_pending
+
+        self._lock = threading.Lock()
+        self._stats = {'primary': _ModelStats()}
+        self._stats.update((name, _ModelStats()) for name, _, _, _ in self.members)
+        self._pending = 0
+        self.shadow_dropped = 0
+        self._executor = None
+        if any(mode == 'shadow' for _, _, _, mode in self.members):
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shadow-scoring')
+
+        # Changes to the ensemble change served probabilities, so they are part of the cache key
+        ensemble = [(name, weight) for name, _, weight, mode in self.members if mode == 'ensemble']
+        self.signature = (hashlib.sha256(repr((self.primary_weight, ensemble)).encode()).hexdigest()[:8]
+                          if ensemble else '')
+
+    @classmethod
+    def load(cls, model_dir, specs, primary_weight=1.0, max_pending=64):
+        """
+        Load extra models from joblib files
+
+        Args:
+            model_dir: directory relative paths are resolved against
+            specs: list of dicts with 'path' and optional 'name', 'weight'
+                   (default 1.0) and 'mode' (default 'shadow')
+
+        Returns:
+            MultiModelScorer
+        """
+        members = []
+        for spec in specs:
+            path = spec['path'] if os.path.isabs(spec['path']) else os.path.join(model_dir, spec['path'])
+            name = spec.get('name') or os.path.splitext(os.path.basename(path))[0]
+            members.append((name, joblib.load(path), spec.get('weight', 1.0), spec.get('mode', 'shadow')))
+        return cls(members, primary_weight=primary_weight, max_pending=max_pending)
+
+    def bind(self, model, version):
+        """
+        Model to score a request with, and the cache version for its outputs
+
+        Returns the primary model itself when there are no extra members, so
+        the single-model path is unchanged.
+        """
+        if not self.members:
+            return model, version
+        for name, member, _, _ in self.members:
+            expected = getattr(model, 'n_features_in_', None)
+            if expected is not None and getattr(member, 'n_features_in_', expected) != expected:
+                raise ValueError(f"Model {name} expects {member.n_features_in_} features, "
+                                 f"the served model {expected}")
+        version = f"{version}+{self.signature}" if self.signature else version
+        return _BoundScorer(self, model), version
+
+    def _timed_proba(self, model, features):
+        start = time.perf_counter()
+        probabilities = model.predict_proba(features)
+        return probabilities, time.perf_counter() - start
+
+    def predict_proba(self, model, features):
+        """Served probabilities for a feature matrix; queues shadow scoring"""
+        probabilities, seconds = self._timed_proba(model, features)
+        outputs = [('primary', probabilities, seconds, self.primary_weight)]
+        for name, member, weight, mode in self.members:
+            if mode == 'ensemble':
+                member_probabilities, member_seconds = self._timed_proba(member, features)
+                outputs.append((name, member_probabilities, member_seconds, weight))
+
+        if len(outputs) > 1:
+            total_weight = sum(weight for _, _, _, weight in outputs)
+            probabilities = sum(p * weight for _, p, _, weight in outputs) / total_weight
+        served = np.argmax(probabilities, axis=1)
+
+        rows = len(served)
+        with self._lock:
+            for name, member_probabilities, seconds, _ in outputs:
+                disagreements = int(np.sum(np.argmax(member_probabilities, axis=1) != served))
+                self._stats[name].record(rows, seconds, disagreements)
+        self._submit_shadow(features, served)
+        return probabilities
+
+    def _submit_shadow(self, features, served):
+        if self._executor is None:
+            return
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.shadow_dropped += 1
+                return
+            self._pending += 1
+        self._executor.submit(self._score_shadow, features, served)
+
+    def _score_shadow(self, features, served):
+        try:
+            for name, member, _, mode in self.members:
+                if mode != 'shadow':
+                    continue
+                try:
+                    probabilities, seconds = self._timed_proba(member, features)
+                except Exception as e:
+                    print(f"Shadow model {name} failed: {e}")
+                    with self._lock:
+                        self._stats[name].errors += 1
+                    continue
+                disagreements = int(np.sum(np.argmax(probabilities, axis=1) != served))
+                with self._lock:
+                    self._stats[name].record(len(served), seconds, disagreements)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self):
+        """Per-model latency and disagreement with the served prediction"""
+        with self._lock:
+            models = [{'name': 'primary', 'mode': 'primary', 'weight': self.primary_weight,
+                       **self._stats['primary'].as_dict()}]
+            models += [{'name': name, 'mode': mode, 'weight': weight if mode == 'ensemble' else None,
+                        **self._stats[name].as_dict()}
+                       for name, _, weight, mode in self.members]
+            return {
+                'models': models,
+                'shadow_pending': self._pending,
+                'shadow_dropped': self.shadow_dropped
+            }
+
+
+class _BoundScorer:
+    """MultiModelScorer bound to one primary model; usable wherever a classifier is"""
+
+    def __init__(self, scorer, model):
+        self.scorer = scorer
+        self.model = model
+        self.classes_ = model.classes_
+
+    def predict_proba(self, features):
+        return self.scorer.predict_proba(self.model, features)
+
+    def predict(self, features):
+        return self.classes_[np.argmax(self.predict_proba(features), axis=1)]
+
+
+def train_companion_model(model_type, data_path='../data/enhanced_reviews_dataset.csv',
+                          model_dir='saved_models', output=None, **params):
+    """
+    Fit another model type on the served model's feature space
+
+    Uses the saved feature extractor as-is (no refitting) and the same
+    stratified 70/30 split as train_model.py, so the model can be served
+    alongside the primary one.
+
+    Returns:
+        (output path, hold-out agreement with the primary model)
+    """
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+
+    from feature_extraction import prepare_features
+    from model_utils import load_trained_model
+    from train_model import build_model
+
+    primary, feature_extractor = load_trained_model(model_dir)
+    df = pd.read_csv(data_path)
+    y = (df['label'] == 'CG').astype(int)
+    train_df, test_df, y_train, y_test = train_test_split(
+        df, y, test_size=0.3, random_state=42, stratify=y
+    )
+
+    X_train, _ = prepare_features(train_df, feature_extractor, is_training=False)
+    model = build_model(model_type, **params)
+    print(f"Training {model_type} on {X_train.shape[0]} reviews, {X_train.shape[1]} features...")
+    model.fit(X_train, y_train.values)
+
+    X_test, _ = prepare_features(test_df, feature_extractor, is_training=False)
+    predictions = model.predict(X_test)
+    accuracy = float(np.mean(predictions == y_test.values))
+    agreement = float(np.mean(predictions == primary.predict(X_test)))
+    print(f"Hold-out accuracy: {accuracy:.4f}, agreement with served model: {agreement:.4f}")
+
+    output = output or os.path.join(model_dir, f"{model_type}_model.pkl")
+    joblib.dump(model, output)
+    return output, agreement
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train a model to serve alongside the primary one")
+    parser.add_argument('--model-type', default='logistic_regression')
+    parser.add_argument('--data', default='../data/enhanced_reviews_dataset.csv')
+    parser.add_argument('--model-dir', default='saved_models')
+    parser.add_argument('--output', default=None, help="default: <model-dir>/<model-type>_model.pkl")
+    args = parser.parse_args()
+
+    path, _ = train_companion_model(args.model_type, args.data, args.model_dir, args.output)
+    print(f"Saved {path}; add it to Config.SCORING_MODELS to serve it")
@@ -0,0 +1,430 @@
+"""
+Online Model Updates from Moderator Feedback
+Durable feedback buffer plus a background updater that publishes new models
+"""
+
+import copy
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from feature_extraction import prepare_features
+
+try:
+    import fcntl
+except ImportError:  # no cross-process locking (Windows): single-process deployments only
+    fcntl = None
+
+# Accepted spellings of a moderator verdict
+LABEL_VALUES = {
+    'FAKE': 1, 'CG': 1, '1': 1, 1: 1, True: 1,
+    'GENUINE': 0, 'OR': 0, '0': 0, 0: 0, False: 0
+}
+
+
+class UpdateCapacityError(ValueError):
+    """The model cannot take any more online updates; retrain offline"""
+
+
+def parse_label(value):
+    """Map a moderator verdict to 1 (fake) / 0 (genuine)"""
+    key = value.upper() if isinstance(value, str) else value
+    try:
+        return LABEL_VALUES[key]
+    except (KeyError, TypeError):
+        # TypeError: unhashable values such as lists or objects
+        raise ValueError(f"Invalid label: {value!r} (expected FAKE or GENUINE)")
+
+
+def invalid_reviews(reviews, extractor):
+    """
+    Find reviews the feature extractor cannot featurize
+
+    Args:
+        reviews: list of review dicts (already through validate_review_data)
+        extractor: fitted ReviewFeatureExtractor
+
+    Returns:
+        list of (index, error message); empty if the whole batch featurizes
+    """
+    try:
+        prepare_features(pd.DataFrame(reviews), extractor, is_training=False)
+        return []
+    except Exception:
+        pass
+    # Some review is bad: featurize one at a time to find which
+    errors = []
+    for i, review in enumerate(reviews):
+        try:
+            prepare_features(pd.DataFrame([review]), extractor, is_training=False)
+        except Exception as e:
+            errors.append((i, str(e)))
+    return errors
+
+
+def _atomic_write(path, write):
+    """Write through a temp file in the same directory, then rename into place"""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class FeedbackBuffer:
+    """
+    Append-only JSON-lines log of labeled reviews
+
+    Every append is flushed and fsync'd before returning, so acknowledged
+    feedback survives a crash. Readers track their own byte offset.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    def append(self, records):
+        """Durably append records; returns the number written"""
+        lines = ''.join(json.dumps(r, default=str) + '\n' for r in records)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+        return len(records)
+
+    def size(self):
+        """Current size of the log in bytes"""
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def read_from(self, offset):
+        """
+        Read complete records written after a byte offset
+
+        Returns:
+            (list of records, offset just past the last complete line)
+        """
+        if not os.path.exists(self.path):
+            return [], offset
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        records = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+        return records, offset + end
+
+
+class OnlineUpdater:
+    """
+    Background thread that folds buffered feedback into the served model
+
+    Models with partial_fit (e.g. the streaming 'sgd' model) are updated
+    incrementally. A random forest is updated by growing extra trees on the
+    new feedback with warm_start; once it has max_trees, the oldest
+    feedback-grown trees are replaced (the trees it was trained with are
+    kept). The update always runs on a copy; the copy is then saved
+    atomically and published to the ServingModel, so in-flight requests
+    keep the snapshot they started with.
+
+    Only one process may apply the feedback log: start() takes an
+    exclusive lock on lock_path and stays on standby when another process
+    holds it. The updated model is saved to model_path (never over the
+    trained model) and restored from there when the updater starts, so
+    the applied offset in the state file always matches the served model.
+    A standby process reloads model_path whenever the state file names a
+    new version. Saved state from a different trained model is discarded.
+
+    Records the extractor cannot featurize are moved to the rejected log
+    (rejected_path) instead of blocking the records behind them.
+    """
+
+    def __init__(self, serving_model, buffer, state_path, model_path=None, lock_path=None,
+                 rejected_path=None, min_batch=50, interval_seconds=30, extra_trees=5,
+                 max_trees=200):
+        self.serving_model = serving_model
+        self.buffer = buffer
+        self.state_path = state_path
+        self.model_path = model_path
+        self.lock_path = lock_path or f"{state_path}.lock"
+        self.rejected = FeedbackBuffer(rejected_path or
+                                       f"{os.path.splitext(buffer.path)[0]}.rejected.jsonl")
+        self.min_batch = min_batch
+        self.interval_seconds = interval_seconds
+        self.extra_trees = extra_trees
+        self.max_trees = max_trees
+
+        self.applied_offset = 0
+        self.updates = 0
+        self.applied_records = 0
+        self.rejected_records = 0
+        self._screened = 0
+        self.base_trees = None
+        self.last_update = None
+        self.last_error = None
+        self.role = 'stopped'
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+        self._next_attempt = 0.0
+
+    def start(self):
+        """
+        Start the background update loop if this process gets the updater lock
+
+        Cheap to call repeatedly (e.g. once per request): a process on
+        standby retries the lock at most once per interval.
+
+        Returns:
+            True if the update loop runs in this process
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return True
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return True
+            if time.monotonic() < self._next_attempt:
+                return False
+            self._next_attempt = time.monotonic() + self.interval_seconds
+            snapshot = self.serving_model.snapshot()
+            if snapshot is None or not self.can_update(snapshot.model):
+                # e.g. the compact artifact forest (MODEL_FORMAT=artifact)
+                self.role = 'unsupported'
+                return False
+            if not self._acquire_lock():
+                self.role = 'standby'
+                self._follow()
+                return False
+            self._restore()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='online-updater', daemon=True)
+            self._thread.start()
+            self.role = 'active'
+            return True
+
+    def _acquire_lock(self):
+        """Take the cross-process updater lock (held until the process exits)"""
+        if self._lock_file is not None or fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self.lock_path) or '.', exist_ok=True)
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    @staticmethod
+    def can_update(model):
+        """True if _update_model knows how to update this model"""
+        if hasattr(model, 'partial_fit'):
+            return True
+        return (hasattr(model, 'estimators_') and hasattr(model, 'get_params')
+                and 'warm_start' in model.get_params())
+
+    def _read_state(self):
+        """The saved state, or None if there is none"""
+        if not os.path.exists(self.state_path):
+            return None
+        with open(self.state_path, 'r') as f:
+            return json.load(f)
+
+    def _restore(self):
+        """Resume from the saved state and publish the saved updated model (caller holds the lock)"""
+        state = self._read_state()
+        if state is None:
+            return
+        snapshot = self.serving_model.snapshot()
+        if snapshot is None:
+            return
+        trained_version = snapshot.version.split('+')[0]
+        if state['model_version'].split('+')[0] != trained_version:
+            # Updates of another trained model (and its extractor): start over on this one
+            print(f"Discarding online state for {state['model_version']} "
+                  f"(serving {trained_version}); feedback will be applied from the start of the log")
+            for path in (self.model_path, self.state_path):
+                if path and os.path.exists(path):
+                    os.remove(path)
+            return
+        if not (self.model_path and os.path.exists(self.model_path)):
+            # Without the updated model, applied feedback would be lost: apply it again
+            print("No saved online model; feedback will be applied from the start of the log")
+            return
+        self.serving_model.publish(joblib.load(self.model_path), snapshot.feature_extractor,
+                                   state['model_version'])
+        self.applied_offset = state.get('applied_offset', 0)
+        self.applied_records = state.get('applied_records', 0)
+        self.base_trees = state.get('base_trees')
+        print(f"Restored online model {state['model_version']} "
+              f"({self.applied_records} feedback records applied)")
+
+    def _follow(self):
+        """On standby: publish the active process's saved model when its version changes"""
+        if not self.model_path:
+            return
+        try:
+            state = self._read_state()
+            snapshot = self.serving_model.snapshot()
+            if state is None or snapshot is None or state['model_version'] == snapshot.version:
+                return
+            if state['model_version'].split('+')[0] != snapshot.version.split('+')[0]:
+                return
+            model = joblib.load(self.model_path)
+            if self._read_state() != state:
+                return  # saved again while loading; pick it up on the next poll
+        except (OSError, ValueError, EOFError) as e:
+            self.last_error = f"{datetime.now().isoformat()}: {e}"
+            return
+        self.serving_model.publish(model, snapshot.feature_extractor, state['model_version'])
+        self.applied_offset = state.get('applied_offset', 0)
+        self.applied_records = state.get('applied_records', 0)
+        print(f"Loaded online model {state['model_version']} saved by the active updater")
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.run_once()
+            except UpdateCapacityError as e:
+                self.last_error = f"{datetime.now().isoformat()}: {e}"
+                self.role = 'stopped'
+                print(f"Online updates stopped: {e}")
+                return
+            except Exception as e:
+                self.last_error = f"{datetime.now().isoformat()}: {e}"
+                print(f"Online update failed: {e}")
+
+    def _update_model(self, model, X, y):
+        """Return an updated copy of model, or None if it cannot learn from this batch"""
+        updated = copy.deepcopy(model)
+        if hasattr(updated, 'partial_fit'):
+            updated.partial_fit(X, y, classes=np.array([0, 1]))
+            return updated
+
+        if hasattr(updated, 'estimators_') and 'warm_start' in updated.get_params():
+            # New trees must see both classes or predict_proba loses a column
+            if len(np.unique(y)) < 2:
+                return None
+            if self.base_trees is None:
+                self.base_trees = len(updated.estimators_)
+            if self.base_trees + self.extra_trees > self.max_trees:
+                raise UpdateCapacityError(f"Forest has {self.base_trees} trained trees, no room for "
+                                 f"{self.extra_trees} more under max {self.max_trees}")
+            # At the cap, drop the oldest feedback-grown trees to make room for the new ones
+            excess = len(updated.estimators_) + self.extra_trees - self.max_trees
+            if excess > 0:
+                updated.estimators_ = (updated.estimators_[:self.base_trees] +
+                                       updated.estimators_[self.base_trees + excess:])
+            n_trees = len(updated.estimators_) + self.extra_trees
+            updated.set_params(warm_start=True, n_estimators=n_trees)
+            updated.fit(X, y)
+            return updated
+
+        raise ValueError(f"{type(model).__name__} cannot be updated online")
+
+    def run_once(self):
+        """
+        Apply all complete buffered feedback if there is enough of it
+
+        Returns:
+            dict describing the published update, or None if nothing changed
+        """
+        with self._lock:
+            records, new_offset = self.buffer.read_from(self.applied_offset)
+            if len(records) < self.min_batch:
+                return None
+
+            snapshot = self.serving_model.snapshot()
+            if snapshot is None:
+                return None
+
+            errors = invalid_reviews([r['review'] for r in records], snapshot.feature_extractor)
+            if errors:
+                # Screened records stay in place until the offset moves past them
+                new_errors = [(i, e) for i, e in errors if i >= self._screened]
+                self.rejected.append([dict(records[i], error=e) for i, e in new_errors])
+                self.rejected_records += len(new_errors)
+                print(f"Rejected {len(new_errors)} feedback records that cannot be featurized")
+                bad = {i for i, _ in errors}
+                records = [r for i, r in enumerate(records) if i not in bad]
+            self._screened = len(records) + len(errors)
+            if not records:
+                self._advance(new_offset, 0, snapshot.version)
+                return None
+
+            reviews = pd.DataFrame([r['review'] for r in records])
+            y = np.array([r['label'] for r in records], dtype=int)
+            X, _ = prepare_features(reviews, snapshot.feature_extractor, is_training=False)
+
+            updated = self._update_model(snapshot.model, X, y)
+            if updated is None:
+                return None
+
+            version = f"{snapshot.version.split('+')[0]}+fb{self.applied_records + len(records)}"
+            if self.model_path:
+                _atomic_write(self.model_path, lambda f: joblib.dump(updated, f))
+
+            self.updates += 1
+            self.last_update = datetime.now().isoformat()
+            self._advance(new_offset, len(records), version)
+
+            self.serving_model.publish(updated, snapshot.feature_extractor, version)
+            print(f"Published online update {version} ({len(records)} feedback records)")
+            return {'version': version, 'records': len(records)}
+
+    def _advance(self, new_offset, applied, version):
+        """Move the applied offset past a consumed batch and save the state (caller holds the lock)"""
+        self.applied_offset = new_offset
+        self.applied_records += applied
+        self._screened = 0
+        _atomic_write(self.state_path, lambda f: f.write(json.dumps({
+            'applied_offset': self.applied_offset,
+            'applied_records': self.applied_records,
+            'base_trees': self.base_trees,
+            'model_version': version,
+            'updated_at': datetime.now().isoformat()
+        }, indent=4).encode('utf-8')))
+
+    def status(self):
+        """Return buffer and update counters"""
+        snapshot = self.serving_model.snapshot()
+        model = snapshot.model if snapshot else None
+        return {
+            'model_version': snapshot.version if snapshot else None,
+            'n_estimators': len(model.estimators_) if hasattr(model, 'estimators_') else None,
+            'buffered_bytes': self.buffer.size(),
+            'pending_bytes': self.buffer.size() - self.applied_offset,
+            'applied_records': self.applied_records,
+            'rejected_records': self.rejected_records,
+            'updates': self.updates,
+            'last_update': self.last_update,
+            'last_error': self.last_error,
+            'min_batch': self.min_batch,
+            'interval_seconds': self.interval_seconds,
+            'max_trees': self.max_trees,
+            'role': self.role,
+            'running': bool(self._thread and self._thread.is_alive())
+        }
@@ -0,0 +1,115 @@
+"""
+Parallel Training Pipeline Helpers
+Shards feature extraction across a process pool and times each stage
+"""
+
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Extractor installed once per worker process by _init_worker
+_worker_extractor = None
+
+
+class StageTimer:
+    """Accumulate wall-clock seconds per named pipeline stage"""
+
+    def __init__(self):
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - start
+
+    def report(self):
+        """Print the stage timings table"""
+        total = sum(self.timings.values())
+        print("\n" + "="*60)
+        print("STAGE TIMINGS (wall clock)")
+        print("="*60)
+        for name, seconds in self.timings.items():
+            share = seconds / total * 100 if total > 0 else 0
+            print(f"  {name:28} {seconds:9.2f}s  ({share:5.1f}%)")
+        print(f"  {'total':28} {total:9.2f}s")
+        print("="*60)
+
+
+def resolve_n_jobs(n_jobs):
+    """Translate sklearn-style n_jobs (-1 = all cores) into a worker count"""
+    cpus = os.cpu_count() or 1
+    if n_jobs is None or n_jobs == 0:
+        return 1
+    if n_jobs < 0:
+        return max(1, cpus + 1 + n_jobs)
+    return n_jobs
+
+
+def _init_worker(extractor):
+    global _worker_extractor
+    _worker_extractor = extractor
+
+
+def _extract_rows(extractor, df):
+    """Statistical features and cleaned text for a frame, cleaning each text once"""
+    cleaned = [extractor.preprocess_text(text) for text in df['text_']]
+    return extractor.extract_all_features(df, verbose=False, cleaned_texts=cleaned), cleaned
+
+
+def _extract_shard(shard_df):
+    """Statistical features and cleaned text for one shard of rows"""
+    return _extract_rows(_worker_extractor, shard_df)
+
+
+def extract_features_parallel(dfs, extractor, n_jobs=-1, shard_size=None):
+    """
+    Extract statistical features and cleaned text for several frames at once
+
+    Every frame is cut into row shards and all shards of all frames are
+    submitted to one process pool, so e.g. the train and test splits are
+    processed concurrently rather than one after the other.
+
+    Args:
+        dfs: list of DataFrames (e.g. [train_df, test_df])
+        extractor: ReviewFeatureExtractor (only unfitted state is used)
+        n_jobs: worker processes, -1 for all cores, 1 to run in-process
+        shard_size: rows per shard (default: ~4 shards per worker)
+
+    Returns:
+        list of (statistical features DataFrame, cleaned texts) per frame
+    """
+    workers = resolve_n_jobs(n_jobs)
+    if workers == 1:
+        return [_extract_rows(extractor, df) for df in dfs]
+
+    total_rows = sum(len(df) for df in dfs)
+    if shard_size is None:
+        shard_size = max(500, math.ceil(total_rows / (workers * 4)))
+
+    shards = []
+    for frame_index, df in enumerate(dfs):
+        for start in range(0, len(df), shard_size):
+            shards.append((frame_index, df.iloc[start:start + shard_size]))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(extractor,)) as pool:
+        shard_results = list(pool.map(_extract_shard, [shard for _, shard in shards]))
+
+    results = []
+    for frame_index, df in enumerate(dfs):
+        parts = [result for (index, _), result in zip(shards, shard_results) if index == frame_index]
+        if parts:
+            stats = pd.concat([p[0] for p in parts], ignore_index=True)
+            cleaned = [text for p in parts for text in p[1]]
+        else:
+            stats = extractor.extract_all_features(df, verbose=False)
+            cleaned = []
+        results.append((stats, cleaned))
+    return results
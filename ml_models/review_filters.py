@@ -0,0 +1,207 @@
+"""
+Bitmap Filter Index
+Per-value bitmaps and sorted range arrays over the review store, built once
+at load time, so multi-field review filters resolve with word-wide bitwise
+AND/OR instead of a scan of the reviews
+"""
+
+import numpy as np
+import pandas as pd
+
+# Exact-match fields: one packed bitmap per distinct value
+BITMAP_FIELDS = ['label', 'category', 'rating', 'verified_purchase',
+                 'order_id_missing', 'purchase_id_missing']
+
+# Range fields: row positions sorted by value
+RANGE_FIELDS = ['days_after_purchase', 'user_review_count']
+
+# Query parameters: name -> (field, parser); comma-separated values are ORed
+VALUE_PARAMS = {
+    'category': ('category', str),
+    'rating': ('rating', float),
+    'verified_purchase': ('verified_purchase', 'bool'),
+    'order_id_missing': ('order_id_missing', 'bool'),
+    'purchase_id_missing': ('purchase_id_missing', 'bool')
+}
+
+# Query parameters: (min name, max name) -> field; bounds are inclusive
+RANGE_PARAMS = {
+    ('min_days', 'max_days'): 'days_after_purchase',
+    ('min_review_count', 'max_review_count'): 'user_review_count'
+}
+
+# Legacy ?filter= values
+LABEL_FILTERS = {'fake': 'CG', 'genuine': 'OR'}
+
+_TRUE = {'true', '1', 'yes'}
+_FALSE = {'false', '0', 'no'}
+
+# Set bits per byte value
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+class FilterError(ValueError):
+    """Malformed filter query parameter"""
+
+
+def _parse_value(name, raw, parser):
+    if parser == 'bool':
+        value = raw.strip().lower()
+        if value in _TRUE:
+            return 1
+        if value in _FALSE:
+            return 0
+        raise FilterError(f"Invalid {name}: {raw} (expected true or false)")
+    try:
+        return parser(raw.strip())
+    except ValueError:
+        raise FilterError(f"Invalid {name}: {raw}")
+
+
+def parse_filters(args):
+    """
+    Filter conditions from query parameters
+
+    Args:
+        args: mapping of query parameter -> string (e.g. request.args)
+
+    Returns:
+        list of (field, 'in', values) and (field, 'range', (low, high))
+        conditions, ANDed together; a None bound is open
+    """
+    conditions = []
+    label = LABEL_FILTERS.get(args.get('filter', 'all'))
+    if label is not None:
+        conditions.append(('label', 'in', [label]))
+
+    for name, (field, parser) in VALUE_PARAMS.items():
+        raw = args.get(name)
+        if raw is None or raw == '':
+            continue
+        conditions.append((field, 'in', [_parse_value(name, value, parser)
+                                         for value in raw.split(',') if value.strip()]))
+
+    for (low_name, high_name), field in RANGE_PARAMS.items():
+        bounds = [_parse_value(name, args[name], float) if args.get(name) not in (None, '') else None
+                  for name in (low_name, high_name)]
+        if bounds != [None, None]:
+            conditions.append((field, 'range', tuple(bounds)))
+    return conditions
+
+
+class BitmapFilterIndex:
+    """
+    Packed bitmaps (bit i = review at position i) for exact-match fields and
+    sorted position arrays for range fields
+
+    Value filters OR the bitmaps of the requested values, range filters
+    set the bits of one contiguous slice of the sorted positions, and the
+    per-field results are ANDed. Counting and paging work on the packed
+    bytes; only the bytes covering the requested page are unpacked.
+    """
+
+    def __init__(self, columns):
+        """
+        Args:
+            columns: dict of field -> array of values in row order, covering
+                     BITMAP_FIELDS and RANGE_FIELDS (None/NaN = missing)
+        """
+        self.size = len(next(iter(columns.values())))
+        self._bitmaps = {}
+        for field in BITMAP_FIELDS:
+            codes, values = pd.factorize(pd.Series(columns[field], dtype=object), use_na_sentinel=True)
+            self._bitmaps[field] = {
+                self._key(value): np.packbits(codes == code) for code, value in enumerate(values)
+            }
+
+        self._sorted = {}
+        for field in RANGE_FIELDS:
+            values = pd.to_numeric(pd.Series(columns[field]), errors='coerce').to_numpy(dtype=np.float64)
+            positions = np.flatnonzero(~np.isnan(values))
+            order = positions[np.argsort(values[positions], kind='stable')].astype(np.int64)
+            self._sorted[field] = (values[order], order)
+
+    @staticmethod
+    def _key(value):
+        """Dictionary key for a field value (numbers compare as floats: 5 == 5.0)"""
+        if isinstance(value, (bool, np.bool_)):
+            return float(value)
+        if isinstance(value, (int, float, np.integer, np.floating)):
+            return float(value)
+        return value
+
+    @classmethod
+    def from_store(cls, store):
+        """Build the index from a ReviewStore (one scan of the filter columns, in row order)"""
+        rows = store.query(
+            "SELECT label, category, rating, verified_purchase, order_id IS NULL, purchase_id IS NULL, "
+            "days_after_purchase, user_review_count FROM reviews ORDER BY id"
+        )
+        frame = pd.DataFrame.from_records(rows, columns=BITMAP_FIELDS + RANGE_FIELDS)
+        return cls({field: frame[field].to_numpy(dtype=object) for field in frame.columns})
+
+    def _empty(self):
+        return np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def _values_bitmap(self, field, values):
+        bitmaps = self._bitmaps[field]
+        result = self._empty()
+        for value in values:
+            bitmap = bitmaps.get(self._key(value))
+            if bitmap is not None:
+                np.bitwise_or(result, bitmap, out=result)
+        return result
+
+    def _range_bitmap(self, field, low, high):
+        sorted_values, order = self._sorted[field]
+        start = 0 if low is None else np.searchsorted(sorted_values, low, side='left')
+        end = len(order) if high is None else np.searchsorted(sorted_values, high, side='right')
+        mask = np.zeros(self.size, dtype=bool)
+        mask[order[start:end]] = True
+        return np.packbits(mask)
+
+    def select(self, conditions):
+        """
+        Bitmap of the reviews matching every condition
+
+        Returns:
+            packed uint8 bitmap, or None when there are no conditions (all reviews)
+        """
+        result = None
+        for field, kind, argument in conditions:
+            if kind == 'in':
+                bitmap = self._values_bitmap(field, argument)
+            elif kind == 'range':
+                bitmap = self._range_bitmap(field, *argument)
+            else:
+                raise FilterError(f"Unknown condition: {kind}")
+            result = bitmap if result is None else np.bitwise_and(result, bitmap, out=result)
+        return result
+
+    def count(self, bitmap):
+        """Number of matching reviews"""
+        if bitmap is None:
+            return self.size
+        return int(_POPCOUNT[bitmap].sum(dtype=np.int64))
+
+    def page(self, bitmap, offset, limit):
+        """
+        Positions of matching reviews offset .. offset + limit - 1, in row order
+
+        Returns:
+            int64 array of row positions (0-based)
+        """
+        if limit <= 0 or offset < 0:
+            return np.empty(0, dtype=np.int64)
+        if bitmap is None:
+            return np.arange(min(offset, self.size), min(offset + limit, self.size), dtype=np.int64)
+
+        counts = np.cumsum(_POPCOUNT[bitmap], dtype=np.int64)
+        if not len(counts) or offset >= counts[-1]:
+            return np.empty(0, dtype=np.int64)
+        # First byte holding match number `offset` and last byte needed for the page
+        first = int(np.searchsorted(counts, offset, side='right'))
+        last = int(np.searchsorted(counts, offset + limit, side='left'))
+        positions = np.flatnonzero(np.unpackbits(bitmap[first:last + 1])) + first * 8
+        skip = offset - (int(counts[first - 1]) if first else 0)
+        return positions[skip:skip + limit].astype(np.int64)
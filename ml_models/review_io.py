@@ -0,0 +1,234 @@
+"""
+Chunked Review File Ingestion
+Reads uploaded CSV/XLSX review files as a stream of DataFrame chunks
+"""
+
+import itertools
+import json
+import math
+
+import pandas as pd
+
+
+class UploadError(ValueError):
+    """Uploaded file content that cannot be turned into reviews"""
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip()) or \
+        (isinstance(value, float) and math.isnan(value))
+
+
+def _to_text(value):
+    return str(value)
+
+
+def _to_float(value):
+    return float(value)
+
+
+def _to_number(value):
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def _to_id(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _to_bool(value):
+    if isinstance(value, (bool, int, float)):
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in ('true', 't', 'yes', 'y', '1'):
+        return True
+    if text in ('false', 'f', 'no', 'n', '0'):
+        return False
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+# Columns taken from XLSX uploads: name -> (coercer, value for blank cells)
+XLSX_COLUMNS = {
+    'text_': (_to_text, ''),
+    'rating': (_to_float, 3.0),
+    'order_id': (_to_id, None),
+    'purchase_id': (_to_id, None),
+    'verified_purchase': (_to_bool, False),
+    'user_id': (_to_id, 'UNKNOWN'),
+    'days_after_purchase': (_to_number, 30),
+    'user_review_count': (_to_number, 1),
+    'category': (_to_text, 'General')
+}
+
+
+def _check_required(names, required):
+    """Raise UploadError for the first required column missing from names"""
+    for name in required:
+        if name not in names:
+            raise UploadError(f"Missing required column: {name}")
+
+
+def iter_csv_chunks(stream, chunksize=5000, required=()):
+    """
+    Read a CSV upload in chunks
+
+    Returns:
+        (list of column names, iterator of DataFrames)
+
+    Raises:
+        UploadError: if a required column is missing
+    """
+    try:
+        reader = pd.read_csv(stream, chunksize=chunksize)
+        first = next(reader, None)
+    except pd.errors.EmptyDataError:
+        _check_required([], required)
+        return [], iter(())
+    names = [] if first is None else first.columns.tolist()
+    try:
+        _check_required(names, required)
+    except UploadError:
+        reader.close()
+        raise
+    if first is None:
+        reader.close()
+        return [], iter(())
+    return names, itertools.chain([first], reader)
+
+
+def iter_xlsx_chunks(stream, chunksize=5000, columns=XLSX_COLUMNS, required=()):
+    """
+    Stream the first worksheet of an XLSX upload in chunks
+
+    The workbook is opened read-only, so rows are parsed one at a time
+    instead of loading the whole sheet. Only the known review columns are
+    kept, and each cell is coerced to its column type as it is read.
+    Blank cells take the column's default.
+
+    Returns:
+        (list of column names found, iterator of DataFrames)
+
+    Raises:
+        UploadError: if the file is not a readable workbook, a required
+                     column is missing, or a cell cannot be coerced
+                     (raised while iterating)
+    """
+    from openpyxl import load_workbook
+
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise UploadError(f"Could not read Excel file: {e}")
+
+    rows = workbook.worksheets[0].iter_rows(values_only=True)
+    header = next(rows, None)
+    names = [str(name).strip() if name is not None else '' for name in header or ()]
+    wanted = [(index, name) for index, name in enumerate(names) if name in columns]
+    try:
+        _check_required([name for _, name in wanted], required)
+    except UploadError:
+        workbook.close()
+        raise
+    if header is None:
+        workbook.close()
+        return [], iter(())
+
+    def chunks():
+        try:
+            buffer = {name: [] for _, name in wanted}
+            row_count = 0
+            for row_number, row in enumerate(rows, start=2):
+                if all(_blank(value) for value in row):
+                    continue
+                for index, name in wanted:
+                    value = row[index] if index < len(row) else None
+                    coerce, default = columns[name]
+                    if _blank(value):
+                        buffer[name].append(default)
+                        continue
+                    try:
+                        buffer[name].append(coerce(value))
+                    except (TypeError, ValueError) as e:
+                        raise UploadError(f"Row {row_number}, column {name}: {e}")
+                row_count += 1
+                if row_count == chunksize:
+                    yield pd.DataFrame(buffer)
+                    buffer = {name: [] for _, name in wanted}
+                    row_count = 0
+            if row_count:
+                yield pd.DataFrame(buffer)
+        finally:
+            workbook.close()
+
+    return [name for _, name in wanted], chunks()
+
+
+def iter_ndjson_batches(stream, batch_size=256, max_line_bytes=1024 * 1024):
+    """
+    Read newline-delimited JSON reviews in micro-batches
+
+    Lines are read only when the next batch is requested, so a consumer
+    that scores and writes out each batch before asking for another holds
+    at most one batch in memory, however long the stream is.
+
+    Args:
+        stream: binary file object with one JSON object per line
+        batch_size: reviews per batch
+        max_line_bytes: longer lines are skipped and reported as errors
+
+    Returns:
+        iterator of lists of (line number, review dict or UploadError)
+    """
+    batch = []
+    line_number = 0
+    while True:
+        line = stream.readline(max_line_bytes + 1)
+        if not line:
+            break
+        line_number += 1
+
+        if len(line) > max_line_bytes and not line.endswith(b'\n'):
+            # Drain the rest of the oversized line without keeping it
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(max_line_bytes + 1)
+            batch.append((line_number, UploadError(f"Line longer than {max_line_bytes} bytes")))
+        elif line.strip():
+            try:
+                review = json.loads(line)
+                if not isinstance(review, dict):
+                    raise ValueError("expected a JSON object")
+            except ValueError as e:
+                review = UploadError(f"Invalid JSON: {e}")
+            batch.append((line_number, review))
+        else:
+            continue
+
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def open_upload(stream, filename, chunksize=5000, required=()):
+    """
+    Open an uploaded review file as a stream of DataFrame chunks
+
+    Args:
+        stream: binary file object (e.g. a werkzeug FileStorage stream)
+        filename: original filename; the extension picks the reader
+        chunksize: rows per chunk
+        required: columns that must be present; checked before anything
+                  is returned, so a refused file leaves nothing open
+
+    Returns:
+        (list of column names, iterator of DataFrames)
+
+    Raises:
+        UploadError: if a required column is missing
+    """
+    if filename.lower().endswith('.xlsx'):
+        return iter_xlsx_chunks(stream, chunksize=chunksize, required=required)
+    return iter_csv_chunks(stream, chunksize=chunksize, required=required)
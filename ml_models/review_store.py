@@ -0,0 +1,279 @@
+"""
+Indexed Review Store
+SQLite (WAL mode) copy of the review dataset that analytics queries run
+against, shared by every worker process instead of a per-worker DataFrame
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+SCHEMA_VERSION = 2
+
+# days_after_purchase bins, right-inclusive like pd.cut: (-inf, 0], (0, 7], ...
+TIMING_EDGES = [0, 7, 30, 90, 180, 365]
+TIMING_LABELS = ['Before Purchase', '0-7 days', '8-30 days', '31-90 days',
+                 '91-180 days', '181-365 days', '365+ days']
+
+REVIEW_COLUMNS = ['text_', 'rating', 'label', 'category', 'verified_purchase', 'order_id',
+                  'purchase_id', 'user_id', 'days_after_purchase', 'user_review_count']
+
+_SCHEMA = """
+CREATE TABLE reviews (
+    id INTEGER PRIMARY KEY,
+    text_ TEXT,
+    rating REAL,
+    label TEXT,
+    category TEXT,
+    verified_purchase INTEGER,
+    order_id TEXT,
+    purchase_id TEXT,
+    user_id TEXT,
+    days_after_purchase INTEGER,
+    user_review_count INTEGER,
+    timing_bin INTEGER
+);
+CREATE TABLE facets (
+    category TEXT,
+    label TEXT,
+    timing_bin INTEGER,
+    verified_purchase INTEGER,
+    order_id_missing INTEGER,
+    purchase_id_missing INTEGER,
+    count INTEGER,
+    first_id INTEGER
+);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+_INDEXES = """
+CREATE INDEX idx_reviews_label ON reviews (label);
+CREATE INDEX idx_reviews_category_label ON reviews (category, label);
+CREATE INDEX idx_reviews_verified ON reviews (verified_purchase);
+CREATE INDEX idx_reviews_timing_label ON reviews (timing_bin, label);
+"""
+
+# Dimensions of ReviewStore.facet_counts
+FACET_COLUMNS = ['category', 'label', 'timing_bin', 'verified_purchase',
+                 'order_id_missing', 'purchase_id_missing']
+
+# Filters accepted by ReviewStore.page: name -> (SQL condition, parameters)
+REVIEW_FILTERS = {
+    'all': ('', ()),
+    'fake': ('WHERE label = ?', ('CG',)),
+    'genuine': ('WHERE label = ?', ('OR',))
+}
+
+
+def timing_bins(days):
+    """Index into TIMING_LABELS for each days_after_purchase value (NaN for missing days)"""
+    days = np.asarray(days, dtype=np.float64)
+    return np.where(np.isnan(days), np.nan, np.searchsorted(TIMING_EDGES, days, side='left'))
+
+
+def _source_stamp(csv_path):
+    stat = os.stat(csv_path)
+    return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def _records(chunk):
+    """Chunk rows as SQLite-ready tuples (NaN -> NULL, numpy -> Python scalars)"""
+    frame = pd.DataFrame({column: chunk[column] if column in chunk.columns else None
+                          for column in REVIEW_COLUMNS})
+    frame['timing_bin'] = timing_bins(frame['days_after_purchase'])
+    frame = frame.astype(object).where(frame.notna(), None)
+    for column in ('verified_purchase', 'days_after_purchase', 'user_review_count', 'timing_bin'):
+        frame[column] = [None if v is None else int(v) for v in frame[column]]
+    return frame.itertuples(index=False, name=None)
+
+
+def build_store(csv_path, db_path, chunksize=50000):
+    """
+    Bulk-load a review CSV into a new SQLite store
+
+    Rows are inserted in chunks inside one transaction with journaling off,
+    indexes are built afterwards, and the finished file replaces db_path
+    atomically, so readers never see a half-built store.
+
+    Returns:
+        number of rows loaded
+    """
+    directory = os.path.dirname(os.path.abspath(db_path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(suffix='.sqlite3', dir=directory)
+    os.close(fd)
+
+    try:
+        connection = sqlite3.connect(temp_path)
+        connection.execute('PRAGMA journal_mode=OFF')
+        connection.execute('PRAGMA synchronous=OFF')
+        connection.executescript(_SCHEMA)
+
+        rows = 0
+        insert = (f"INSERT INTO reviews ({', '.join(REVIEW_COLUMNS)}, timing_bin) "
+                  f"VALUES ({', '.join('?' * (len(REVIEW_COLUMNS) + 1))})")
+        with connection:
+            for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+                connection.executemany(insert, _records(chunk))
+                rows += len(chunk)
+            connection.executemany('INSERT INTO meta VALUES (?, ?)', [
+                ('schema_version', str(SCHEMA_VERSION)),
+                ('source', os.path.abspath(csv_path)),
+                ('source_stamp', _source_stamp(csv_path)),
+                ('rows', str(rows))
+            ])
+        # Dashboard aggregates are fixed for the life of the file: compute them once here
+        with connection:
+            connection.execute(
+                "INSERT INTO facets SELECT category, label, timing_bin, verified_purchase, "
+                "order_id IS NULL, purchase_id IS NULL, COUNT(*), MIN(id) "
+                "FROM reviews GROUP BY 1, 2, 3, 4, 5, 6"
+            )
+        connection.executescript(_INDEXES)
+        connection.execute('ANALYZE')
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.close()
+        os.replace(temp_path, db_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return rows
+
+
+class ReviewStore:
+    """
+    Read-only analytics queries over the SQLite review store
+
+    Each thread gets its own read-only connection; in WAL mode readers in
+    any number of worker processes share the OS page cache and never block
+    each other or a loader.
+    """
+
+    def __init__(self, db_path):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Review store not found: {db_path}")
+        self.db_path = db_path
+        self._local = threading.local()
+        self._facet_lock = threading.Lock()
+        self._facets = None
+
+    @classmethod
+    def open(cls, csv_path, db_path, chunksize=50000):
+        """Open the store, (re)building it first if the CSV is newer than it"""
+        if csv_path and os.path.exists(csv_path) and cls._stale(csv_path, db_path):
+            print(f"Building review store {db_path} from {csv_path}...")
+            rows = build_store(csv_path, db_path, chunksize=chunksize)
+            print(f"Review store built ({rows} reviews)")
+        return cls(db_path)
+
+    @staticmethod
+    def _stale(csv_path, db_path):
+        if not os.path.exists(db_path):
+            return True
+        try:
+            connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+            meta = dict(connection.execute('SELECT key, value FROM meta'))
+            connection.close()
+        except sqlite3.Error:
+            return True
+        return (meta.get('schema_version') != str(SCHEMA_VERSION) or
+                meta.get('source_stamp') != _source_stamp(csv_path))
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True,
+                                         check_same_thread=False)
+            connection.execute('PRAGMA query_only=ON')
+            connection.execute('PRAGMA mmap_size=268435456')
+            self._local.connection = connection
+        return connection
+
+    def query(self, sql, params=()):
+        return self._connection().execute(sql, params).fetchall()
+
+    def __len__(self):
+        return self.query('SELECT COUNT(*) FROM reviews')[0][0]
+
+    def facet_counts(self):
+        """
+        Review counts for every combination of the dashboard dimensions
+
+        Precomputed by build_store (one GROUP BY over FACET_COLUMNS); every
+        analytics panel is a sum over this small frame. Read on first use
+        and kept for the life of the store (the file is never modified in place).
+
+        Returns:
+            DataFrame with FACET_COLUMNS plus 'count' and 'first_id' (lowest
+            row id, for first-appearance ordering)
+        """
+        with self._facet_lock:
+            if self._facets is None:
+                rows = self.query(f"SELECT {', '.join(FACET_COLUMNS)}, count, first_id FROM facets")
+                self._facets = pd.DataFrame.from_records(
+                    rows, columns=FACET_COLUMNS + ['count', 'first_id']
+                )
+            return self._facets
+
+    def page(self, filter_type='all', page=1, per_page=50):
+        """
+        One page of reviews in dataset order
+
+        Args:
+            filter_type: key of REVIEW_FILTERS (unknown values mean 'all')
+            page: 1-based page number
+            per_page: reviews per page
+
+        Returns:
+            (total matching reviews, DataFrame with REVIEW_COLUMNS)
+        """
+        where, params = REVIEW_FILTERS.get(filter_type, REVIEW_FILTERS['all'])
+        total = self.query(f'SELECT COUNT(*) FROM reviews {where}', params)[0][0]
+        limit = per_page if page >= 1 and per_page > 0 else 0
+        rows = self.query(
+            f"SELECT {', '.join(REVIEW_COLUMNS)} FROM reviews {where} ORDER BY id LIMIT ? OFFSET ?",
+            params + (limit, (page - 1) * limit)
+        )
+        return total, pd.DataFrame.from_records(rows, columns=REVIEW_COLUMNS)
+
+    def rows(self, positions, chunk=500):
+        """
+        Reviews at the given 0-based row positions, by primary-key lookup
+
+        Args:
+            positions: row positions (e.g. from BitmapFilterIndex.page or
+                       SearchIndex.search), in the order wanted
+
+        Returns:
+            DataFrame with REVIEW_COLUMNS, in the order given (missing rows skipped)
+        """
+        ids = [int(position) + 1 for position in positions]
+        found = {}
+        for start in range(0, len(ids), chunk):
+            batch = ids[start:start + chunk]
+            for row in self.query(
+                f"SELECT id, {', '.join(REVIEW_COLUMNS)} FROM reviews WHERE id IN "
+                f"({', '.join('?' * len(batch))})", batch
+            ):
+                found[row[0]] = row[1:]
+        return pd.DataFrame.from_records([found[i] for i in ids if i in found], columns=REVIEW_COLUMNS)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Bulk-load the review CSV into the SQLite store")
+    parser.add_argument('--csv', default='../data/enhanced_reviews_dataset.csv')
+    parser.add_argument('--db', default='../data/reviews.sqlite3')
+    parser.add_argument('--chunksize', type=int, default=50000)
+    args = parser.parse_args()
+
+    start = time.time()
+    rows = build_store(args.csv, args.db, chunksize=args.chunksize)
+    print(f"Loaded {rows} reviews into {args.db} in {time.time() - start:.1f}s")
@@ -0,0 +1,167 @@
+"""
+Declarative Risk-Factor Rules
+Each rule is evaluated as one boolean mask over a whole DataFrame of reviews
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# name: stable identifier, also the bit name in risk_flags
+# condition: function(RuleColumns) -> boolean array over all rows
+# message: text shown to users; '{}' is filled with the row's `value` column
+# value: column (or 'fake_probability') formatted into the message, or None
+RiskRule = namedtuple('RiskRule', ['name', 'condition', 'message', 'value'])
+
+# Order matters: it is the order messages appear in for each review
+RISK_RULES = [
+    RiskRule('order_id_missing',
+             lambda c: c.missing('order_id'),
+             "Missing order ID", None),
+    RiskRule('purchase_id_missing',
+             lambda c: c.missing('purchase_id'),
+             "Missing purchase ID", None),
+    RiskRule('unverified_purchase',
+             lambda c: c.falsy('verified_purchase', default=True),
+             "Unverified purchase - IDs do not match", None),
+    RiskRule('review_before_purchase',
+             lambda c: c.numeric('days_after_purchase', 0) < 0,
+             "Review posted before purchase (impossible timing)", None),
+    RiskRule('very_late_review',
+             lambda c: c.numeric('days_after_purchase', 0) > 365,
+             "Review posted {} days after purchase (very late)", 'days_after_purchase'),
+    RiskRule('high_review_count',
+             lambda c: c.numeric('user_review_count', 0) > 50,
+             "User has posted {} reviews (potential bot)", 'user_review_count'),
+    RiskRule('extreme_rating',
+             lambda c: c.numeric('rating', 3.0).isin([1.0, 5.0]).to_numpy(),
+             "Extreme rating ({} stars)", 'rating'),
+    RiskRule('short_review',
+             lambda c: c.text_length('text_') < 50,
+             "Very short review (low detail)", None),
+    RiskRule('high_fake_probability',
+             lambda c: c.fake_probability > 0.7,
+             "High fake probability ({:.1%})", 'fake_probability'),
+]
+
+RISK_RULE_NAMES = [rule.name for rule in RISK_RULES]
+
+
+class RuleColumns:
+    """
+    Normalized column accessors shared by every rule
+
+    Missing columns take the same defaults analyze_risk_factors used with
+    dict.get(), and each derived column is computed once per DataFrame.
+    """
+
+    def __init__(self, reviews_df, fake_probability):
+        self.df = reviews_df
+        self.fake_probability = np.asarray(fake_probability, dtype=np.float64).reshape(-1)
+        self._cache = {}
+
+    def raw(self, name, default=None):
+        if name == 'fake_probability':
+            return pd.Series(self.fake_probability)
+        if name in self.df.columns:
+            return self.df[name].reset_index(drop=True)
+        return pd.Series([default] * len(self.df), dtype=object)
+
+    def _cached(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def missing(self, name):
+        return self._cached(('missing', name), lambda: self.raw(name).isna().to_numpy())
+
+    def numeric(self, name, default):
+        def compute():
+            if name not in self.df.columns:
+                return pd.Series(np.full(len(self.df), float(default)))
+            return pd.to_numeric(self.raw(name), errors='coerce')
+        return self._cached(('numeric', name), compute)
+
+    def falsy(self, name, default):
+        """Rows whose value is falsy in Python terms (NaN counts as truthy)"""
+        def compute():
+            if name not in self.df.columns:
+                return np.full(len(self.df), not default)
+            values = self.raw(name)
+            if pd.api.types.is_bool_dtype(values):
+                return ~values.to_numpy(dtype=bool)
+            if pd.api.types.is_numeric_dtype(values):
+                return (values == 0).to_numpy()
+            return ~values.map(bool).to_numpy(dtype=bool)
+        return self._cached(('falsy', name), compute)
+
+    def text_length(self, name):
+        """len(str(value)) per row"""
+        def compute():
+            if name not in self.df.columns:
+                return np.zeros(len(self.df), dtype=np.int64)
+            values = self.raw(name)
+            lengths = values.str.len() if pd.api.types.is_string_dtype(values) else \
+                pd.Series(np.nan, index=values.index)
+            # NaN and non-string values fall back to len(str(value))
+            fallback = lengths.isna()
+            if fallback.any():
+                lengths[fallback] = values[fallback].map(lambda v: len(str(v)))
+            return lengths.to_numpy(dtype=np.int64)
+        return self._cached(('text_length', name), compute)
+
+
+def evaluate_risk_rules(reviews_df, fake_probability, rules=RISK_RULES):
+    """
+    Evaluate every rule over all rows
+
+    Args:
+        reviews_df: DataFrame of reviews
+        fake_probability: array of fake probabilities, one per row
+        rules: list of RiskRule
+
+    Returns:
+        (RuleColumns, list of boolean masks in rule order)
+    """
+    columns = RuleColumns(reviews_df, fake_probability)
+    masks = [np.asarray(rule.condition(columns), dtype=bool) for rule in rules]
+    return columns, masks
+
+
+def risk_flags(reviews_df, fake_probability, rules=RISK_RULES):
+    """Bitmask per row; bit i is set when rules[i] fired"""
+    _, masks = evaluate_risk_rules(reviews_df, fake_probability, rules)
+    flags = np.zeros(len(reviews_df), dtype=np.int64)
+    for bit, mask in enumerate(masks):
+        flags |= mask.astype(np.int64) << bit
+    return flags
+
+
+def decode_risk_flags(flags, rules=RISK_RULES):
+    """Rule names set in one bitmask"""
+    return [rule.name for bit, rule in enumerate(rules) if int(flags) >> bit & 1]
+
+
+def risk_factor_lists(reviews_df, fake_probability, rules=RISK_RULES):
+    """
+    Risk-factor messages for every row
+
+    Returns:
+        (list of message lists, int64 bitmask array), both one entry per row
+    """
+    columns, masks = evaluate_risk_rules(reviews_df, fake_probability, rules)
+    messages = [[] for _ in range(len(reviews_df))]
+    flags = np.zeros(len(reviews_df), dtype=np.int64)
+
+    for bit, (rule, mask) in enumerate(zip(rules, masks)):
+        flags |= mask.astype(np.int64) << bit
+        rows = np.flatnonzero(mask)
+        if rule.value is None:
+            for row in rows:
+                messages[row].append(rule.message)
+        else:
+            values = columns.raw(rule.value).iloc[rows].tolist()
+            for row, value in zip(rows, values):
+                messages[row].append(rule.message.format(value))
+    return messages, flags
@@ -0,0 +1,263 @@
+"""
+Inverted Full-Text Index over Review Text
+Integer posting lists (documents, term frequencies and token positions)
+over the tokens of preprocess_text, for ranked term and phrase search
+"""
+
+import math
+import re
+import threading
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+PHRASE_PATTERN = re.compile(r'"([^"]*)"')
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def _expand_ranges(starts, lengths):
+    """Concatenation of range(start, start + length) for every pair, vectorized"""
+    lengths = np.asarray(lengths, dtype=np.int64)
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(np.asarray(starts, dtype=np.int64) - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(total, dtype=np.int64)
+
+
+class SearchIndex:
+    """
+    Append-only inverted index with positional posting lists
+
+    Postings are stored column-wise in flat numpy arrays grouped by term
+    (CSR layout): for term t, pairs post_start[t]:post_start[t + 1] hold the
+    matching document ids (ascending) and term frequencies, and the token
+    positions of those pairs follow each other in `positions` starting at
+    term_pos_start[t]. New documents are buffered by add() and merged as
+    one segment before the next search, so updates never rebuild the
+    whole index per document.
+
+    Document ids are 0-based positions in insertion order, matching row
+    positions in the review store when built with from_store().
+    """
+
+    def __init__(self, preprocess):
+        self.preprocess = preprocess
+        self._vocabulary = {}
+        self._post_start = np.zeros(1, dtype=np.int64)
+        self._post_docs = np.empty(0, dtype=np.int32)
+        self._post_tf = np.empty(0, dtype=np.int32)
+        self._term_pos_start = np.zeros(1, dtype=np.int64)
+        self._positions = np.empty(0, dtype=np.int32)
+        self._doc_lengths = np.empty(0, dtype=np.int32)
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._doc_lengths) + len(self._pending)
+
+    def tokens(self, text):
+        """Tokens of the preprocessed text"""
+        return TOKEN_PATTERN.findall(self.preprocess(text))
+
+    @classmethod
+    def from_store(cls, store, preprocess, batch_size=50000):
+        """Index every review in a ReviewStore, in row order, one batch at a time"""
+        index = cls(preprocess)
+        total = len(store)
+        for start in range(0, total, batch_size):
+            rows = store.query("SELECT text_ FROM reviews WHERE id > ? AND id <= ? ORDER BY id",
+                               (start, start + batch_size))
+            index.add_many(text for (text,) in rows)
+        return index
+
+    def add(self, text):
+        """Queue one document; returns its id"""
+        with self._lock:
+            self._pending.append(text)
+            return len(self._doc_lengths) + len(self._pending) - 1
+
+    def add_many(self, texts):
+        """Index a batch of documents as one segment"""
+        with self._lock:
+            self._pending.extend(texts)
+            self._flush()
+
+    def _flush(self):
+        """Merge pending documents into the index (caller holds the lock)"""
+        if not self._pending:
+            return
+        texts, self._pending = self._pending, []
+        first_doc = len(self._doc_lengths)
+
+        # Token stream of the new segment: (term id, doc id, position) per token
+        vocabulary = self._vocabulary
+        terms, lengths = [], []
+        for text in texts:
+            tokens = self.tokens(text)
+            lengths.append(len(tokens))
+            for token in tokens:
+                term = vocabulary.get(token)
+                if term is None:
+                    term = vocabulary[token] = len(vocabulary)
+                terms.append(term)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        token_terms = np.asarray(terms, dtype=np.int32)
+        token_docs = np.repeat(np.arange(first_doc, first_doc + len(texts), dtype=np.int32), lengths)
+        token_positions = (np.arange(len(token_terms), dtype=np.int64)
+                           - np.repeat(np.cumsum(lengths) - lengths, lengths)).astype(np.int32)
+
+        # Group tokens by term; the stable sort keeps (doc, position) order within a term
+        order = np.argsort(token_terms, kind='stable')
+        token_terms, token_docs = token_terms[order], token_docs[order]
+        new_positions = token_positions[order]
+        boundary = np.ones(len(order), dtype=bool)
+        boundary[1:] = (token_terms[1:] != token_terms[:-1]) | (token_docs[1:] != token_docs[:-1])
+        pair_index = np.flatnonzero(boundary)
+        new_terms = token_terms[pair_index]
+        new_docs = token_docs[pair_index]
+        new_tf = np.diff(np.append(pair_index, len(order))).astype(np.int32)
+
+        # Merge with the existing pairs: old pairs of a term come first (lower doc ids)
+        old_terms = np.repeat(np.arange(len(self._post_start) - 1, dtype=np.int32),
+                              np.diff(self._post_start))
+        all_terms = np.concatenate([old_terms, new_terms])
+        all_tf = np.concatenate([self._post_tf, new_tf])
+        all_pos_start = np.cumsum(all_tf, dtype=np.int64) - all_tf
+        all_positions = np.concatenate([self._positions, new_positions])
+
+        order = np.argsort(all_terms, kind='stable')
+        vocabulary_size = len(vocabulary)
+        self._post_docs = np.concatenate([self._post_docs, new_docs])[order]
+        self._post_tf = all_tf[order]
+        self._positions = all_positions[_expand_ranges(all_pos_start[order], self._post_tf)]
+
+        pair_counts = np.bincount(all_terms, minlength=vocabulary_size)
+        position_counts = np.bincount(all_terms, weights=all_tf, minlength=vocabulary_size)
+        self._post_start = np.concatenate([[0], np.cumsum(pair_counts)]).astype(np.int64)
+        self._term_pos_start = np.concatenate([[0], np.cumsum(position_counts)]).astype(np.int64)
+        self._doc_lengths = np.concatenate([self._doc_lengths, lengths.astype(np.int32)])
+
+    def _postings(self, term):
+        start, end = self._post_start[term], self._post_start[term + 1]
+        return self._post_docs[start:end], self._post_tf[start:end]
+
+    def _phrase_matches(self, terms, candidates):
+        """Documents among candidates containing the terms consecutively, and match counts"""
+        matches = None
+        for offset, term in enumerate(terms):
+            docs, tf = self._postings(term)
+            keep = np.flatnonzero(np.isin(docs, candidates, assume_unique=True))
+            pos_start = self._term_pos_start[term] + np.cumsum(tf, dtype=np.int64) - tf
+            positions = self._positions[_expand_ranges(pos_start[keep], tf[keep])].astype(np.int64) - offset
+            owners = np.repeat(docs[keep].astype(np.int64), tf[keep])
+            valid = positions >= 0
+            # (doc, phrase start) encoded in one int64
+            codes = (owners[valid] << 32) | positions[valid]
+            matches = codes if matches is None else np.intersect1d(matches, codes, assume_unique=True)
+            if not len(matches):
+                break
+        return np.unique(matches >> 32, return_counts=True)
+
+    def _idf(self, document_frequency):
+        count = len(self._doc_lengths)
+        return math.log(1 + (count - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def _bm25(self, tf, docs, idf):
+        lengths = self._doc_lengths[docs]
+        average = max(float(self._doc_lengths.mean()), 1.0)
+        tf = tf.astype(np.float64)
+        return idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * lengths / average))
+
+    def parse_query(self, query):
+        """Split a query into single terms and "quoted phrases" (lists of tokens)"""
+        phrases = [self.tokens(phrase) for phrase in PHRASE_PATTERN.findall(query)]
+        terms = self.tokens(PHRASE_PATTERN.sub(' ', query))
+        single = terms + [phrase[0] for phrase in phrases if len(phrase) == 1]
+        return single, [phrase for phrase in phrases if len(phrase) > 1]
+
+    def search(self, query, bitmap=None, offset=0, limit=20):
+        """
+        Ranked documents containing every term and phrase of the query
+
+        Args:
+            query: free text; "double quotes" mark phrases
+            bitmap: optional packed bitmap (BitmapFilterIndex.select) that
+                    matching documents must be set in
+            offset, limit: page of the ranked results
+
+        Returns:
+            (total matches, page document ids, page BM25 scores)
+        """
+        empty = (0, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+        with self._lock:
+            self._flush()
+            single, phrases = self.parse_query(query)
+            words = single + [token for phrase in phrases for token in phrase]
+            if not words or any(word not in self._vocabulary for word in words):
+                return empty
+            term_ids = {word: self._vocabulary[word] for word in words}
+
+            # Intersect posting lists, rarest term first
+            unique_terms = sorted(set(term_ids.values()),
+                                  key=lambda term: self._post_start[term + 1] - self._post_start[term])
+            candidates = self._postings(unique_terms[0])[0]
+            for term in unique_terms[1:]:
+                if not len(candidates):
+                    return empty
+                candidates = np.intersect1d(candidates, self._postings(term)[0], assume_unique=True)
+
+            if bitmap is not None and len(candidates):
+                inside = candidates < len(bitmap) * 8
+                candidates = candidates[inside]
+                bits = (bitmap[candidates >> 3] >> (7 - (candidates & 7))) & 1
+                candidates = candidates[bits.astype(bool)]
+
+            phrase_hits = []
+            for phrase in phrases:
+                if not len(candidates):
+                    return empty
+                docs, counts = self._phrase_matches([term_ids[token] for token in phrase], candidates)
+                candidates = docs.astype(np.int32)
+                phrase_hits.append((phrase, docs, counts))
+            if not len(candidates):
+                return empty
+
+            scores = np.zeros(len(candidates), dtype=np.float64)
+            for word in set(single):
+                docs, tf = self._postings(term_ids[word])
+                scores += self._bm25(tf[np.searchsorted(docs, candidates)], candidates, self._idf(len(docs)))
+            for phrase, docs, counts in phrase_hits:
+                # A phrase scores as one term weighted by the idf of all its words
+                idf = sum(self._idf(len(self._postings(term_ids[token])[0])) for token in phrase)
+                scores += self._bm25(counts[np.searchsorted(docs, candidates)], candidates, idf)
+
+            total = len(candidates)
+            end = offset + max(limit, 0)
+            if offset < 0 or offset >= end or offset >= total:
+                return total, empty[1], empty[2]
+            if end < total:
+                # Only the top `end` need ordering: everything scoring at least the end-th best
+                # score (ties included, so the page does not depend on partition order)
+                cutoff = np.partition(scores, total - end)[total - end]
+                top = np.flatnonzero(scores >= cutoff)
+                candidates, scores = candidates[top], scores[top]
+            order = np.lexsort((candidates, -scores))[offset:end]
+            return total, candidates[order].astype(np.int64), scores[order]
+
+    def stats(self):
+        """Index size counters"""
+        with self._lock:
+            arrays = (self._post_start, self._post_docs, self._post_tf, self._term_pos_start,
+                      self._positions, self._doc_lengths)
+            return {
+                'documents': len(self._doc_lengths),
+                'pending_documents': len(self._pending),
+                'terms': len(self._vocabulary),
+                'postings': len(self._post_docs),
+                'positions': len(self._positions),
+                'array_bytes': int(sum(array.nbytes for array in arrays))
+            }
@@ -7,18 +7,58 @@ import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import (
-    accuracy_score, precision_score, recall_score, f1_score,
-    confusion_matrix, classification_report, roc_auc_score, roc_curve
-)
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 import joblib
 import json
+import os
+import shutil
+import tempfile
 from datetime import datetime
+from scipy import sparse
 import warnings
 warnings.filterwarnings('ignore')
 
-from feature_extraction import ReviewFeatureExtractor, prepare_features
+from feature_extraction import ReviewFeatureExtractor, HashingFeatureExtractor, prepare_features
+from feature_store import FeatureStore
+from evaluation import evaluate_model, histogram_auc, metrics_from_counts
+from model_artifact import save_artifact
+from parallel_pipeline import StageTimer, extract_features_parallel
+
+
+# Default hyperparameters per model type
+MODEL_CLASSES = {
+    'random_forest': RandomForestClassifier,
+    'logistic_regression': LogisticRegression,
+    'sgd': SGDClassifier
+}
+
+DEFAULT_MODEL_PARAMS = {
+    'random_forest': {
+        'n_estimators': 25,        # Even fewer trees
+        'max_depth': 8,            # Shallow trees
+        'min_samples_split': 40,   # More samples required
+        'min_samples_leaf': 20,    # More samples in leaves
+        'max_features': 0.5,       # Use only 50% of features
+        'random_state': 42,
+        'n_jobs': -1
+    },
+    'logistic_regression': {
+        'random_state': 42,
+        'max_iter': 1000
+    },
+    'sgd': {
+        'loss': 'log_loss',     # Logistic loss so predict_proba is available
+        'alpha': 1e-5,
+        'random_state': 42
+    }
+}
+
+
+def build_model(model_type, **params):
+    """Create an unfitted model, overriding default hyperparameters with params"""
+    if model_type not in MODEL_CLASSES:
+        raise ValueError(f"Unknown model type: {model_type}")
+    return MODEL_CLASSES[model_type](**{**DEFAULT_MODEL_PARAMS[model_type], **params})
 
 
 class FakeReviewDetector:
@@ -31,25 +71,9 @@ class FakeReviewDetector:
         self.feature_names = None
         self.metrics = {}
         
-    def create_model(self):
-        """Initialize the ML model"""
-        if self.model_type == 'random_forest':
-            self.model = RandomForestClassifier(
-                n_estimators=25,        # Even fewer trees
-                max_depth=8,            # Shallow trees
-                min_samples_split=40,   # More samples required
-                min_samples_leaf=20,    # More samples in leaves
-                max_features=0.5,       # Use only 50% of features
-                random_state=42,
-                n_jobs=-1
-            )
-        elif self.model_type == 'logistic_regression':
-            self.model = LogisticRegression(
-                random_state=42,
-                max_iter=1000
-            )
-        else:
-            raise ValueError(f"Unknown model type: {self.model_type}")
+    def create_model(self, **params):
+        """Initialize the ML model (keyword arguments override default hyperparameters)"""
+        self.model = build_model(self.model_type, **params)
         
         print(f"Initialized {self.model_type} model")
     
@@ -63,33 +87,16 @@ class FakeReviewDetector:
         print("Training completed!")
     
     def evaluate(self, X_test, y_test):
-        """Evaluate model performance"""
-        print("\nEvaluating model...")
-        
-        # Predictions
-        y_pred = self.model.predict(X_test)
-        y_pred_proba = self.model.predict_proba(X_test)[:, 1]
-        
-        # Calculate metrics
-        self.metrics = {
-            'accuracy': accuracy_score(y_test, y_pred),
-            'precision': precision_score(y_test, y_pred),
-            'recall': recall_score(y_test, y_pred),
-            'f1_score': f1_score(y_test, y_pred),
-            'roc_auc': roc_auc_score(y_test, y_pred_proba)
-        }
+        """
+        Evaluate model performance
         
-        # Confusion matrix
-        cm = confusion_matrix(y_test, y_pred)
-        self.metrics['confusion_matrix'] = cm.tolist()
-        self.metrics['true_negatives'] = int(cm[0, 0])
-        self.metrics['false_positives'] = int(cm[0, 1])
-        self.metrics['false_negatives'] = int(cm[1, 0])
-        self.metrics['true_positives'] = int(cm[1, 1])
+        The test set is scored once; the headline metrics, ROC/PR curves,
+        threshold sweep and status breakdown all come from that one
+        probability vector (see evaluation.evaluate_scores).
+        """
+        print("\nEvaluating model...")
         
-        # Classification report
-        report = classification_report(y_test, y_pred, output_dict=True)
-        self.metrics['classification_report'] = report
+        self.metrics = evaluate_model(self.model, X_test, y_test)
         
         # Feature importance (for tree-based models)
         if hasattr(self.model, 'feature_importances_'):
@@ -97,6 +104,115 @@ class FakeReviewDetector:
         
         return self.metrics
     
+    def train_streaming(self, data_path, chunksize=20000, test_fraction=0.3, epochs=3,
+                        spill_dir=None, random_state=42):
+        """
+        Train out of core on a CSV that does not fit in memory
+        
+        Pass 1 reads the CSV in chunks, assigns each row to train or hold-out
+        with a seeded generator, extracts statistical and hashed text
+        features, updates the scaler's running statistics and spills each
+        chunk's features to disk. Pass 2 runs `epochs` shuffled partial_fit
+        sweeps over the spilled training chunks. The hold-out chunks are then
+        scored one at a time. Peak memory depends on chunksize, not on the
+        dataset size.
+        
+        Args:
+            data_path: labeled review CSV
+            chunksize: rows read per chunk
+            test_fraction: share of rows held out for evaluation
+            epochs: passes of partial_fit over the training chunks
+            spill_dir: directory for spilled chunk features (temp dir if None)
+            random_state: seed for the hold-out split and shuffling
+        
+        Returns:
+            evaluation metrics dict
+        """
+        if not hasattr(self.model, 'partial_fit'):
+            raise ValueError(f"{self.model_type} does not support partial_fit; use model_type='sgd'")
+        if not getattr(self.feature_extractor, 'sparse_output', False):
+            self.feature_extractor = HashingFeatureExtractor()
+        extractor = self.feature_extractor
+        
+        rng = np.random.default_rng(random_state)
+        owns_spill_dir = spill_dir is None
+        spill_dir = spill_dir or tempfile.mkdtemp(prefix='stream-train-')
+        os.makedirs(spill_dir, exist_ok=True)
+        train_chunks, test_chunks = [], []
+        
+        try:
+            print(f"\nPass 1: extracting features in chunks of {chunksize}...")
+            for chunk_index, chunk in enumerate(pd.read_csv(data_path, chunksize=chunksize)):
+                labels = (chunk['label'] == 'CG').astype(np.int8).values
+                is_test = rng.random(len(chunk)) < test_fraction
+                stats = extractor.extract_all_features(chunk, verbose=False)
+                hashed = extractor.transform_tfidf(chunk['text_'])
+                self.feature_names = stats.columns.tolist()
+                
+                for name, mask, chunks in (('train', ~is_test, train_chunks),
+                                           ('test', is_test, test_chunks)):
+                    if not mask.any():
+                        continue
+                    prefix = os.path.join(spill_dir, f"{name}_{chunk_index:06d}")
+                    np.save(f"{prefix}_stats.npy", stats.to_numpy(dtype=np.float64)[mask])
+                    sparse.save_npz(f"{prefix}_text.npz", hashed[mask])
+                    np.save(f"{prefix}_labels.npy", labels[mask])
+                    chunks.append(prefix)
+                    if name == 'train':
+                        extractor.partial_fit_scaler(stats[mask])
+                print(f"  chunk {chunk_index}: {len(chunk)} rows")
+            
+            if not train_chunks:
+                raise ValueError("No training rows found")
+            
+            print(f"\nPass 2: partial_fit over {len(train_chunks)} chunks x {epochs} epochs...")
+            classes = np.array([0, 1])
+            for epoch in range(epochs):
+                for prefix in rng.permutation(train_chunks):
+                    X, y = self._load_spilled_chunk(prefix)
+                    order = rng.permutation(len(y))
+                    self.model.partial_fit(X[order], y[order], classes=classes)
+                print(f"  epoch {epoch + 1}/{epochs} done")
+            
+            print(f"\nEvaluating on {len(test_chunks)} streamed hold-out chunks...")
+            return self.evaluate_streaming(self._load_spilled_chunk(p) for p in test_chunks)
+        finally:
+            if owns_spill_dir:
+                shutil.rmtree(spill_dir, ignore_errors=True)
+    
+    def _load_spilled_chunk(self, prefix):
+        """Load one spilled chunk as a scaled sparse feature matrix plus labels"""
+        stats = pd.DataFrame(np.load(f"{prefix}_stats.npy"), columns=self.feature_names)
+        scaled = self.feature_extractor.transform_scaler(stats)
+        hashed = sparse.load_npz(f"{prefix}_text.npz")
+        X = sparse.hstack([sparse.csr_matrix(scaled), hashed], format='csr')
+        return X, np.load(f"{prefix}_labels.npy").astype(int)
+    
+    def evaluate_streaming(self, batches, threshold=0.5, bins=1000):
+        """
+        Evaluate on (X, y) batches with constant memory
+        
+        Confusion counts are accumulated directly and ROC-AUC is computed from
+        fixed-size per-class probability histograms.
+        """
+        tn = fp = fn = tp = 0
+        positive_hist = np.zeros(bins)
+        negative_hist = np.zeros(bins)
+        
+        for X, y in batches:
+            proba = self.model.predict_proba(X)[:, 1]
+            y_pred = (proba > threshold).astype(int)
+            tp += int(np.sum((y_pred == 1) & (y == 1)))
+            fp += int(np.sum((y_pred == 1) & (y == 0)))
+            fn += int(np.sum((y_pred == 0) & (y == 1)))
+            tn += int(np.sum((y_pred == 0) & (y == 0)))
+            bin_index = np.minimum((proba * bins).astype(int), bins - 1)
+            positive_hist += np.bincount(bin_index[y == 1], minlength=bins)
+            negative_hist += np.bincount(bin_index[y == 0], minlength=bins)
+        
+        self.metrics = metrics_from_counts(tn, fp, fn, tp, histogram_auc(positive_hist, negative_hist))
+        return self.metrics
+    
     def print_metrics(self):
         """Print evaluation metrics"""
         print("\n" + "="*60)
@@ -139,6 +255,11 @@ class FakeReviewDetector:
         joblib.dump(self.feature_extractor, extractor_path)
         print(f"Feature extractor saved: {extractor_path}")
         
+        # Save compact artifact (manifest + flat arrays) for fast, pickle-free loading
+        artifact_path = f"{save_dir}/artifact"
+        save_artifact(self.model, self.feature_extractor, artifact_path)
+        print(f"Model artifact saved: {artifact_path}")
+        
         # Save metrics
         metrics_path = f"{save_dir}/model_metrics.json"
         metrics_to_save = {k: v for k, v in self.metrics.items() 
@@ -203,66 +324,118 @@ class FakeReviewDetector:
         }
 
 
-def main():
-    """Main training pipeline"""
+def extract_training_features(data_path, detector, n_jobs=-1, timer=None):
+    """
+    Load the dataset, split it and extract features without caching
     
-    print("="*60)
-    print("FAKE REVIEW DETECTION - MODEL TRAINING")
-    print("="*60)
+    Text statistics and cleaning for both splits run concurrently across
+    n_jobs worker processes; TF-IDF and the scaler are then fitted on the
+    training split exactly as prepare_features(is_training=True) does.
+    """
+    timer = timer or StageTimer()
+    extractor = detector.feature_extractor
     
     # Load data
     print("\nLoading dataset...")
-    df = pd.read_csv('../data/enhanced_reviews_dataset.csv')
-    print(f"Loaded {len(df)} reviews")
-    print(f"Fake reviews (CG): {len(df[df['label']=='CG'])}")
-    print(f"Genuine reviews (OR): {len(df[df['label']=='OR'])}")
-    
-    # Prepare labels
-    df['label_binary'] = (df['label'] == 'CG').astype(int)
-    
-    # Split data - using 70/30 split for more realistic results
-    print("\nSplitting data (70% train, 30% test)...")
-    train_df, test_df = train_test_split(
-        df, 
-        test_size=0.3,      # Increased from 0.2 for more challenging test
-        random_state=42, 
-        stratify=df['label_binary']
-    )
+    with timer.stage('load + split'):
+        df = pd.read_csv(data_path)
+        print(f"Loaded {len(df)} reviews")
+        print(f"Fake reviews (CG): {len(df[df['label']=='CG'])}")
+        print(f"Genuine reviews (OR): {len(df[df['label']=='OR'])}")
+        
+        # Prepare labels
+        df['label_binary'] = (df['label'] == 'CG').astype(int)
+        
+        # Split data - using 70/30 split for more realistic results
+        print("\nSplitting data (70% train, 30% test)...")
+        train_df, test_df = train_test_split(
+            df, 
+            test_size=0.3,      # Increased from 0.2 for more challenging test
+            random_state=42, 
+            stratify=df['label_binary']
+        )
     
     print(f"Training set: {len(train_df)} reviews")
     print(f"Test set: {len(test_df)} reviews")
     
+    # Extract features for both splits at once
+    print("\nExtracting features from training and test data...")
+    with timer.stage('extract text statistics'):
+        (train_stats, train_texts), (test_stats, test_texts) = extract_features_parallel(
+            [train_df, test_df], extractor, n_jobs=n_jobs
+        )
+    
+    with timer.stage('fit tfidf'):
+        train_tfidf = extractor.fit_tfidf(train_texts, cleaned=True)
+        test_tfidf = extractor.transform_tfidf(test_texts, cleaned=True)
+    
+    with timer.stage('scale + assemble'):
+        X_train = np.hstack([extractor.fit_scaler(train_stats), train_tfidf.toarray()])
+        X_test = np.hstack([extractor.transform_scaler(test_stats), test_tfidf.toarray()])
+    print(f"Final feature matrix shape: {X_train.shape}")
+    
+    y_train = train_df['label_binary'].values
+    y_test = test_df['label_binary'].values
+    
+    return X_train, X_test, y_train, y_test, train_stats.columns.tolist()
+
+
+def main(data_path='../data/enhanced_reviews_dataset.csv', feature_store_dir='feature_store',
+         n_jobs=-1):
+    """
+    Main training pipeline
+    
+    Args:
+        data_path: labeled review CSV
+        feature_store_dir: feature cache directory, or None to always re-extract
+        n_jobs: worker processes for feature extraction (-1 = all cores)
+    """
+    
+    print("="*60)
+    print("FAKE REVIEW DETECTION - MODEL TRAINING")
+    print("="*60)
+    
+    timer = StageTimer()
+    
     # Initialize detector
     detector = FakeReviewDetector(model_type='random_forest')
     detector.create_model()
     
-    # Extract features
-    print("\nExtracting features from training data...")
-    X_train, feature_names = prepare_features(
-        train_df, 
-        detector.feature_extractor, 
-        is_training=True
-    )
-    y_train = train_df['label_binary'].values
-    
-    print("\nExtracting features from test data...")
-    X_test, _ = prepare_features(
-        test_df, 
-        detector.feature_extractor, 
-        is_training=False
-    )
-    y_test = test_df['label_binary'].values
+    if feature_store_dir:
+        # Reuse cached features when the dataset and extractor config are unchanged
+        print(f"\nLoading features (feature store: {feature_store_dir})...")
+        store = FeatureStore(feature_store_dir)
+        X_train, X_test, y_train, y_test, feature_names = store.load_training_features(
+            data_path,
+            detector.feature_extractor,
+            test_size=0.3,
+            random_state=42,
+            n_jobs=n_jobs,
+            timer=timer
+        )
+        print(f"Training set: {len(y_train)} reviews")
+        print(f"Test set: {len(y_test)} reviews")
+    else:
+        X_train, X_test, y_train, y_test, feature_names = extract_training_features(
+            data_path, detector, n_jobs=n_jobs, timer=timer
+        )
+    detector.feature_names = feature_names
     
     # Train model
-    detector.train(X_train, y_train)
+    with timer.stage('train model'):
+        detector.train(X_train, y_train)
     
     # Evaluate model
-    detector.evaluate(X_test, y_test)
+    with timer.stage('evaluate'):
+        detector.evaluate(X_test, y_test)
     detector.print_metrics()
     
     # Save model
     print("\nSaving model...")
-    detector.save_model()
+    with timer.stage('save model'):
+        detector.save_model()
+    
+    timer.report()
     
     # Test prediction
     print("\n" + "="*60)
@@ -293,5 +466,58 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Train the fake review detector")
+    parser.add_argument('--data', default='../data/enhanced_reviews_dataset.csv',
+                        help="labeled review CSV")
+    parser.add_argument('--feature-store', default='feature_store',
+                        help="directory for cached training features")
+    parser.add_argument('--no-feature-store', action='store_true',
+                        help="always re-extract features from the CSV")
+    parser.add_argument('--n-jobs', type=int, default=-1,
+                        help="worker processes for feature extraction (-1 = all cores)")
+    parser.add_argument('--streaming', action='store_true',
+                        help="train out of core with hashed text features and SGD")
+    parser.add_argument('--chunksize', type=int, default=20000,
+                        help="rows per chunk in streaming mode")
+    parser.add_argument('--output-dir',
+                        help="where streaming mode saves the model (default saved_models/streaming)")
+    parser.add_argument('--promote', action='store_true',
+                        help="streaming mode: replace the served model in saved_models")
+    parser.add_argument('--search', choices=['grid', 'random'],
+                        help="run a hyperparameter search instead of a single fit")
+    parser.add_argument('--n-iter', type=int, default=20,
+                        help="candidates to sample in random search mode")
+    args = parser.parse_args()
+    
+    if args.search:
+        from hyperparameter_search import run_search
+        run_search(
+            data_path=args.data,
+            mode=args.search,
+            n_iter=args.n_iter,
+            n_jobs=args.n_jobs,
+            feature_store_dir=args.feature_store
+        )
+        raise SystemExit(0)
+    
+    if args.streaming:
+        # The streaming model only replaces the served one when promoted
+        save_dir = args.output_dir or ('saved_models' if args.promote else 'saved_models/streaming')
+        if (os.path.abspath(save_dir) == os.path.abspath('saved_models')) != args.promote:
+            parser.error("--promote saves to saved_models, and saved_models needs --promote")
+        detector = FakeReviewDetector(model_type='sgd')
+        detector.feature_extractor = HashingFeatureExtractor()
+        detector.create_model()
+        detector.train_streaming(args.data, chunksize=args.chunksize)
+        detector.print_metrics()
+        detector.save_model(save_dir)
+        raise SystemExit(0)
+    
+    main(
+        data_path=args.data,
+        feature_store_dir=None if args.no_feature_store else args.feature_store,
+        n_jobs=args.n_jobs
+    )
 